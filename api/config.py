@@ -1,15 +1,53 @@
+from functools import lru_cache
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
-class Settings(BaseSettings):
+
+class DatabaseSettings(BaseSettings):
+    """asyncpg pool options loaded from environment variables.
+
+    Defaults match asyncpg's own, except the search path.
+    """
+
+    DB_POOL_MIN_SIZE: int = 10
+    DB_POOL_MAX_SIZE: int = 10
+    # Prepared statements cached per connection; 0 disables the cache (PgBouncer)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # Connections are closed after this many queries or seconds idle
+    DB_MAX_QUERIES: int = 50000
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME: float = 300.0
+    # Default timeout in seconds for each query; unset means none
+    DB_COMMAND_TIMEOUT: Optional[float] = None
+    DB_SEARCH_PATH: str = "whereisthisplace, public"
+
+    class Config:
+        env_file = ".env"
+        case_sensitive = True
+        extra = "ignore"
+
+
+class Settings(DatabaseSettings):
     """Application settings loaded from environment variables."""
 
     MODEL_PATH: str
     MAPBOX_TOKEN: str
     IMAGE_TTL_HOURS: int = 24
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = True
+
+@lru_cache()
+def get_database_settings() -> DatabaseSettings:
+    return DatabaseSettings()
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
 
 
-settings = Settings()
+def __getattr__(name: str):
+    # ``settings`` is built on first use so that importing this module, e.g.
+    # for DatabaseSettings, does not require MODEL_PATH and MAPBOX_TOKEN
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,44 +1,200 @@
+import asyncio
 import os
-import asyncpg
+import time
 from fastapi import FastAPI
 from dotenv import load_dotenv
 
-# NEW → pgvector adapter
-from pgvector.asyncpg import register_vector
+from api.lazy import lazy_import
+from api.services.timing import LatencyHistogram
+from api.vector import register_vector as register_vector_codec
+
+asyncpg = lazy_import("asyncpg")
 
 load_dotenv()
 
 
+async def register_vector(conn):
+    """Register the binary float32 ``vector`` codec on ``conn``."""
+    await register_vector_codec(conn)
+
+
 async def init_connection(conn):
-    """Initialize each connection with pgvector and set correct schema."""
-    # Set search path to include whereisthisplace schema
-    await conn.execute("SET search_path TO whereisthisplace, public;")
-    # Register pgvector types
+    """Initialize each connection with pgvector.
+
+    The search path is sent as a startup parameter (``server_settings``),
+    so it costs no extra round trip.
+    """
     await register_vector(conn)
 
 
+class _TimedAcquire:
+    """Wraps the context ``pool.acquire()`` returns, timing the wait for a connection.
+
+    Like asyncpg's own, it can be awaited or used with ``async with``.
+    """
+
+    def __init__(self, metrics: "PoolMetrics", context):
+        self._metrics = metrics
+        self._context = context
+
+    async def _timed(self, acquire):
+        metrics = self._metrics
+        metrics.waiting += 1
+        start = time.perf_counter()
+        try:
+            return await acquire()
+        except asyncio.TimeoutError:
+            metrics.stats["acquire_timeouts"] += 1
+            raise
+        finally:
+            metrics.waiting -= 1
+            metrics.stats["acquires"] += 1
+            metrics.acquire_wait.observe((time.perf_counter() - start) * 1000)
+
+    def __await__(self):
+        return self._timed(lambda: self._context).__await__()
+
+    async def __aenter__(self):
+        return await self._timed(self._context.__aenter__)
+
+    async def __aexit__(self, *exc_info):
+        return await self._context.__aexit__(*exc_info)
+
+
+class PoolMetrics:
+    """How long ``acquire`` waits for a connection, across every pool call.
+
+    Includes opening a connection when the pool has to grow. ``waiting``
+    counts the tasks inside ``acquire`` right now. Updated from the event
+    loop only, so it takes no lock.
+    """
+
+    def __init__(self):
+        self.acquire_wait = LatencyHistogram()
+        self.waiting = 0
+        self.stats = {"acquires": 0, "acquire_timeouts": 0}
+
+    def instrument(self, pool) -> "InstrumentedPool":
+        """Return ``pool`` wrapped so every acquire is timed, including those of ``fetch*``."""
+        return InstrumentedPool(pool, self)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "acquire_wait": self.acquire_wait.snapshot()}
+
+
+class InstrumentedPool:
+    """An asyncpg pool whose public ``acquire()`` is timed by ``metrics``.
+
+    The query shortcuts (``fetch``, ``execute`` and friends) acquire through
+    it as asyncpg's own do; anything else is passed to the pool.
+    """
+
+    def __init__(self, pool, metrics: PoolMetrics):
+        self.pool = pool
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.pool, name)
+
+    def acquire(self, **kwargs) -> _TimedAcquire:
+        return _TimedAcquire(self.metrics, self.pool.acquire(**kwargs))
+
+    async def execute(self, *args, **kwargs):
+        async with self.acquire() as conn:
+            return await conn.execute(*args, **kwargs)
+
+    async def executemany(self, *args, **kwargs):
+        async with self.acquire() as conn:
+            return await conn.executemany(*args, **kwargs)
+
+    async def fetch(self, *args, **kwargs):
+        async with self.acquire() as conn:
+            return await conn.fetch(*args, **kwargs)
+
+    async def fetchrow(self, *args, **kwargs):
+        async with self.acquire() as conn:
+            return await conn.fetchrow(*args, **kwargs)
+
+    async def fetchval(self, *args, **kwargs):
+        async with self.acquire() as conn:
+            return await conn.fetchval(*args, **kwargs)
+
+
+pool_metrics = PoolMetrics()
+
+
+def _database_settings():
+    # pydantic is only needed once a connection is made, not at import
+    from api.config import get_database_settings
+
+    return get_database_settings()
+
+
+def connect_options(config=None) -> dict:
+    """Return ``asyncpg.connect`` options for a standalone connection."""
+    config = config or _database_settings()
+    return {
+        "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        "command_timeout": config.DB_COMMAND_TIMEOUT,
+        "server_settings": {"search_path": config.DB_SEARCH_PATH},
+    }
+
+
+def pool_options(config=None) -> dict:
+    """Return the ``asyncpg.create_pool`` options from ``DatabaseSettings``."""
+    config = config or _database_settings()
+    return {
+        **connect_options(config),
+        # Lowering only the maximum must not leave asyncpg a minimum above it
+        "min_size": min(config.DB_POOL_MIN_SIZE, config.DB_POOL_MAX_SIZE),
+        "max_size": config.DB_POOL_MAX_SIZE,
+        "max_queries": config.DB_MAX_QUERIES,
+        "max_inactive_connection_lifetime": config.DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+    }
+
+
 async def init_db(app: FastAPI):
     """
     Initialise a connection pool and attach it to the FastAPI app.
 
     The `register_vector` callback tells asyncpg how to decode/encode
-    the Postgres `vector` type (provided by the pgvector extension).
+    the Postgres `vector` type (provided by the pgvector extension), in
+    binary and as float32 arrays.
+    Sizing, statement cache, connection lifetime and command timeout come
+    from the ``DB_*`` settings in ``api.config``.
     """
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise RuntimeError("DATABASE_URL is not set")
 
     # `init=` is run once for every new connection in the pool
-    app.state.pool = await asyncpg.create_pool(
+    pool = await asyncpg.create_pool(
         dsn=database_url,
-        init=init_connection,     # ← updated to use our custom init function
-        # optional pool sizing (tweak to your needs)
-        # min_size=1,
-        # max_size=10,
+        init=init_connection,
+        **pool_options(),
     )
+    app.state.pool = pool_metrics.instrument(pool)
     return app.state.pool
 
 
+def pool_stats(pool, metrics: PoolMetrics = pool_metrics) -> dict:
+    """Return connection counts of ``pool`` for metrics.
+
+    ``waiting`` counts tasks in ``acquire``, as tracked by ``metrics``;
+    asyncpg does not expose it.
+    """
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    return {
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "min": pool.get_min_size(),
+        "max": pool.get_max_size(),
+        "waiting": metrics.waiting,
+    }
+
+
 async def close_db(app: FastAPI):
     """Close the connection pool stored on the FastAPI app."""
     pool = getattr(app.state, "pool", None)
@@ -2,23 +2,24 @@
 set -e
 
 # Start TorchServe in the background
-# Use the config file for model loading if possible, or specify models here
-# For simplicity, and since your config.properties has load_models=all,
-# we can rely on that, or be explicit here.
 # Let's be explicit to match your model file name 'where.mar'.
-echo "INFO: Starting TorchServe with model where=where.mar"
+# The config holds the model's batchSize/maxBatchDelay, which the API's
+# micro-batcher relies on; without it TorchServe infers one image at a time.
+TS_CONFIG="${TORCHSERVE_CONFIG_FILE:-/app/config/config.properties}"
+echo "INFO: Starting TorchServe with model where=where.mar and config ${TS_CONFIG}"
 torchserve --start \
   --model-store /model-store \
   --models where=where.mar \
+  --ts-config "${TS_CONFIG}" \
   --ncs & # ncs = no config snapshot
-TS_PID=$!
 
-# It's better to wait for TorchServe to be ready by polling its health endpoint
-# rather than a fixed sleep. However, for simplicity, we'll keep sleep for now
-# but acknowledge it's not the most robust way.
-echo "INFO: Waiting for TorchServe to initialize..."
-sleep 15 # Increased sleep slightly, adjust as needed or implement polling
-
-echo "INFO: Starting FastAPI on port 8000"
+# No fixed sleep: the API starts right away, waits for the "where" model to
+# report a READY worker, warms the DB pool and sends a warm-up inference.
+# GET /health/ready answers 503 until that is done and the startup timeline
+# is logged (see STARTUP_* in api/README.md).
+# api.serve loads the app and its read-only data once, then forks
+# WEB_CONCURRENCY uvicorn workers (one per CPU by default) whose pools share
+# DB_CONNECTION_BUDGET. Send SIGHUP to replace the workers one at a time.
+echo "INFO: Starting FastAPI on port 8000 with ${WEB_CONCURRENCY:-one per CPU} workers"
 # Run the API using Poetry's environment
-exec uvicorn api.main:app --host 0.0.0.0 --port 8000
+exec python -m api.serve --host 0.0.0.0 --port 8000
@@ -0,0 +1,39 @@
+"""Modules imported on first attribute access, to keep ``import api.main`` cheap."""
+
+import importlib.util
+import sys
+from typing import Any, Iterable, List
+
+
+def lazy_import(name: str, fallback: Any = None) -> Any:
+    """Return module ``name``, executed only when one of its attributes is used.
+
+    Modules that are already imported are returned as they are. When the
+    module is not installed, ``fallback`` is returned if given, otherwise
+    ``ModuleNotFoundError`` is raised right away as a plain import would.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        if fallback is not None:
+            return fallback
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def missing_modules(names: Iterable[str]) -> List[str]:
+    """Return those of ``names`` that are not installed, without importing any."""
+    return [name for name in names if name not in sys.modules and importlib.util.find_spec(name) is None]
+
+
+def is_loaded(name: str) -> bool:
+    """Whether ``name`` has been imported and executed, not just made lazy."""
+    module = sys.modules.get(name)
+    # LazyLoader swaps the module's class back to ModuleType once it has run
+    return module is not None and type(module).__name__ != "_LazyModule"
@@ -5,20 +5,85 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.append(str(ROOT))
 
+# Imported first so the startup timeline includes importing the app
+from api.services.startup import run_startup, startup
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes.predict import router as predict_router
-from api.middleware import EphemeralUploadMiddleware, RateLimitMiddleware
-from api.db import init_db, close_db
-import requests
+from api.lazy import missing_modules
+from api.routes.predict import OPENAI_API_KEY, router as predict_router
+from api.routes.jobs import router as jobs_router
+from api.routes.search import router as search_router
+from api.middleware import EphemeralUploadMiddleware, RateLimitMiddleware, RequestMetricsMiddleware
+from api.middleware.ratelimit import SlidingWindowLimiter, parse_costs
+from api.db import init_db, close_db, pool_metrics, pool_stats
+from api.services import torchserve
+from api.services.admission import predict_admission
+from api.services.breaker import breaker_states
+from api.services.gazetteer import gazetteer
+from api.services.geocode_cache import geocode_cache
+from api.services.health import health_monitor
+from api.services.jobs import job_manager
+from api.services.metrics import METRICS_CONTENT_TYPE, render_metrics
+from api.services.prediction_log import prediction_log
+from api.services.rate_limits import RATE_LIMIT_WORKERS, SharedRateLimiter
+from api.services.reverse_geocoder import reverse_geocoder
+from api.services.timing import stage_latency
+import asyncio
+import logging
 import os
 
+# uvicorn only configures its own loggers; show ours, e.g. the startup timeline
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("api").setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+
+# Imported on first use (api/lazy.py); checked at startup so a missing one
+# fails the process rather than the first prediction
+REQUIRED_MODULES = ("numpy", "requests", "httpx", "asyncpg", "pgvector")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await init_db(app)
+    startup.mark("import")
+    with startup.step("dependencies"):
+        missing = missing_modules(REQUIRED_MODULES + (("openai",) if OPENAI_API_KEY else ()))
+        if missing:
+            raise RuntimeError(f"Missing dependencies: {', '.join(missing)}")
+    with startup.step("db_pool"):
+        await init_db(app)
+    with startup.step("gazetteer"):
+        if not gazetteer.loaded:
+            try:
+                gazetteer.load()
+            except OSError as e:
+                print(f"Gazetteer not loaded, geocoding with Nominatim only: {e}")
+    with startup.step("reverse_geocoder"):
+        if not reverse_geocoder.built:
+            reverse_geocoder.build_from(gazetteer)
+    await prediction_log.start(app.state.pool)
+    with startup.step("geocode_cache"):
+        await geocode_cache.start(app.state.pool)
+    if isinstance(rate_limiter, SharedRateLimiter):
+        await rate_limiter.start(app.state.pool)
+    await torchserve.start()
+    await job_manager.start(getattr(app.state, "pool", None))
+    await health_monitor.start(getattr(app.state, "pool", None))
+    # Requests are served meanwhile; /health/ready stays 503 until this finishes
+    warmup = asyncio.create_task(
+        run_startup(getattr(app.state, "pool", None), startup, on_ready=health_monitor.probe)
+    )
     yield
+    warmup.cancel()
+    await health_monitor.stop()
+    await job_manager.stop()
+    await torchserve.stop()
+    # Flush buffered predictions and cache entries before the pool goes away
+    await prediction_log.stop()
+    await geocode_cache.stop()
+    if isinstance(rate_limiter, SharedRateLimiter):
+        await rate_limiter.stop()
     await close_db(app)
 
 
@@ -39,56 +104,103 @@ app.add_middleware(EphemeralUploadMiddleware)
 # Default: 10 requests/24hrs → Production: 1000 requests/1hr (via env vars)
 rate_limit = int(os.getenv('RATE_LIMIT_REQUESTS', '10'))
 rate_period = int(os.getenv('RATE_LIMIT_PERIOD', '86400'))  # 24 hours default
-app.add_middleware(RateLimitMiddleware, limit=rate_limit, period=rate_period)
+# Forked workers each keep their own memory counts, so several share the limit through Postgres
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'postgres' if RATE_LIMIT_WORKERS > 1 else 'memory')
+if RATE_LIMIT_BACKEND == 'postgres':
+    # Counts are shared with other workers and replicas through the rate_limits table
+    rate_limiter = SharedRateLimiter(rate_limit, rate_period)
+else:
+    rate_limiter = SlidingWindowLimiter(
+        rate_limit, rate_period, max_keys=int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+    )
+# Predictions cost 1 per image so RATE_LIMIT_REQUESTS still counts them; reads cost less
+app.add_middleware(
+    RateLimitMiddleware,
+    limiter=rate_limiter,
+    costs=parse_costs(os.getenv(
+        'RATE_LIMIT_COSTS', '/predict=1,POST /jobs=1,/search/embedding=1'
+    )),
+    default_cost=float(os.getenv('RATE_LIMIT_DEFAULT_COST', '0.2')),
+    exempt_paths=os.getenv(
+        'RATE_LIMIT_EXEMPT_PATHS', '/,/health,/health/live,/health/ready,/metrics'
+    ).split(','),
+)
+# Outermost, so requests turned away by the rate limiter are counted too
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(predict_router)
+app.include_router(jobs_router)
+app.include_router(search_router)
 
 @app.get("/")
 def read_root():
     return {"message": "Hello World"}
 
 
-TORCHSERVE_MANAGEMENT_URL = os.getenv('TORCHSERVE_MANAGEMENT_URL', 'http://localhost:8081')
-
-
 @app.get("/health")
-def health_check():
-    """Report FastAPI and TorchServe status."""
-    torchserve_status = 'unhealthy'
-    models_data = {}
-
-    try:
-        # Use requests library which handles connection better
-        response = requests.get(f'{TORCHSERVE_MANAGEMENT_URL}/models', timeout=10)
-
-        if response.status_code == 200:
-            models_data = response.json()
-            # Check if models are loaded
-            if models_data.get("models") and len(models_data["models"]) > 0:
-                # Check specifically for the "where" model
-                model_names = [model.get("modelName") for model in models_data.get("models", [])]
-                if "where" in model_names:
-                    torchserve_status = 'healthy'
-                else:
-                    torchserve_status = f'unhealthy - "where" model not found. Found models: {model_names}'
-            else:
-                torchserve_status = 'unhealthy - no models loaded'
-        else:
-            torchserve_status = f'unhealthy, status: {response.status_code}, body: {response.text}'
-    except requests.exceptions.ConnectionError as e:
-        torchserve_status = f'unhealthy: connection error - {str(e)}'
-    except requests.exceptions.Timeout as e:
-        torchserve_status = f'unhealthy: timeout - {str(e)}'
-    except Exception as e:
-        torchserve_status = f'unhealthy: {str(e)}'
+async def health_check():
+    """Report FastAPI and dependency status.
 
+    Dependencies are probed in the background every
+    ``HEALTH_PROBE_INTERVAL`` seconds; this only returns their last result.
+    """
+    pool = getattr(app.state, "pool", None)
     return {
         "fastapi_status": "healthy",
-        "torchserve_status": torchserve_status,
-        "torchserve_models": models_data,
+        "torchserve_status": health_monitor.torchserve_status(),
+        "torchserve_models": health_monitor.models,
+        "dependencies": health_monitor.snapshot(),
+        "startup": startup.snapshot(),
+        "circuit_breakers": breaker_states(),
+        "gazetteer": gazetteer.snapshot(),
+        "geocode_cache": geocode_cache.snapshot(),
+        "prediction_log": prediction_log.snapshot(),
+        "jobs": job_manager.snapshot(),
+        "torchserve_batcher": torchserve.embedding_batcher.snapshot(),
+        "reverse_geocoder": reverse_geocoder.snapshot(),
+        "rate_limit": rate_limiter.snapshot(),
+        "latency": stage_latency.snapshot(),
+        "admission": predict_admission.snapshot(),
+        "db_pool": {**pool_stats(pool), **pool_metrics.snapshot()} if pool is not None else None,
         "message": "API is operational",
     }
 
 
-
-
+@app.get("/health/live")
+async def liveness():
+    """Answer as long as the event loop is serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Return 200 once startup has finished and TorchServe and the database
+    answer their probes, else 503. A startup that gave up after its retries
+    leaves readiness to the probes."""
+    checks = {name: check["status"] for name, check in health_monitor.checks.items()}
+    if startup.finished and health_monitor.ready():
+        return {"status": "ready", "checks": checks}
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "not_ready",
+            "startup_complete": startup.complete,
+            "startup_error": startup.error,
+            "startup_retrying": startup.retrying,
+            "checks": checks,
+            "age_seconds": health_monitor.snapshot()["age_seconds"],
+        },
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose stage latencies, request counts and pool, cache, rate-limit
+    and TorchServe dispatch gauges in the Prometheus text format."""
+    pool = getattr(app.state, "pool", None)
+    return Response(
+        render_metrics(
+            pool_stats(pool) if pool is not None else None, rate_limiter, torchserve.embedding_batcher
+        ),
+        media_type=METRICS_CONTENT_TYPE,
+    )
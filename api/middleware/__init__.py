@@ -1,4 +1,5 @@
 from .ephemeral import EphemeralUploadMiddleware
+from .metrics import RequestMetricsMiddleware
 from .ratelimit import RateLimitMiddleware
 
-__all__ = ["EphemeralUploadMiddleware", "RateLimitMiddleware"]
+__all__ = ["EphemeralUploadMiddleware", "RateLimitMiddleware", "RequestMetricsMiddleware"]
@@ -1,25 +1,173 @@
+import asyncio
+import logging
 import os
 import tempfile
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
 
+from api.services.timing import REQUEST_TIMING_STATE
 
-class EphemeralUploadMiddleware(BaseHTTPMiddleware):
-    """Save request body to a temporary file and remove it after the response."""
+logger = logging.getLogger(__name__)
 
-    async def dispatch(self, request: Request, call_next):
-        body = await request.body()
-        request._body = body
-        fd, path = tempfile.mkstemp(dir="/tmp", prefix="upload_", suffix=".bin")
-        with os.fdopen(fd, "wb") as tmp:
-            tmp.write(body)
-        print(f"Saved upload to {path}")
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+# Only these routes take image uploads; everything else passes straight through
+UPLOAD_PATHS = [p for p in os.getenv('EPHEMERAL_UPLOAD_PATHS', '/predict,/jobs').split(',') if p]
+# Bodies up to this size stay in memory, larger ones are spooled to disk
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY', str(1024 * 1024)))
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', '/tmp')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class SpooledUpload:
+    """Request body kept in memory up to ``max_memory`` bytes, then on disk.
+
+    The in-memory part keeps the received chunks as they are. Once the body
+    grows past the threshold it is moved to a temporary file; file writes,
+    reads and the final deletion all run in a worker thread.
+    """
+
+    def __init__(self, max_memory: int = UPLOAD_SPOOL_MAX_MEMORY, directory: str = UPLOAD_DIR):
+        self.max_memory = max_memory
+        self.directory = directory
+        self.size = 0
+        self.path: Optional[str] = None
+        self._chunks: List[bytes] = []
+        self._file: Any = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._file is not None
+
+    async def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self._file is None and self.size <= self.max_memory:
+            self._chunks.append(chunk)
+            return
+        if self._file is None:
+            await asyncio.to_thread(self._rollover)
+        await asyncio.to_thread(self._file.write, chunk)
+
+    def _rollover(self) -> None:
+        fd, self.path = tempfile.mkstemp(dir=self.directory, prefix="upload_", suffix=".bin")
+        self._file = os.fdopen(fd, "w+b")
+        self._file.writelines(self._chunks)
+        self._chunks = []
+        logger.debug("Saved upload to %s", self.path)
+
+    async def chunks(self, release: bool = False):
+        """Yield the body again from the start.
+
+        With ``release``, in-memory chunks are dropped as they are yielded
+        so the receiver's copy does not add to a full one kept here.
+        """
+        if self._file is None:
+            if release:
+                while self._chunks:
+                    yield self._chunks.pop(0)
+                return
+            for chunk in self._chunks:
+                yield chunk
+            return
+        await asyncio.to_thread(self._file.seek, 0)
+        while True:
+            chunk = await asyncio.to_thread(self._file.read, READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    async def close(self) -> None:
+        """Drop the buffered body and delete its file, if any."""
+        self._chunks = []
+        if self._file is not None:
+            await asyncio.to_thread(self._remove)
+
+    def _remove(self) -> None:
+        self._file.close()
+        self._file = None
         try:
-            response = await call_next(request)
+            os.unlink(self.path)
+            logger.debug("Deleted upload %s", self.path)
+        except FileNotFoundError:
+            pass
+
+
+class EphemeralUploadMiddleware:
+    """Buffer upload request bodies and delete them once the response is sent.
+
+    Pure ASGI middleware that only handles ``POST`` requests to ``paths``
+    (prefix match); other requests are passed through untouched. The body is
+    read into a :class:`SpooledUpload` before the route runs and replayed to
+    it, so large uploads never sit in memory as a whole. The buffer is
+    released as it is replayed, and the temporary file for large bodies is
+    removed once the route has read the whole body; both are also cleaned
+    up when the route fails or the client disconnects. The time spent
+    buffering is left in the scope state for the route's stage timer.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        paths: Sequence[str] = UPLOAD_PATHS,
+        max_memory: int = UPLOAD_SPOOL_MAX_MEMORY,
+        directory: str = UPLOAD_DIR,
+    ):
+        self.app = app
+        self.paths = tuple(paths)
+        self.max_memory = max_memory
+        self.directory = directory
+
+    def applies_to(self, scope: Message) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope.get("method") == "POST"
+            and scope.get("path", "").startswith(self.paths)
+        )
+
+    async def __call__(self, scope: Message, receive: Receive, send: Send) -> None:
+        if not self.applies_to(scope):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        upload = SpooledUpload(self.max_memory, self.directory)
+        try:
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                await upload.write(message.get("body", b""))
+                more_body = message.get("more_body", False)
+
+            handed_on = time.perf_counter()
+            scope.setdefault("state", {})[REQUEST_TIMING_STATE] = {
+                "started": started,
+                "stages": {"buffer": handed_on - started},
+                "handed_on": handed_on,
+            }
+
+            chunks = upload.chunks(release=True)
+            replayed = False
+
+            async def replay_receive() -> Message:
+                nonlocal replayed
+                if replayed:
+                    # Body fully replayed; further calls wait for the disconnect
+                    return await receive()
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    replayed = True
+                    # The route's parser holds its own copy now
+                    await upload.close()
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                return {"type": "http.request", "body": chunk, "more_body": True}
+
+            await self.app(scope, replay_receive, send)
         finally:
-            try:
-                os.unlink(path)
-                print(f"Deleted upload {path}")
-            except FileNotFoundError:
-                pass
-        return response
+            await upload.close()
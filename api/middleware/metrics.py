@@ -0,0 +1,76 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from api.services.admission import CLIENT_CLOSED_REQUEST
+from api.services.metrics import PREDICTION_SOURCE_STATE, RequestMetrics, outcome_of, request_metrics
+
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+# Routes counted in requests_total; a method before the path limits the entry to it
+METRICS_ROUTES = os.getenv(
+    'METRICS_ROUTES', '/predict,/predict/stream,/predict/batch,/search/embedding,POST /jobs'
+).split(',')
+
+
+def parse_routes(routes: Iterable[str]) -> Dict[Tuple[Optional[str], str], str]:
+    """Map ``(method, path)`` to the route label for ``"/predict"``-style entries."""
+    parsed = {}
+    for route in routes:
+        method, _, path = route.strip().rpartition(' ')
+        if path:
+            parsed[(method.strip().upper() or None, path)] = path
+    return parsed
+
+
+class RequestMetricsMiddleware:
+    """Count requests to ``routes`` by outcome and source, and those in flight.
+
+    Pure ASGI middleware; other paths pass straight through. The outcome
+    follows the response status (see :func:`outcome_of`), a request that
+    raised before answering is an ``error`` and one cancelled by a client
+    disconnect is ``cancelled``. A route may name the prediction source in
+    ``scope["state"][PREDICTION_SOURCE_STATE]``; it is ``none`` otherwise.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        routes: Iterable[str] = METRICS_ROUTES,
+        metrics: RequestMetrics = request_metrics,
+    ):
+        self.app = app
+        self.routes = parse_routes(routes)
+        self.metrics = metrics
+
+    def route_of(self, scope: Message) -> Optional[str]:
+        if scope["type"] != "http":
+            return None
+        path = scope.get("path", "")
+        return self.routes.get((scope.get("method"), path)) or self.routes.get((None, path))
+
+    async def __call__(self, scope: Message, receive: Receive, send: Send) -> None:
+        route = self.route_of(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.started()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except asyncio.CancelledError:
+            status = CLIENT_CLOSED_REQUEST
+            raise
+        finally:
+            source = scope.get("state", {}).get(PREDICTION_SOURCE_STATE, "none")
+            self.metrics.finished(route, outcome_of(status), source)
@@ -1,27 +1,251 @@
+import math
+import sys
 import time
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from array import array
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory token bucket rate limiter per client IP."""
+RATE_LIMIT_MAX_KEYS = 100_000
+# Slots inspected for idle keys on every request
+SWEEP_STEPS = 2
 
-    def __init__(self, app, limit: int = 10, period: int = 86400):
-        super().__init__(app)
+
+class SlidingWindowLimiter:
+    """Sliding-window request counter per client with a fixed memory ceiling.
+
+    Each client gets a slot in a set of preallocated-on-demand arrays holding
+    the counts of the current and previous fixed window; the sliding count is
+    the previous window weighted by how much of it still overlaps, plus the
+    current one. At most ``max_keys`` clients are tracked. A clock hand
+    sweeps a few slots per request and frees clients idle for two periods
+    (their counts have expired anyway); when every slot is taken, the sweep
+    evicts the first client not seen since the hand last passed it.
+    """
+
+    def __init__(self, limit: float = 10, period: float = 86400, max_keys: int = RATE_LIMIT_MAX_KEYS):
         self.limit = limit
         self.period = period
-        self.buckets: dict[str, tuple[int, float]] = {}
-
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host if request.client else "unknown"
-        now = time.time()
-        tokens, last = self.buckets.get(client_ip, (self.limit, now))
-        if now - last > self.period:
-            tokens = self.limit
-            last = now
-        if tokens <= 0:
-            return Response("Too Many Requests", status_code=429)
-        tokens -= 1
-        self.buckets[client_ip] = (tokens, last)
-        return await call_next(request)
+        self.max_keys = max_keys
+
+        self._slots: Dict[str, int] = {}
+        self._keys: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._window = array('d')   # index of the current fixed window
+        self._current = array('d')  # cost used in the current window
+        self._previous = array('d')  # cost used in the previous window
+        self._last_seen = array('d')
+        self._referenced = bytearray()
+        self._hand = 0
+        self.stats = {"allowed": 0, "rejected": 0, "idle_evictions": 0, "pressure_evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def hit(self, key: str, cost: float = 1.0, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Charge ``cost`` to ``key``.
+
+        Returns whether the request is allowed and, if not, the number of
+        seconds after which it would be.
+        """
+        now = time.time() if now is None else now
+        self._sweep(now, SWEEP_STEPS)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._allocate(key, now)
+        self._last_seen[slot] = now
+        self._referenced[slot] = 1
+
+        window = now // self.period
+        if self._window[slot] != window:
+            stale = self._window[slot] != window - 1
+            self._previous[slot] = 0.0 if stale else self._current[slot]
+            self._current[slot] = 0.0
+            self._window[slot] = window
+
+        overlap = 1.0 - (now - window * self.period) / self.period
+        used = self._previous[slot] * overlap + self._current[slot]
+        if used + cost > self.limit:
+            self.stats["rejected"] += 1
+            return False, self._retry_after(slot, overlap, cost)
+        self._current[slot] += cost
+        self.stats["allowed"] += 1
+        return True, 0.0
+
+    async def acquire(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Async form of :meth:`hit`, shared with the Postgres-backed limiter."""
+        return self.hit(key, cost)
+
+    def _retry_after(self, slot: int, overlap: float, cost: float) -> float:
+        # Time until enough of the previous window has slid out, else until the next window
+        previous, current = self._previous[slot], self._current[slot]
+        excess = previous * overlap + current + cost - self.limit
+        if previous > 0 and current + cost <= self.limit:
+            return math.ceil(excess / previous * self.period)
+        return math.ceil(overlap * self.period)
+
+    def _allocate(self, key: str, now: float) -> int:
+        if self._free:
+            slot = self._free.pop()
+        elif len(self._keys) < self.max_keys:
+            slot = len(self._keys)
+            self._keys.append(None)
+            for column in (self._window, self._current, self._previous, self._last_seen):
+                column.append(0.0)
+            self._referenced.append(0)
+        else:
+            slot = self._evict_one(now)
+        self._keys[slot] = key
+        self._slots[key] = slot
+        self._window[slot] = -1.0
+        self._current[slot] = self._previous[slot] = 0.0
+        return slot
+
+    def _release(self, slot: int, counter: str) -> None:
+        del self._slots[self._keys[slot]]
+        self._keys[slot] = None
+        self._free.append(slot)
+        self.stats[counter] += 1
+
+    def _sweep(self, now: float, steps: int) -> None:
+        size = len(self._keys)
+        if not size:
+            return
+        idle_before = now - 2 * self.period
+        for _ in range(min(steps, size)):
+            slot = self._hand
+            self._hand = (slot + 1) % size
+            if self._keys[slot] is not None and self._last_seen[slot] < idle_before:
+                self._release(slot, "idle_evictions")
+
+    def _evict_one(self, now: float) -> int:
+        size = len(self._keys)
+        for _ in range(2 * size):
+            slot = self._hand
+            self._hand = (slot + 1) % size
+            if self._referenced[slot]:
+                self._referenced[slot] = 0
+                continue
+            self._release(slot, "pressure_evictions")
+            return self._free.pop()
+        # Unreachable: the second pass finds every reference bit cleared
+        raise RuntimeError("No rate limit slot could be evicted")
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the limiter's tables."""
+        columns = (self._window, self._current, self._previous, self._last_seen)
+        return (
+            sum(c.buffer_info()[1] * c.itemsize for c in columns)
+            + len(self._referenced)
+            + sys.getsizeof(self._slots)
+            + sys.getsizeof(self._keys)
+            + sum(sys.getsizeof(k) for k in self._slots)
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "keys": len(self._slots),
+            "max_keys": self.max_keys,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+def parse_costs(spec: str) -> Dict[str, float]:
+    """Parse ``"/predict=5,POST /jobs=2"`` into a route to cost map.
+
+    A route is a path prefix, optionally preceded by the one method it
+    applies to.
+    """
+    costs = {}
+    for item in spec.split(','):
+        if '=' in item:
+            path, cost = item.split('=', 1)
+            costs[path.strip()] = float(cost)
+    return costs
+
+
+class RateLimitMiddleware:
+    """Sliding-window rate limiter per client IP.
+
+    Pure ASGI middleware. Counting is done by ``limiter``, a
+    :class:`SlidingWindowLimiter` by default or any object with the same
+    ``acquire`` coroutine. Requests to ``exempt_paths`` are not counted.
+    Every other request costs ``default_cost``, or the cost of the longest
+    matching route in ``costs`` (a path prefix, optionally qualified by a
+    method as in ``"POST /jobs"``), out of a budget of ``limit`` per
+    ``period`` seconds. Rejected requests get ``429`` with ``Retry-After``.
+
+    Allowed requests carry ``(limiter, client, cost)`` in
+    ``scope["rate_limit"]`` so a route can charge per item with
+    :func:`charge_items`.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        limit: float = 10,
+        period: float = 86400,
+        limiter: Optional[Any] = None,
+        costs: Optional[Mapping[str, float]] = None,
+        default_cost: float = 1.0,
+        exempt_paths: Iterable[str] = (),
+    ):
+        self.app = app
+        self.limiter = limiter or SlidingWindowLimiter(limit, period)
+        routes = []
+        for route, cost in (costs or {}).items():
+            method, _, prefix = route.strip().rpartition(' ')
+            routes.append((method.strip().upper() or None, prefix, cost))
+        # Longest prefix first; on a tie, the method-qualified route
+        self.costs = sorted(routes, key=lambda r: (len(r[1]), r[0] is not None), reverse=True)
+        self.default_cost = default_cost
+        self.exempt_paths = frozenset(exempt_paths)
+
+    def cost_of(self, path: str, method: Optional[str] = None) -> float:
+        for route_method, prefix, cost in self.costs:
+            if path.startswith(prefix) and route_method in (None, method):
+                return cost
+        return self.default_cost
+
+    async def __call__(self, scope: Message, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        key = client[0] if client else "unknown"
+        cost = self.cost_of(path, scope.get("method"))
+        allowed, retry_after = await self.limiter.acquire(key, cost)
+        if allowed:
+            scope["rate_limit"] = (self.limiter, key, cost)
+            await self.app(scope, receive, send)
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"retry-after", str(max(1, int(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b"Too Many Requests"})
+
+
+async def charge_items(scope: Message, count: int) -> Tuple[bool, float]:
+    """Charge the route's cost for each of ``count`` items after the first.
+
+    :class:`RateLimitMiddleware` charges one item before the request is
+    read; a route taking many, like ``/predict/batch``, calls this once it
+    has counted them. Returns ``(allowed, retry_after)``, always allowed for
+    a request that did not pass through the middleware.
+    """
+    charged = scope.get("rate_limit")
+    if charged is None or count <= 1:
+        return True, 0.0
+    limiter, key, cost = charged
+    return await limiter.acquire(key, cost * (count - 1))
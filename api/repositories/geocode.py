@@ -0,0 +1,48 @@
+from typing import Any, Iterable, List, Optional, Tuple
+
+# (query, lat, lon, found)
+GeocodeRow = Tuple[str, Optional[float], Optional[float], bool]
+
+UPSERT_GEOCODE_SQL = """
+    INSERT INTO geocode_cache (query, lat, lon, found, updated_at)
+    VALUES ($1, $2, $3, $4, now())
+    ON CONFLICT (query) DO UPDATE
+    SET lat = EXCLUDED.lat, lon = EXCLUDED.lon, found = EXCLUDED.found, updated_at = now()
+"""
+
+# Rows still within their TTL, with their age so the memory tier can expire them too
+_FRESH = """
+    updated_at > now() - (CASE WHEN found THEN ${ttl} ELSE ${negative_ttl} END) * interval '1 second'
+"""
+
+
+async def get_geocode(pool: Any, query: str, ttl: float, negative_ttl: float) -> Optional[Any]:
+    """Return the cached row for ``query`` if it has not expired."""
+    return await pool.fetchrow(
+        "SELECT lat, lon, found, EXTRACT(EPOCH FROM now() - updated_at) AS age"
+        " FROM geocode_cache WHERE query = $1 AND" + _FRESH.format(ttl=2, negative_ttl=3),
+        query, ttl, negative_ttl,
+    )
+
+
+async def most_frequent_geocodes(pool: Any, limit: int, ttl: float, negative_ttl: float) -> List[Any]:
+    """Return up to ``limit`` unexpired rows, most frequently hit first."""
+    return await pool.fetch(
+        "SELECT query, lat, lon, found, EXTRACT(EPOCH FROM now() - updated_at) AS age"
+        " FROM geocode_cache WHERE" + _FRESH.format(ttl=1, negative_ttl=2)
+        + " ORDER BY hits DESC LIMIT $3",
+        ttl, negative_ttl, limit,
+    )
+
+
+async def upsert_geocodes(pool: Any, rows: Iterable[GeocodeRow]) -> None:
+    """Insert or refresh many cached lookups in one batched round trip."""
+    await pool.executemany(UPSERT_GEOCODE_SQL, rows)
+
+
+async def add_geocode_hits(pool: Any, hits: Iterable[Tuple[str, int]]) -> None:
+    """Add hit counts gathered in memory to the cached rows."""
+    await pool.executemany(
+        "UPDATE geocode_cache SET hits = hits + $2, last_hit = now() WHERE query = $1",
+        hits,
+    )
@@ -0,0 +1,37 @@
+from typing import Any, Optional
+
+# Write a job's state, never moving it back: a worker may record "running"
+# before the submitter's "queued" row lands
+SAVE_JOB_SQL = """
+    INSERT INTO jobs (id, status, created_at, started_at, finished_at, result, error)
+    VALUES ($1, $2, to_timestamp($3), to_timestamp($4), to_timestamp($5), $6::jsonb, $7::jsonb)
+    ON CONFLICT (id) DO UPDATE SET
+        status = EXCLUDED.status,
+        started_at = EXCLUDED.started_at,
+        finished_at = EXCLUDED.finished_at,
+        result = EXCLUDED.result,
+        error = EXCLUDED.error
+    WHERE jobs.status = 'queued' OR (jobs.status = 'running' AND EXCLUDED.status <> 'queued')
+"""
+
+
+async def save_job(pool: Any, job_id: str, status: str, created_at: float, started_at: Optional[float],
+                   finished_at: Optional[float], result: Optional[str], error: Optional[str]) -> None:
+    """Insert or advance a job's row; ``result`` and ``error`` are JSON text."""
+    await pool.execute(SAVE_JOB_SQL, job_id, status, created_at, started_at, finished_at, result, error)
+
+
+async def get_job(pool: Any, job_id: str, ttl: float) -> Optional[Any]:
+    """Return a job's row unless it finished more than ``ttl`` seconds ago."""
+    return await pool.fetchrow(
+        "SELECT id, status, EXTRACT(EPOCH FROM created_at) AS created_at,"
+        " EXTRACT(EPOCH FROM started_at) AS started_at, EXTRACT(EPOCH FROM finished_at) AS finished_at,"
+        " result::text AS result, error::text AS error"
+        " FROM jobs WHERE id = $1 AND (finished_at IS NULL OR finished_at > now() - $2 * interval '1 second')",
+        job_id, ttl,
+    )
+
+
+async def delete_stale_jobs(pool: Any, before: float) -> None:
+    """Remove jobs that finished, or were left unfinished by a lost worker, before ``before``."""
+    await pool.execute("DELETE FROM jobs WHERE COALESCE(finished_at, created_at) < to_timestamp($1)", before)
@@ -1,19 +1,24 @@
 import os
-from typing import Optional, Dict, Any
+from typing import Any, Dict, List, Optional, Sequence
 
-import asyncpg
+from api.db import connect_options, init_connection
+from api.lazy import lazy_import
+from api.vector import as_embedding, encode_vector
 
-from api.db import init_connection
-import numpy as np
+asyncpg = lazy_import("asyncpg")
+np = lazy_import("numpy")
 
 
-async def nearest(vec: np.ndarray) -> Optional[asyncpg.Record]:
+async def nearest(vec: "np.ndarray", pool: Any = None) -> "Optional[asyncpg.Record]":
     """Return the closest photo to the given vector.
 
     Parameters
     ----------
     vec: np.ndarray
         Embedding vector with dimension matching the ``vlad`` column.
+    pool: asyncpg.Pool | None
+        Pool to run the query on. A dedicated connection is opened when no
+        pool is given.
 
     Returns
     -------
@@ -21,19 +26,69 @@ async def nearest(vec: np.ndarray) -> Optional[asyncpg.Record]:
         Row containing ``lat``, ``lon`` and ``score`` fields or ``None`` if no
         data is found.
     """
+    query = (
+        "SELECT lat, lon, 1 - (vlad <#> $1) AS score "
+        "FROM photos ORDER BY vlad <#> $1 LIMIT 1"
+    )
+    if pool is not None:
+        return await pool.fetchrow(query, as_embedding(vec))
+
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise RuntimeError("DATABASE_URL is not set")
 
-    conn = await asyncpg.connect(dsn=database_url)
+    conn = await asyncpg.connect(dsn=database_url, **connect_options())
     await init_connection(conn)
     try:
-        row = await conn.fetchrow(
-            "SELECT lat, lon, 1 - (vlad <#> $1) AS score "
-            "FROM photos ORDER BY vlad <#> $1 LIMIT 1",
-            vec.tolist(),
-        )
-        return row
+        return await conn.fetchrow(query, as_embedding(vec))
     finally:
         await conn.close()
 
+
+
+async def nearest_many(vecs: "Sequence[np.ndarray]", pool: Any = None) -> "List[Optional[asyncpg.Record]]":
+    """Return the closest photo for each vector using a single query.
+
+    Parameters
+    ----------
+    vecs: Sequence[np.ndarray]
+        Embedding vectors with dimension matching the ``vlad`` column.
+    pool: asyncpg.Pool | None
+        Pool to run the query on. A dedicated connection is opened when no
+        pool is given.
+
+    Returns
+    -------
+    list[asyncpg.Record | None]
+        One entry per input vector, in input order.
+    """
+    if not vecs:
+        return []
+
+    query = (
+        "SELECT q.idx, p.lat, p.lon, 1 - (p.vlad <#> q.vec) AS score "
+        "FROM unnest($1::vector[]) WITH ORDINALITY AS q(vec, idx) "
+        "CROSS JOIN LATERAL ("
+        "SELECT lat, lon, vlad FROM photos ORDER BY vlad <#> q.vec LIMIT 1"
+        ") AS p"
+    )
+    # Pre-encoded, so asyncpg passes each vector to the codec as one element
+    args = [encode_vector(as_embedding(vec)) for vec in vecs]
+
+    if pool is not None:
+        rows = await pool.fetch(query, args)
+    else:
+        database_url = os.getenv("DATABASE_URL")
+        if not database_url:
+            raise RuntimeError("DATABASE_URL is not set")
+        conn = await asyncpg.connect(dsn=database_url, **connect_options())
+        await init_connection(conn)
+        try:
+            rows = await conn.fetch(query, args)
+        finally:
+            await conn.close()
+
+    results: List[Optional[asyncpg.Record]] = [None] * len(vecs)
+    for row in rows:
+        results[row["idx"] - 1] = row
+    return results
@@ -1,10 +1,21 @@
-import asyncpg
-from typing import Optional, Any
+from typing import Optional, Any, Iterable, Tuple
+
+INSERT_PREDICTION_SQL = (
+    "INSERT INTO photos (lat, lon, score, bias_warning, source) VALUES ($1, $2, $3, $4, $5)"
+)
+
+PredictionRow = Tuple[float, float, float, Optional[str], str]
+
 
 async def insert_prediction(pool: Any, lat: float, lon: float, score: float,
                             bias_warning: Optional[str], source: str) -> None:
     """Insert a prediction record into the photos table."""
     await pool.execute(
-        "INSERT INTO photos (lat, lon, score, bias_warning, source) VALUES ($1, $2, $3, $4, $5)",
+        INSERT_PREDICTION_SQL,
         lat, lon, score, bias_warning, source
     )
+
+
+async def insert_predictions(pool: Any, rows: Iterable[PredictionRow]) -> None:
+    """Insert many prediction records in one batched round trip."""
+    await pool.executemany(INSERT_PREDICTION_SQL, rows)
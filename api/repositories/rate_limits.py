@@ -0,0 +1,32 @@
+from typing import Any, List, Sequence
+
+# Add each client's count to its row, restarting the count when a newer
+# window begins, and return the resulting totals.
+ADD_RATE_LIMIT_COUNTS_SQL = """
+    INSERT INTO rate_limits (ip_address, request_count, window_start, last_request)
+    SELECT t.ip::inet, t.count, to_timestamp($3), now()
+    FROM unnest($1::text[], $2::int[]) AS t(ip, count)
+    ON CONFLICT (ip_address) DO UPDATE SET
+        request_count = CASE
+            WHEN rate_limits.window_start < EXCLUDED.window_start THEN EXCLUDED.request_count
+            ELSE rate_limits.request_count + EXCLUDED.request_count
+        END,
+        window_start = GREATEST(rate_limits.window_start, EXCLUDED.window_start),
+        last_request = now()
+    RETURNING host(ip_address) AS ip, request_count, EXTRACT(EPOCH FROM window_start) AS window_start
+"""
+
+
+async def add_rate_limit_counts(pool: Any, ips: Sequence[str], counts: Sequence[int],
+                                window_start: float) -> List[Any]:
+    """Add request counts for one window in a single round trip.
+
+    Returns the global ``ip``, ``request_count`` and ``window_start`` of
+    every row touched.
+    """
+    return await pool.fetch(ADD_RATE_LIMIT_COUNTS_SQL, list(ips), list(counts), window_start)
+
+
+async def delete_stale_rate_limits(pool: Any, before: float) -> None:
+    """Remove rows whose window started before ``before`` (epoch seconds)."""
+    await pool.execute("DELETE FROM rate_limits WHERE window_start < to_timestamp($1)", before)
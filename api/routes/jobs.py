@@ -0,0 +1,98 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from api.routes.predict import ALLOWED_TYPES, get_db_pool, read_upload, run_admitted, run_prediction
+from api.services.entitlement import lane_for
+from api.services.jobs import Job, JobQueueFull, job_manager
+
+router = APIRouter()
+
+# Comment lines keep idle SSE connections open through proxies
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+async def _get_job(job_id: str) -> Job:
+    job = await job_manager.lookup(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(photo: UploadFile = File(...), mode: Optional[str] = None, db_pool=Depends(get_db_pool),
+                     request: Request = None):
+    """
+    Queue a prediction for the uploaded photo and return its job id at once.
+
+    Poll ``GET /jobs/{job_id}`` or subscribe to ``GET /jobs/{job_id}/events``
+    to receive the result, which has the same shape as a ``/predict`` response.
+    A running job holds an admission slot in the submitter's lane; a job
+    shed by admission control fails with status ``503``.
+    """
+    if photo.content_type not in ALLOWED_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed types: {ALLOWED_TYPES}"
+        )
+    if not job_manager.running:
+        raise HTTPException(status_code=503, detail="Job workers are not running")
+
+    image_data = await read_upload(photo)
+    filename, content_type = photo.filename, photo.content_type
+    lane = lane_for(request)
+
+    async def work():
+        # The submitter is gone by now, so there is no client to watch
+        return await run_admitted(
+            None, lambda: run_prediction(image_data, filename, content_type, mode, db_pool), lane
+        )
+
+    try:
+        job = job_manager.submit(work)
+    except JobQueueFull as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": "5"},
+        )
+    # Recorded before answering so the job can be polled through any worker
+    await job_manager.save(job)
+
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Return the status of a job, and its result once finished."""
+    return (await _get_job(job_id)).to_dict()
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Stream job status as server-sent events until the job finishes."""
+    job = await _get_job(job_id)
+
+    async def events():
+        nonlocal job
+        yield f"event: status\ndata: {json.dumps({'job_id': job.id, 'status': job.status})}\n\n"
+        while not job.finished:
+            try:
+                job = await job_manager.wait(job, SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+        yield f"event: {job.status}\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
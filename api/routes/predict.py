@@ -1,20 +1,56 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request
-import requests
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from io import BytesIO
 import os
 import json
+import math
 import base64
 import types
+import asyncio
+import time
+import zipfile
 from dataclasses import dataclass, asdict
-from typing import Any, Dict, Optional
-import numpy as np
-from api.repositories.match import nearest
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from api.lazy import lazy_import
+from api.middleware.ratelimit import charge_items
+from api.repositories.match import nearest, nearest_many
 from api.repositories.photos import insert_prediction
+from api.services.admission import (
+    CLIENT_CLOSED_REQUEST,
+    ClientDisconnected,
+    Overloaded,
+    cancel_on_disconnect,
+    predict_admission,
+)
+from api.services.breaker import CircuitOpenError, nominatim_breaker, openai_breaker, torchserve_breaker
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.entitlement import lane_for
+from api.services.gazetteer import gazetteer
+from api.services.geocode_cache import geocode_cache
+from api.services.metrics import PREDICTION_SOURCE_STATE
+from api.services.prediction_log import prediction_log
+from api.services.reverse_geocoder import reverse_geocoder
+from api.services.timing import StageTimer, stage_latency
+from api.services.torchserve import (
+    RAW_IMAGE_HEADERS,
+    TORCHSERVE_TIMEOUT,
+    TorchServeError,
+    embedding_batcher,
+    parse_embedding,
+)
+from api.vector import as_embedding
 
+# Imported at first use; none of them is needed to serve health checks
+np = lazy_import("numpy")
+requests = lazy_import("requests")
+openai = lazy_import("openai", fallback=types.SimpleNamespace())
 
-async def query_geo(vec: np.ndarray) -> "GeoResult":
+T = TypeVar("T")
+
+
+async def query_geo(vec: "np.ndarray", db_pool: Any = None) -> "GeoResult":
     """Return geographic coordinates for a PatchNetVLAD embedding."""
-    row = await nearest(vec)
+    row = await nearest(vec, pool=db_pool)
     if row is None:
         raise HTTPException(status_code=404, detail="No match found")
     return GeoResult(lat=row["lat"], lon=row["lon"], score=row.get("score", 0.0))
@@ -83,27 +119,115 @@ def should_use_openai_fallback(geo_result: "GeoResult", filename: str = "") -> b
     return False
 
 
-try:
-    import openai as _openai
-except Exception:
-    _openai = types.SimpleNamespace()
-
-openai = _openai
-
 # Configure OpenAI credentials from environment if available
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+# Per-call caps; each call also gets no more than the request's remaining budget
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "15"))
+# Skip the optional OpenAI refinement when less than this is left
+OPENAI_MIN_BUDGET = float(os.getenv("OPENAI_MIN_BUDGET", "3"))
+NOMINATIM_TIMEOUT = float(os.getenv("NOMINATIM_TIMEOUT", "10"))
 
 router = APIRouter()
 
 TORCHSERVE_URL = os.getenv('TORCHSERVE_URL', 'http://localhost:8080')
 
+# Limits for /predict/batch
+BATCH_MAX_IMAGES = int(os.getenv('PREDICT_BATCH_MAX_IMAGES', '50'))
+BATCH_MAX_BYTES = int(os.getenv('PREDICT_BATCH_MAX_BYTES', str(100 * 1024 * 1024)))
+BATCH_CONCURRENCY = int(os.getenv('PREDICT_BATCH_CONCURRENCY', '8'))
+BATCH_SEARCH_CHUNK = int(os.getenv('PREDICT_BATCH_SEARCH_CHUNK', '16'))
+
 
 async def get_db_pool(request: Request):
     """Dependency to get database pool from app state."""
     return getattr(request.app.state, "pool", None)
 
 
+async def read_upload(photo: UploadFile) -> bytes:
+    """Read an uploaded file and release the parser's spooled copy of it.
+
+    The returned bytes are the only copy the pipeline keeps; they are sent
+    to TorchServe as the raw request body without being re-encoded.
+    """
+    data = await photo.read()
+    close = getattr(photo, "close", None)
+    if close is not None:
+        await close()
+    return data
+
+
+async def run_blocking(deadline: Deadline, stage: str, seconds: float,
+                       func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Run blocking ``func`` in a thread for at most ``seconds``.
+
+    Raises ``DeadlineExceeded`` if the request's budget ran out meanwhile,
+    else ``asyncio.TimeoutError``. A thread cannot be stopped, so one that
+    overruns finishes in the background and its result is dropped.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), seconds)
+    except asyncio.TimeoutError:
+        if deadline.remaining() <= 0:
+            deadline.record(stage, "failed")
+            raise DeadlineExceeded(stage)
+        raise
+
+
+async def compute_embedding(image_data: bytes, filename: str, content_type: str,
+                            deadline: Optional[Deadline] = None) -> list:
+    """Return the PatchNetVLAD embedding for an uploaded image.
+
+    Uses the micro-batching dispatcher when it is running and falls back to
+    a direct TorchServe call otherwise.
+    """
+    deadline = deadline or Deadline()
+    timeout = deadline.timeout("embedding", TORCHSERVE_TIMEOUT)
+    with deadline.timer.stage("embedding"), torchserve_breaker.guard():
+        if embedding_batcher.running:
+            try:
+                embedding = await asyncio.wait_for(embedding_batcher.submit(image_data), timeout)
+            except asyncio.TimeoutError:
+                if deadline.remaining() <= 0:
+                    # The client's budget ran out, which says nothing about TorchServe
+                    deadline.record("embedding", "failed")
+                    raise DeadlineExceeded("embedding")
+                raise TorchServeError(
+                    504, "TorchServe request timed out. The model might be processing or unavailable."
+                )
+        else:
+            # requests blocks; in a thread the event loop keeps serving, and
+            # admission and disconnects still apply meanwhile. Its timeout
+            # is per socket read, so the wait is bounded here as well.
+            try:
+                response = await run_blocking(
+                    deadline,
+                    "embedding",
+                    timeout,
+                    requests.post,
+                    f"{TORCHSERVE_URL}/predictions/where",
+                    data=image_data,
+                    headers=RAW_IMAGE_HEADERS,
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                raise TorchServeError(
+                    504, "TorchServe request timed out. The model might be processing or unavailable."
+                )
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"TorchServe error: {response.text}"
+                )
+            try:
+                model_result = response.json()
+            except json.JSONDecodeError:
+                raise HTTPException(status_code=500, detail="Invalid model response")
+            embedding = parse_embedding(model_result)
+    deadline.record("embedding", "ok")
+    return embedding
+
+
 @dataclass
 class GeoResult:
     lat: float
@@ -114,8 +238,315 @@ class GeoResult:
     source: str = "model"  # "model" or "openai"
 
 
+ALLOWED_TYPES = ['image/jpeg', 'image/jpg', 'image/png']
+
+
+async def refine_with_openai(geo: GeoResult, image_data: bytes, content_type: str,
+                             deadline: Optional[Deadline] = None) -> GeoResult:
+    """Ask OpenAI where the photo was taken and geocode its answer.
+
+    The answer is resolved against the local gazetteer first, then the
+    geocode cache; Nominatim is only called for places neither knows, and
+    its answer (including "not found") is cached. Returns the OpenAI-based
+    result, or ``geo`` with a warning attached when OpenAI or the geocoder
+    cannot provide a location. The refinement is skipped when less than
+    ``OPENAI_MIN_BUDGET`` seconds of the request budget are left, and fails
+    fast while the OpenAI or Nominatim circuit breaker is open.
+    """
+    deadline = deadline or Deadline()
+    if not deadline.allows(OPENAI_MIN_BUDGET):
+        deadline.record("openai", "skipped")
+        return geo
+
+    stage = "openai"
+    try:
+        b64 = base64.b64encode(image_data).decode()
+        # Using modern OpenAI v1.x syntax. Retries would overrun the budget.
+        timeout = deadline.timeout("openai", OPENAI_TIMEOUT)
+        with deadline.timer.stage("openai"), openai_breaker.guard():
+            client = openai.OpenAI(api_key=OPENAI_API_KEY, timeout=timeout, max_retries=0)
+            resp = await run_blocking(
+                deadline,
+                "openai",
+                timeout,
+                client.chat.completions.create,
+                model="gpt-4o",
+                messages=[{
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": "Where was this photo taken? Reply with ONLY the city and country name, like 'Paris, France' or 'New York, USA'. If you cannot identify the location, reply with 'Unknown'.",
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": f"data:{content_type};base64,{b64}"},
+                        },
+                    ],
+                }],
+                max_tokens=50
+            )
+        place = resp.choices[0].message.content.strip()
+
+        # Skip if OpenAI couldn't identify the location
+        if any(phrase in place.lower() for phrase in ['unknown', 'i cannot', 'i\'m sorry', 'unable to determine']):
+            raise Exception("OpenAI could not identify location")
+        deadline.record("openai", "ok")
+
+        stage = "geocode"
+        with deadline.timer.stage("geocode"):
+            known = gazetteer.lookup(place)
+            if known is not None:
+                coords = (known.lat, known.lon)
+            else:
+                cached = await geocode_cache.get(place)
+                coords = cached.coords if cached is not None else None
+                if cached is None:
+                    # Neither the gazetteer nor the cache know it, ask Nominatim
+                    timeout = deadline.timeout("geocode", NOMINATIM_TIMEOUT)
+                    with nominatim_breaker.guard():
+                        g = await run_blocking(
+                            deadline,
+                            "geocode",
+                            timeout,
+                            requests.get,
+                            "https://nominatim.openstreetmap.org/search",
+                            params={"q": place, "format": "json", "limit": 1},
+                            headers={"User-Agent": "WhereIsThisPlace/1.0 (https://github.com/whereisthisplace)"},
+                            timeout=timeout,
+                        )
+                        if g.status_code >= 500:
+                            raise Exception(f"Nominatim error: {g.status_code}")
+                    if g.status_code == 200:
+                        data = g.json()
+                        if isinstance(data, list):
+                            coords = (float(data[0]["lat"]), float(data[0]["lon"])) if data else None
+                            geocode_cache.put(place, coords)
+        if coords is not None:
+            deadline.record("geocode", "ok")
+            # Use OpenAI result, but preserve original for comparison
+            return GeoResult(
+                lat=coords[0],
+                lon=coords[1],
+                score=0.95,  # High confidence for OpenAI
+                source="openai",
+                bias_warning=getattr(geo, 'bias_warning', None),
+                original_score=geo.score  # Preserve model score for comparison
+            )
+        deadline.record("geocode", "failed")
+    except Exception as openai_error:
+        if isinstance(openai_error, CircuitOpenError):
+            deadline.record(stage, "skipped")
+        elif not isinstance(openai_error, DeadlineExceeded):
+            deadline.record(stage, "failed")
+        # If OpenAI fails, continue with model prediction but add warning
+        print(f"OpenAI request failed: {str(openai_error)}")
+        # Add failure warning to the model prediction
+        if hasattr(geo, 'bias_warning') and geo.bias_warning:
+            geo.bias_warning += f" (OpenAI unavailable: {str(openai_error)})"
+        else:
+            geo.bias_warning = f"OpenAI unavailable: {str(openai_error)}"
+    return geo
+
+
+def format_prediction(geo: GeoResult) -> Dict[str, Any]:
+    """Return the response payload for ``geo`` with UI hints added."""
+    prediction_dict = asdict(geo)
+
+    # Add confidence category for user-friendly display
+    if geo.score >= 0.8:
+        confidence_level = "high"
+    elif geo.score >= 0.5:
+        confidence_level = "medium"
+    elif geo.score >= 0.3:
+        confidence_level = "low"
+    else:
+        confidence_level = "very_low"
+
+    prediction_dict["confidence_level"] = confidence_level
+    # Nearest known place, so clients need not reverse geocode themselves
+    prediction_dict["place"] = reverse_geocoder.describe(geo.lat, geo.lon)
+
+    # Add warning message for UI
+    if hasattr(geo, 'bias_warning') and geo.bias_warning:
+        prediction_dict["warning"] = "Location prediction may be inaccurate due to model bias"
+
+    return prediction_dict
+
+
+async def log_prediction(db_pool: Any, geo: GeoResult) -> None:
+    """Persist ``geo`` in the database if a pool is available.
+
+    When the write-behind logger is running the row is only buffered, so
+    the database round trip stays off the request path.
+    """
+    if not db_pool:
+        return
+    if prediction_log.running:
+        if not prediction_log.enqueue(
+            (geo.lat, geo.lon, geo.score, getattr(geo, "bias_warning", None), geo.source)
+        ):
+            print("Prediction log queue full, dropping row")
+        return
+    try:
+        await insert_prediction(
+            db_pool,
+            geo.lat,
+            geo.lon,
+            geo.score,
+            getattr(geo, "bias_warning", None),
+            geo.source,
+        )
+    except Exception as db_error:
+        print(f"DB insert failed: {db_error}")
+
+
+def prediction_error(e: Exception) -> HTTPException:
+    """Map a pipeline failure to the HTTP error ``/predict`` reports for it."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, TorchServeError):
+        return HTTPException(status_code=e.status_code, detail=e.detail)
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, Overloaded):
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy. Please retry shortly.",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    if isinstance(e, ClientDisconnected):
+        return HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail="Inference service is unavailable. Please retry shortly.",
+            headers={"Retry-After": str(max(1, int(e.retry_after)))},
+        )
+    if isinstance(e, requests.exceptions.ConnectionError):
+        return HTTPException(
+            status_code=503,
+            detail="Cannot connect to TorchServe. Please ensure the inference service is running."
+        )
+    if isinstance(e, requests.exceptions.Timeout):
+        return HTTPException(
+            status_code=504,
+            detail="TorchServe request timed out. The model might be processing or unavailable."
+        )
+    return HTTPException(
+        status_code=500,
+        detail=f"Prediction error: {str(e)}"
+    )
+
+
+def with_server_timing(error: HTTPException, timer: StageTimer) -> HTTPException:
+    """Add the ``Server-Timing`` header for the stages so far to ``error``."""
+    error.headers = {**(error.headers or {}), "Server-Timing": timer.header()}
+    return error
+
+
+def record_source(request: Any, source: str) -> None:
+    """Name the prediction source for ``RequestMetricsMiddleware``'s request counts."""
+    scope = getattr(request, "scope", None)
+    if scope is not None:
+        scope.setdefault("state", {})[PREDICTION_SOURCE_STATE] = source
+
+
+async def run_admitted(
+    request: Any,
+    work: Callable[[], Awaitable[T]],
+    lane: str,
+    timeout: Optional[float] = None,
+    timer: Optional[StageTimer] = None,
+    cost: int = 1,
+) -> T:
+    """Run ``work()`` holding ``cost`` admission slots of ``lane``.
+
+    The work is cancelled if the client of ``request`` disconnects. Being
+    shed or cancelled is raised as the matching ``HTTPException``.
+    """
+    async def admitted() -> T:
+        async with predict_admission.slot(timeout, timer, lane, cost):
+            return await work()
+
+    try:
+        return await cancel_on_disconnect(request, admitted())
+    except ClientDisconnected as e:
+        predict_admission.lane(lane).stats["cancelled"] += 1
+        raise prediction_error(e)
+    except Overloaded as e:
+        raise prediction_error(e)
+
+
+async def predict_with_model(image_data: bytes, filename: str, content_type: str,
+                             deadline: Optional[Deadline] = None, db_pool: Any = None) -> GeoResult:
+    """Return the bias-checked model prediction for one image."""
+    if content_type not in ALLOWED_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Allowed types: {ALLOWED_TYPES}"
+        )
+
+    deadline = deadline or Deadline()
+    embedding = await compute_embedding(image_data, filename, content_type, deadline)
+
+    vec = as_embedding(embedding)
+    try:
+        with deadline.timer.stage("search"):
+            geo = await asyncio.wait_for(query_geo(vec, db_pool), deadline.timeout("search"))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("search")
+    deadline.record("search", "ok")
+
+    # Apply bias detection
+    return detect_geographic_bias(geo, filename)
+
+
+def use_openai_for(mode: Optional[str]) -> bool:
+    # FEATURE BRANCH: OpenAI is now the default mode
+    # Always use OpenAI unless explicitly disabled with mode="model"
+    return bool((mode != "model") and OPENAI_API_KEY)
+
+
+async def run_prediction(
+    image_data: bytes,
+    filename: str,
+    content_type: str,
+    mode: Optional[str] = None,
+    db_pool: Any = None,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
+    """Run the full prediction pipeline for one image.
+
+    Errors are raised as ``HTTPException`` with the status ``/predict``
+    reports for them. The response's ``deadline`` block reports the budget
+    and which stages ran; ``deadline.timer`` holds how long each took.
+    """
+    deadline = deadline or Deadline()
+    try:
+        geo = await predict_with_model(image_data, filename, content_type, deadline, db_pool)
+
+        if use_openai_for(mode):
+            geo = await refine_with_openai(geo, image_data, content_type, deadline)
+
+        prediction_dict = format_prediction(geo)
+        with deadline.timer.stage("db"):
+            await log_prediction(db_pool, geo)
+
+        return {
+            "status": "success",
+            "filename": filename,
+            "prediction": prediction_dict,
+            "message": "Prediction completed successfully",
+            "deadline": deadline.summary(),
+        }
+    except Exception as e:
+        raise prediction_error(e)
+
+
 @router.post("/predict")
-async def predict(photo: UploadFile = File(...), mode: Optional[str] = None, db_pool=Depends(get_db_pool)):
+async def predict(photo: UploadFile = File(...), mode: Optional[str] = None, db_pool=Depends(get_db_pool),
+                  request: Request = None, response: Response = None, timings: bool = False):
     """
     Make prediction using the uploaded photo with bias detection and fallback.
     
@@ -123,162 +554,376 @@ async def predict(photo: UploadFile = File(...), mode: Optional[str] = None, db_
     - OpenAI is now the default prediction method
     - Model is only used when mode="model" is explicitly specified
     - This allows testing OpenAI responses while the model/database matures
+
+    The ``X-Request-Timeout-Ms`` header sets the time budget shared by all
+    stages (default ``PREDICT_DEADLINE_SECONDS``).
+
+    At most ``predict_admission.limit`` predictions run at once; others
+    queue briefly and are shed with ``503`` and ``Retry-After`` when the
+    queue is full or their wait runs out. The work is cancelled if the
+    client disconnects. Requests with a valid ``X-Entitlement`` token for
+    the pro tier run in their own lane, with reserved slots and ahead of
+    queued free requests.
+
+    Every response, errors included, carries a ``Server-Timing`` header with
+    the time spent per stage; ``timings=true`` adds the same breakdown to
+    the JSON as ``timings``.
     """
+    deadline = Deadline.from_request(request)
+    timer = deadline.timer
+    lane = lane_for(request)
     try:
-        allowed_types = ['image/jpeg', 'image/jpg', 'image/png']
-        if photo.content_type not in allowed_types:
+        if photo.content_type not in ALLOWED_TYPES:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid file type. Allowed types: {allowed_types}"
+                detail=f"Invalid file type. Allowed types: {ALLOWED_TYPES}"
             )
+        with timer.stage("upload"):
+            image_data = await read_upload(photo)
+        result = await run_admitted(
+            request,
+            lambda: run_prediction(image_data, photo.filename, photo.content_type, mode, db_pool, deadline),
+            lane,
+            deadline.remaining(),
+            timer,
+        )
+        record_source(request, result["prediction"]["source"])
+    except HTTPException as e:
+        raise with_server_timing(e, timer)
+    finally:
+        stage_latency.observe(timer)
+        predict_admission.lane(lane).latency.observe(timer.total() * 1000)
 
-        image_data = await photo.read()
-        files = {'data': (photo.filename, BytesIO(image_data), photo.content_type)}
+    if response is not None:
+        response.headers["Server-Timing"] = timer.header()
+    if timings:
+        result["timings"] = timer.summary()
+    return result
 
-        response = requests.post(
-            f"{TORCHSERVE_URL}/predictions/where",
-            files=files,
-            timeout=30
-        )
 
-        if response.status_code == 200:
-            try:
-                model_result = response.json()
-            except json.JSONDecodeError:
-                raise HTTPException(status_code=500, detail="Invalid model response")
+ZIP_TYPES = ['application/zip', 'application/x-zip-compressed']
+ZIP_MEMBER_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png'}
 
-            embedding = None
-            if isinstance(model_result, dict):
-                embedding = model_result.get("embedding")
-            if embedding is None and isinstance(model_result, list):
-                embedding = model_result
-            if embedding is None:
-                raise HTTPException(status_code=500, detail="No embedding returned from model")
-
-            vec = np.array(embedding)
-            geo = await query_geo(vec)
-            
-            # Apply bias detection
-            geo = detect_geographic_bias(geo, photo.filename)
-            
-            # FEATURE BRANCH: OpenAI is now the default mode
-            # Always use OpenAI unless explicitly disabled with mode="model"
-            use_openai = (mode != "model") and OPENAI_API_KEY
-            
-            if use_openai:
-                try:
-                    b64 = base64.b64encode(image_data).decode()
-                    # Using modern OpenAI v1.x syntax
-                    client = openai.OpenAI(api_key=OPENAI_API_KEY)
-                    resp = client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[{
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": "Where was this photo taken? Reply with ONLY the city and country name, like 'Paris, France' or 'New York, USA'. If you cannot identify the location, reply with 'Unknown'.",
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {"url": f"data:{photo.content_type};base64,{b64}"},
-                                },
-                            ],
-                        }],
-                        max_tokens=50
-                    )
-                    place = resp.choices[0].message.content.strip()
-                    
-                    # Skip if OpenAI couldn't identify the location
-                    if any(phrase in place.lower() for phrase in ['unknown', 'i cannot', 'i\'m sorry', 'unable to determine']):
-                        raise Exception("OpenAI could not identify location")
-                    g = requests.get(
-                        "https://nominatim.openstreetmap.org/search",
-                        params={"q": place, "format": "json", "limit": 1},
-                                                headers={"User-Agent": "WhereIsThisPlace/1.0 (https://github.com/whereisthisplace)"},
-                        timeout=10,
-                    )
-                    if g.status_code == 200:
-                        data = g.json()
-                        if isinstance(data, list) and data:
-                            # Use OpenAI result, but preserve original for comparison
-                            original_geo = geo
-                            geo = GeoResult(
-                                lat=float(data[0]["lat"]),
-                                lon=float(data[0]["lon"]),
-                                score=0.95,  # High confidence for OpenAI
-                                source="openai",
-                                bias_warning=getattr(original_geo, 'bias_warning', None),
-                                original_score=original_geo.score  # Preserve model score for comparison
-                            )
-                except Exception as openai_error:
-                    # If OpenAI fails, continue with model prediction but add warning
-                    print(f"OpenAI request failed: {str(openai_error)}")
-                    # Add failure warning to the model prediction
-                    if hasattr(geo, 'bias_warning') and geo.bias_warning:
-                        geo.bias_warning += f" (OpenAI unavailable: {str(openai_error)})"
-                    else:
-                        geo.bias_warning = f"OpenAI unavailable: {str(openai_error)}"
-
-            # Prepare response with enhanced information
-            prediction_dict = asdict(geo)
-            
-            # Add confidence category for user-friendly display
-            if geo.score >= 0.8:
-                confidence_level = "high"
-            elif geo.score >= 0.5:
-                confidence_level = "medium"
-            elif geo.score >= 0.3:
-                confidence_level = "low"
-            else:
-                confidence_level = "very_low"
-            
-            prediction_dict["confidence_level"] = confidence_level
-            
-            # Add warning message for UI
-            if hasattr(geo, 'bias_warning') and geo.bias_warning:
-                prediction_dict["warning"] = "Location prediction may be inaccurate due to model bias"
-
-            # Persist prediction in the database if a pool is available
-            if db_pool:
-                try:
-                    await insert_prediction(
-                        db_pool,
-                        geo.lat,
-                        geo.lon,
-                        geo.score,
-                        getattr(geo, "bias_warning", None),
-                        geo.source,
-                    )
-                except Exception as db_error:
-                    print(f"DB insert failed: {db_error}")
 
-            return {
-                "status": "success",
-                "filename": photo.filename,
-                "prediction": prediction_dict,
-                "message": "Prediction completed successfully",
-            }
+async def read_batch_uploads(photos: List[UploadFile]) -> List[Tuple[str, str, bytes]]:
+    """Return ``(filename, content_type, data)`` for every uploaded image.
+
+    Zip archives are expanded into their image members.
+    """
+    items: List[Tuple[str, str, bytes]] = []
+    total = 0
+    for photo in photos:
+        data = await read_upload(photo)
+        filename = photo.filename or "upload"
+        if photo.content_type in ZIP_TYPES or filename.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(BytesIO(data))
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"Invalid zip archive: {filename}")
+            with archive:
+                for info in archive.infolist():
+                    ext = os.path.splitext(info.filename)[1].lower()
+                    if info.is_dir() or ext not in ZIP_MEMBER_TYPES:
+                        continue
+                    # Check the declared size before inflating anything
+                    total += info.file_size
+                    if total > BATCH_MAX_BYTES:
+                        raise HTTPException(status_code=413, detail="Batch upload is too large")
+                    items.append((info.filename, ZIP_MEMBER_TYPES[ext], archive.read(info)))
         else:
+            total += len(data)
+            if total > BATCH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Batch upload is too large")
+            items.append((filename, photo.content_type, data))
+
+        if len(items) > BATCH_MAX_IMAGES:
             raise HTTPException(
-                status_code=response.status_code,
-                detail=f"TorchServe error: {response.text}"
+                status_code=413,
+                detail=f"Too many images. At most {BATCH_MAX_IMAGES} images per batch"
             )
+    if not items:
+        raise HTTPException(status_code=400, detail="No images found in upload")
+    return items
 
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(
-            status_code=503,
-            detail="Cannot connect to TorchServe. Please ensure the inference service is running."
+
+def _batch_error(filename: str, error: Exception) -> Dict[str, Any]:
+    http_error = prediction_error(error)
+    return {
+        "filename": filename,
+        "status": "error",
+        "status_code": http_error.status_code,
+        "detail": http_error.detail,
+    }
+
+
+@router.post("/predict/batch")
+async def predict_batch(photos: List[UploadFile] = File(...), mode: Optional[str] = None, db_pool=Depends(get_db_pool),
+                        request: Request = None, response: Response = None, timings: bool = False):
+    """
+    Make predictions for many photos (or a zip of photos) in one request.
+
+    Images flow through a pipeline: embeddings are computed with bounded
+    concurrency (and batched towards TorchServe), ready embeddings are
+    searched in chunks with one database query each, and each match is then
+    bias-checked and refined like ``/predict``. Results are returned per image
+    in upload order; a failing image does not fail the batch.
+
+    The batch goes through admission control like ``/predict``, holding
+    one slot per image it runs at once (at most
+    ``PREDICT_BATCH_CONCURRENCY``). Its rate-limit cost is charged per
+    image once the uploads are counted.
+
+    Responses carry a ``Server-Timing`` header like ``/predict``; the
+    per-image stages are summed over the batch, so they can add up to more
+    than the total. ``timings=true`` adds the breakdown to the JSON.
+    """
+    timer = StageTimer.from_scope(getattr(request, "scope", None))
+    try:
+        with timer.stage("upload"):
+            items = await read_batch_uploads(photos)
+        if request is not None:
+            allowed, retry_after = await charge_items(request.scope, len(items))
+            if not allowed:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too Many Requests",
+                    headers={"Retry-After": str(max(1, int(retry_after)))},
+                )
+        result = await run_admitted(
+            request,
+            lambda: run_batch(items, mode, db_pool, timer),
+            lane_for(request),
+            timer=timer,
+            cost=min(len(items), BATCH_CONCURRENCY),
         )
-    except requests.exceptions.Timeout:
-        raise HTTPException(
-            status_code=504,
-            detail="TorchServe request timed out. The model might be processing or unavailable."
+    except HTTPException as e:
+        raise with_server_timing(e, timer)
+
+    if response is not None:
+        response.headers["Server-Timing"] = timer.header()
+    if timings:
+        result["timings"] = timer.summary()
+    return result
+
+
+async def run_batch(items: List[Tuple[str, str, bytes]], mode: Optional[str], db_pool: Any,
+                    timer: Optional[StageTimer] = None) -> Dict[str, Any]:
+    """Predict every ``(filename, content_type, data)`` item of a batch.
+
+    Each image gets its own deadline, and all of them record their stages
+    in ``timer``.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    use_openai = use_openai_for(mode)
+    timer = timer or StageTimer()
+
+    embed_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    refine_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+    search_queue: asyncio.Queue = asyncio.Queue()
+    refine_tasks: List[asyncio.Task] = []
+
+    async def embed(index: int) -> None:
+        filename, content_type, data = items[index]
+        if content_type not in ALLOWED_TYPES:
+            results[index] = _batch_error(filename, HTTPException(
+                status_code=400,
+                detail=f"Invalid file type. Allowed types: {ALLOWED_TYPES}"
+            ))
+            return
+        async with embed_slots:
+            try:
+                vec = as_embedding(await compute_embedding(data, filename, content_type, Deadline(timer=timer)))
+            except Exception as e:
+                results[index] = _batch_error(filename, e)
+                return
+        await search_queue.put((index, vec))
+
+    async def refine(index: int, geo: GeoResult) -> None:
+        filename, content_type, data = items[index]
+        async with refine_slots:
+            try:
+                geo = detect_geographic_bias(geo, filename)
+                if use_openai:
+                    geo = await refine_with_openai(geo, data, content_type, Deadline(timer=timer))
+                with timer.stage("db"):
+                    await log_prediction(db_pool, geo)
+                results[index] = {
+                    "filename": filename,
+                    "status": "success",
+                    "prediction": format_prediction(geo),
+                }
+            except Exception as e:
+                results[index] = _batch_error(filename, e)
+
+    async def search() -> None:
+        done = False
+        while not done:
+            chunk = [await search_queue.get()]
+            while len(chunk) < BATCH_SEARCH_CHUNK and not search_queue.empty():
+                chunk.append(search_queue.get_nowait())
+            if chunk[-1] is None:
+                chunk.pop()
+                done = True
+            if not chunk:
+                continue
+            try:
+                with timer.stage("search"):
+                    rows = await nearest_many([vec for _, vec in chunk], pool=db_pool)
+            except Exception as e:
+                for index, _ in chunk:
+                    results[index] = _batch_error(items[index][0], e)
+                continue
+            for (index, _), row in zip(chunk, rows):
+                if row is None:
+                    results[index] = _batch_error(
+                        items[index][0], HTTPException(status_code=404, detail="No match found")
+                    )
+                    continue
+                geo = GeoResult(lat=row["lat"], lon=row["lon"], score=row.get("score", 0.0))
+                refine_tasks.append(asyncio.create_task(refine(index, geo)))
+
+    searcher = asyncio.create_task(search())
+    try:
+        await asyncio.gather(*(embed(i) for i in range(len(items))))
+        await search_queue.put(None)
+        await searcher
+        await asyncio.gather(*refine_tasks)
+    finally:
+        searcher.cancel()
+        for task in refine_tasks:
+            task.cancel()
+
+    succeeded = sum(1 for r in results if r["status"] == "success")
+    return {
+        "status": "success",
+        "count": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+        "message": "Batch prediction completed",
+    }
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """Streaming response that calls ``release`` once it is done.
+
+    It is called when the stream ends, and again (to no effect) when the
+    response finishes, which also covers a client that disconnects before
+    the first event.
+    """
+
+    def __init__(self, content: Any, release: Callable[[], None], **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+def _stream_event(event: Dict[str, Any], sse: bool) -> str:
+    if sse:
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    return json.dumps(event) + "\n"
+
+
+@router.post("/predict/stream")
+async def predict_stream(request: Request, photo: UploadFile = File(...), mode: Optional[str] = None, db_pool=Depends(get_db_pool)):
+    """
+    Streaming variant of ``/predict``.
+
+    The model prediction is sent as soon as the vector search completes,
+    followed by the OpenAI-refined prediction when refinement runs, and a
+    final ``done`` event carrying the same payload ``/predict`` returns.
+    Events are newline-delimited JSON, or server-sent events when the
+    client accepts ``text/event-stream``.
+
+    Failures before the model prediction are returned as regular HTTP
+    errors; later failures are sent as an ``error`` event.
+
+    An admission slot is held like for ``/predict`` until the last event
+    is sent.
+
+    The ``Server-Timing`` header covers the stages up to the model
+    prediction, since it is sent with the first event; the ``done`` event
+    carries every stage under ``timings``.
+    """
+    deadline = Deadline.from_request(request)
+    timer = deadline.timer
+    lane = lane_for(request)
+    try:
+        with timer.stage("upload"):
+            image_data = await read_upload(photo)
+        # The slot outlives this function, so it is taken and released by hand
+        start = time.perf_counter()
+        try:
+            await predict_admission.acquire(deadline.remaining(), lane)
+        except Overloaded as e:
+            raise prediction_error(e)
+        finally:
+            timer.add("queue", time.perf_counter() - start)
+    except HTTPException as e:
+        raise with_server_timing(e, timer)
+    held = time.monotonic()
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            predict_admission.release(time.monotonic() - held, lane)
+
+    try:
+        geo = await cancel_on_disconnect(
+            request, predict_with_model(image_data, photo.filename, photo.content_type, deadline, db_pool)
         )
-    except HTTPException:
-        raise
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Prediction error: {str(e)}"
-        )
+        release()
+        if isinstance(e, ClientDisconnected):
+            predict_admission.lane(lane).stats["cancelled"] += 1
+        raise with_server_timing(prediction_error(e), timer)
+
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    filename, content_type = photo.filename, photo.content_type
+
+    async def events():
+        nonlocal geo
+        try:
+            record_source(request, geo.source)
+            yield _stream_event({"event": "model", "prediction": format_prediction(geo)}, sse)
+            try:
+                if use_openai_for(mode):
+                    geo = await refine_with_openai(geo, image_data, content_type, deadline)
+                    record_source(request, geo.source)
+                    yield _stream_event({"event": "refined", "prediction": format_prediction(geo)}, sse)
+                with timer.stage("db"):
+                    await log_prediction(db_pool, geo)
+            except Exception as e:
+                http_error = prediction_error(e)
+                yield _stream_event({
+                    "event": "error",
+                    "status_code": http_error.status_code,
+                    "detail": http_error.detail,
+                }, sse)
+                return
+            yield _stream_event({
+                "event": "done",
+                "status": "success",
+                "filename": filename,
+                "prediction": format_prediction(geo),
+                "message": "Prediction completed successfully",
+                "deadline": deadline.summary(),
+                "timings": timer.summary(),
+            }, sse)
+        finally:
+            release()
+            stage_latency.observe(timer)
+
+    return ReleasingStreamingResponse(
+        events(),
+        release,
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Server-Timing": timer.header()},
+    )
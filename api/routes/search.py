@@ -0,0 +1,129 @@
+import asyncio
+import os
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from api.lazy import lazy_import
+from api.repositories.match import nearest_many
+from api.routes.predict import (
+    GeoResult,
+    detect_geographic_bias,
+    format_prediction,
+    get_db_pool,
+    prediction_error,
+    run_admitted,
+)
+from api.services.deadline import Deadline, DeadlineExceeded
+from api.services.entitlement import lane_for
+
+np = lazy_import("numpy")
+
+router = APIRouter()
+
+# PatchNetVLAD WPCA128 embeddings, as stored in ``photos.vlad``
+EMBEDDING_DIM = 128
+EMBEDDING_DTYPE = '<f4'  # little-endian float32
+EMBEDDING_ITEMSIZE = 4
+EMBEDDING_SEARCH_MAX_VECTORS = int(os.getenv('EMBEDDING_SEARCH_MAX_VECTORS', '256'))
+EMBEDDING_CONTENT_TYPE = 'application/octet-stream'
+EMBEDDING_ROW_BYTES = EMBEDDING_DIM * EMBEDDING_ITEMSIZE
+
+
+def _too_many_vectors() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Too many vectors. Maximum is {EMBEDDING_SEARCH_MAX_VECTORS}",
+    )
+
+
+async def read_embedding_body(request: Request) -> bytes:
+    """Read the request body, answering ``413`` as soon as it cannot fit the vector cap.
+
+    A ``Content-Length`` over the cap is rejected before anything is read;
+    otherwise the body is streamed and reading stops once it runs over.
+    """
+    max_bytes = EMBEDDING_SEARCH_MAX_VECTORS * EMBEDDING_ROW_BYTES
+    try:
+        declared = int(request.headers.get('content-length', ''))
+    except ValueError:
+        declared = None
+    if declared is not None and declared > max_bytes:
+        raise _too_many_vectors()
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise _too_many_vectors()
+    return bytes(body)
+
+
+def decode_embeddings(body: bytes) -> "np.ndarray":
+    """Return a read-only ``(n, 128)`` float32 view of a raw request body."""
+    row_bytes = EMBEDDING_ROW_BYTES
+    if not body or len(body) % row_bytes:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Body must hold one or more {EMBEDDING_DIM}-d little-endian float32 vectors "
+                   f"({row_bytes} bytes each), got {len(body)} bytes",
+        )
+    count = len(body) // row_bytes
+    if count > EMBEDDING_SEARCH_MAX_VECTORS:
+        raise _too_many_vectors()
+    vecs = np.frombuffer(body, dtype=EMBEDDING_DTYPE).reshape(count, EMBEDDING_DIM)
+    if not np.isfinite(vecs).all():
+        raise HTTPException(status_code=400, detail="Vectors must not contain NaN or infinity")
+    return vecs
+
+
+@router.post("/search/embedding")
+async def search_embedding(request: Request, db_pool=Depends(get_db_pool)) -> Dict[str, Any]:
+    """
+    Find the location of one or more precomputed PatchNetVLAD embeddings.
+
+    The body is the raw concatenation of 128-d little-endian float32
+    vectors sent as ``application/octet-stream``. The vectors go straight to
+    the nearest-neighbour search, skipping upload parsing and inference.
+    Results come back in input order, each shaped like a ``/predict``
+    prediction or an error entry when no match was found. The search holds
+    an admission slot like ``/predict``.
+    """
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    if content_type != EMBEDDING_CONTENT_TYPE:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Content type must be {EMBEDDING_CONTENT_TYPE}",
+        )
+    deadline = Deadline.from_request(request)
+    vecs = decode_embeddings(await read_embedding_body(request))
+
+    async def search() -> list:
+        try:
+            try:
+                rows = await asyncio.wait_for(
+                    nearest_many(list(vecs), pool=db_pool), deadline.timeout("search")
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded("search")
+            deadline.record("search", "ok")
+        except Exception as e:
+            raise prediction_error(e)
+        return rows
+
+    rows = await run_admitted(request, search, lane_for(request), deadline.remaining(), deadline.timer)
+
+    results = []
+    for row in rows:
+        if row is None:
+            results.append({"status": "error", "status_code": 404, "detail": "No match found"})
+            continue
+        geo = detect_geographic_bias(GeoResult(lat=row["lat"], lon=row["lon"], score=row["score"]))
+        results.append(format_prediction(geo))
+
+    return {
+        "status": "success",
+        "count": len(results),
+        "results": results,
+        "message": "Embedding search completed",
+        "deadline": deadline.summary(),
+    }
@@ -0,0 +1,354 @@
+"""Pre-fork server running several uvicorn workers on one socket.
+
+The master binds the port, imports the app and loads its read-only data
+(the gazetteer, the reverse geocoder's tree and the modules behind them)
+once, then forks ``WEB_CONCURRENCY`` workers that share those pages
+copy-on-write and accept connections from the inherited socket. Each
+worker runs the app's lifespan itself, so the asyncpg pool, background
+tasks and TorchServe client belong to one worker.
+
+Signals to the master:
+
+- ``SIGTERM``/``SIGINT``: stop the workers gracefully, then exit
+- ``SIGHUP``: replace the workers one at a time, stopping each old worker
+  only once its replacement is serving
+
+A worker that dies after it started serving is replaced; one that dies
+before stops the master, as a single uvicorn would exit.
+
+Usage:
+    python -m api.serve --host 0.0.0.0 --port 8000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, MutableMapping, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from api.lazy import is_loaded, lazy_import
+
+uvicorn = lazy_import("uvicorn")
+
+logger = logging.getLogger("api.serve")
+
+SERVE_HOST = os.getenv('SERVE_HOST', '0.0.0.0')
+SERVE_PORT = int(os.getenv('SERVE_PORT', '8000'))
+# Unset or 0 means one worker per CPU
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '0'))
+# Connections all workers may hold together; each pool gets an equal share
+DB_CONNECTION_BUDGET = int(os.getenv('DB_CONNECTION_BUDGET', '40'))
+# Seconds a stopping worker gets to finish its requests before SIGKILL
+SERVE_GRACEFUL_TIMEOUT = float(os.getenv('SERVE_GRACEFUL_TIMEOUT', '30'))
+# Seconds a new worker gets to start serving
+SERVE_BOOT_TIMEOUT = float(os.getenv('SERVE_BOOT_TIMEOUT', '120'))
+SERVE_BACKLOG = int(os.getenv('SERVE_BACKLOG', '2048'))
+
+# Loaded before forking so workers share them instead of importing each
+PRELOAD_MODULES = ("numpy", "httpx", "asyncpg", "requests")
+
+
+def worker_count(configured: int = WEB_CONCURRENCY, cpus: Optional[int] = None) -> int:
+    """Return ``configured``, or the number of CPUs when it is not positive."""
+    if configured > 0:
+        return configured
+    return max(1, cpus if cpus is not None else (os.cpu_count() or 1))
+
+
+def pool_size_for(budget: int, workers: int) -> int:
+    """Return each worker's pool size so ``workers`` pools fit in ``budget``.
+
+    One share is kept for the extra worker that runs while a reload
+    replaces an old one.
+    """
+    return max(1, budget // (workers + 1))
+
+
+def export_worker_settings(
+    workers: int, budget: int, environ: MutableMapping[str, str] = os.environ
+) -> Dict[str, str]:
+    """Set what the app reads from the environment to size itself per worker.
+
+    ``DB_POOL_MAX_SIZE`` and ``RATE_LIMIT_WORKERS`` are left alone when the
+    operator set them. Must run before the app is imported. Returns the
+    values in effect.
+    """
+    environ["WEB_CONCURRENCY"] = str(workers)
+    environ.setdefault("RATE_LIMIT_WORKERS", str(workers))
+    environ.setdefault("DB_POOL_MAX_SIZE", str(pool_size_for(budget, workers)))
+    return {name: environ[name] for name in ("WEB_CONCURRENCY", "RATE_LIMIT_WORKERS", "DB_POOL_MAX_SIZE")}
+
+
+def preload() -> Dict[str, Any]:
+    """Import the app and load its read-only data in this process.
+
+    Returns what was loaded, for the master's log line.
+    """
+    start = time.monotonic()
+    from api import main
+    from api.services.gazetteer import gazetteer
+    from api.services.reverse_geocoder import reverse_geocoder
+
+    modules = []
+    for name in PRELOAD_MODULES:
+        module = sys.modules.get(name)
+        if module is not None and not is_loaded(name):
+            # Any attribute access runs a lazily imported module
+            getattr(module, "__name__")
+            modules.append(name)
+    if not gazetteer.loaded:
+        try:
+            gazetteer.load()
+        except OSError as e:
+            logger.warning("Gazetteer not preloaded, workers will retry: %s", e)
+    if gazetteer.loaded and not reverse_geocoder.built:
+        reverse_geocoder.build_from(gazetteer)
+    # Objects allocated so far are never collected in the workers, so the
+    # collector does not touch (and copy) the pages they share
+    gc.collect()
+    gc.freeze()
+    return {
+        "app": main.app,
+        "modules": modules,
+        "places": gazetteer.stats["places"],
+        "seconds": round(time.monotonic() - start, 3),
+    }
+
+
+def bind_socket(host: str, port: int, backlog: int = SERVE_BACKLOG) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Worker:
+    """A forked worker and the pipe it reports readiness on, ``-1`` once read."""
+
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.ready = False
+        self.started = time.monotonic()
+        self.stopping: Optional[float] = None
+
+
+class Master:
+    """Forks, watches and replaces uvicorn workers serving ``config.app``."""
+
+    def __init__(self, config: Any, sock: socket.socket, workers: int):
+        self.config = config
+        self.sock = sock
+        self.size = workers
+        self.workers: Dict[int, Worker] = {}
+        self.stats = {"spawned": 0, "replaced": 0, "reloads": 0}
+        self._shutdown = False
+        self._reload = False
+        self._pending: List[int] = []
+
+    def run(self) -> int:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_reload)
+        for _ in range(self.size):
+            self.spawn()
+        status = 0
+        while not self._shutdown:
+            self._wait_ready(1.0)
+            if self._reap():
+                status = 1
+                break
+            if self._reload:
+                self._reload = False
+                self.stats["reloads"] += 1
+                self._pending = [pid for pid, w in self.workers.items() if w.stopping is None]
+                logger.info("Reloading %d workers", len(self._pending))
+            self._roll()
+            self._kill_overdue()
+        self.stop_all()
+        return status
+
+    def spawn(self) -> Worker:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_worker(write_fd)
+        os.close(write_fd)
+        worker = Worker(pid, read_fd)
+        self.workers[pid] = worker
+        self.stats["spawned"] += 1
+        logger.info("Started worker %d", pid)
+        return worker
+
+    def _run_worker(self, ready_fd: int) -> None:
+        # Drop the master's handlers; uvicorn installs its own for SIGTERM and SIGINT
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        status = 0
+        try:
+            server = ready_server(self.config, ready_fd)
+            server.run(sockets=[self.sock])
+            if not server.started:
+                status = 3
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _wait_ready(self, timeout: float) -> None:
+        booting = {w.ready_fd: w for w in self.workers.values() if w.ready_fd >= 0}
+        if not booting:
+            time.sleep(timeout)
+            return
+        try:
+            readable, _, _ = select.select(list(booting), [], [], timeout)
+        except InterruptedError:
+            return
+        for fd in readable:
+            worker = booting[fd]
+            worker.ready = bool(os.read(fd, 1))
+            os.close(fd)
+            worker.ready_fd = -1
+            if worker.ready:
+                logger.info("Worker %d serving after %.2fs", worker.pid, time.monotonic() - worker.started)
+
+    def _reap(self) -> bool:
+        """Collect exited workers and replace crashed ones; ``True`` when one
+        failed to start, which stops the master."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return False
+            if pid == 0:
+                return False
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.ready_fd >= 0:
+                os.close(worker.ready_fd)
+            if worker.stopping is not None:
+                logger.info("Worker %d stopped", pid)
+                continue
+            if not worker.ready:
+                logger.error("Worker %d exited before serving (status %d)", pid, os.waitstatus_to_exitcode(status))
+                return True
+            logger.warning(
+                "Worker %d exited unexpectedly (status %d), replacing it", pid, os.waitstatus_to_exitcode(status)
+            )
+            self.stats["replaced"] += 1
+            self.spawn()
+
+    def _roll(self) -> None:
+        """Replace one old worker per step: start a new one, then stop the
+        old one once every new worker is serving."""
+        self._pending = [pid for pid in self._pending if pid in self.workers]
+        if not self._pending:
+            return
+        live = [w for w in self.workers.values() if w.stopping is None]
+        if any(not w.ready for w in live):
+            return
+        if len(live) <= self.size:
+            self.spawn()
+            return
+        self.stop(self.workers[self._pending.pop(0)])
+
+    def stop(self, worker: Worker) -> None:
+        worker.stopping = time.monotonic()
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _kill_overdue(self) -> None:
+        now = time.monotonic()
+        for worker in self.workers.values():
+            if worker.stopping is not None:
+                overdue = now - worker.stopping > SERVE_GRACEFUL_TIMEOUT
+            else:
+                # Reaped as a failed start, which stops the master
+                overdue = not worker.ready and now - worker.started > SERVE_BOOT_TIMEOUT
+            if overdue:
+                logger.warning("Killing worker %d", worker.pid)
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def stop_all(self) -> None:
+        for worker in self.workers.values():
+            if worker.stopping is None:
+                self.stop(worker)
+        deadline = time.monotonic() + SERVE_GRACEFUL_TIMEOUT
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for worker in self.workers.values():
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def _on_stop(self, signum: int, frame: Any) -> None:
+        self._shutdown = True
+
+    def _on_reload(self, signum: int, frame: Any) -> None:
+        self._reload = True
+
+
+def ready_server(config: Any, ready_fd: int) -> Any:
+    """Return a uvicorn server that writes to ``ready_fd`` once it serves."""
+
+    class Server(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            os.write(ready_fd, b"1" if self.started else b"")
+            os.close(ready_fd)
+
+    return Server(config)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve api.main:app with preloaded worker processes")
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY,
+                        help="Worker processes; 0 means one per CPU")
+    parser.add_argument("--db-connection-budget", type=int, default=DB_CONNECTION_BUDGET,
+                        help="Database connections shared by all workers' pools")
+    parser.add_argument("--log-level", default=os.getenv('LOG_LEVEL', 'info').lower())
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logger.setLevel(args.log_level.upper())
+    workers = worker_count(args.workers)
+    # The rate limiter reads its worker count at import, the pool its size
+    # when each worker starts
+    settings = export_worker_settings(workers, args.db_connection_budget)
+    sock = bind_socket(args.host, args.port)
+    loaded = preload()
+    config = uvicorn.Config(
+        loaded.pop("app"), log_level=args.log_level, timeout_graceful_shutdown=SERVE_GRACEFUL_TIMEOUT
+    )
+    config.load()
+    logger.info("Serving on %s:%d with %s; preloaded %s", args.host, args.port, settings, loaded)
+    sys.exit(Master(config, sock, workers).run())
+
+
+if __name__ == "__main__":
+    main()
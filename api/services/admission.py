@@ -0,0 +1,358 @@
+"""Admission control for predictions: a concurrency limit with a bounded queue."""
+
+import asyncio
+import math
+import os
+import statistics
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from api.services.timing import LatencyHistogram, StageTimer
+
+# Predictions running at once; the adaptive limit starts here
+ADMISSION_LIMIT = int(os.getenv('ADMISSION_LIMIT', '16'))
+ADMISSION_MIN_LIMIT = int(os.getenv('ADMISSION_MIN_LIMIT', '2'))
+ADMISSION_MAX_LIMIT = int(os.getenv('ADMISSION_MAX_LIMIT', '64'))
+# Requests waiting for a slot beyond this are shed at once
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '32'))
+# Longest a request waits for a slot; it also never outwaits its deadline
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '5'))
+ADMISSION_ADAPTIVE = os.getenv('ADMISSION_ADAPTIVE', '1') == '1'
+# The limit shrinks when median latency exceeds this multiple of the baseline
+ADMISSION_LATENCY_TOLERANCE = float(os.getenv('ADMISSION_LATENCY_TOLERANCE', '2'))
+# Slots held back for pro subscribers, and how many queued pro requests are
+# admitted per queued free one
+ADMISSION_PRO_RESERVED = int(os.getenv('ADMISSION_PRO_RESERVED', '4'))
+ADMISSION_PRO_WEIGHT = int(os.getenv('ADMISSION_PRO_WEIGHT', '4'))
+# How often a waiting request checks whether its client is still connected
+ADMISSION_DISCONNECT_POLL = float(os.getenv('ADMISSION_DISCONNECT_POLL', '0.25'))
+# nginx's status for a request the client abandoned; it is never sent
+CLIENT_CLOSED_REQUEST = 499
+
+PRO = "pro"
+FREE = "free"
+
+T = TypeVar("T")
+
+
+class Overloaded(Exception):
+    """Raised instead of admitting a request the API has no capacity for."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Server overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its prediction finished."""
+
+
+class Lane:
+    """Requests of one priority class, with their queue and latency.
+
+    ``reserved`` slots are held back from the other lanes while this lane
+    is not using them. ``weight`` is how many queued requests of this lane
+    are admitted in a row before a waiting lower lane gets one.
+    """
+
+    def __init__(self, name: str, weight: int = 1, reserved: int = 0):
+        self.name = name
+        self.weight = max(1, weight)
+        self.reserved = reserved
+        self.in_flight = 0
+        self.waiters: Deque[Tuple[asyncio.Future, int]] = deque()  # (future, cost)
+        self.streak = 0  # admitted from the queue in a row while a lower lane waited
+        self.queue_wait = LatencyHistogram()
+        self.latency = LatencyHistogram()  # whole requests, for the lane's SLO
+        self.stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_queue_timeout": 0, "cancelled": 0}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self.waiters),
+            "reserved": self.reserved,
+            "weight": self.weight,
+            "queue_wait": self.queue_wait.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
+
+
+def default_lanes() -> List[Lane]:
+    # Without a secret no token verifies, so nothing could use a reservation
+    reserved = ADMISSION_PRO_RESERVED if os.getenv('ENTITLEMENT_SECRET') else 0
+    return [Lane(PRO, ADMISSION_PRO_WEIGHT, reserved), Lane(FREE)]
+
+
+class AdmissionController:
+    """Concurrency limit with bounded priority queues and an adaptive limit.
+
+    At most ``limit`` requests hold a slot at once. Others wait for up to
+    ``queue_timeout`` seconds in their lane's queue; all lanes together
+    hold at most ``queue_size``. A full queue or an expired wait raises
+    :class:`Overloaded` with an estimate of when capacity frees up.
+
+    ``lanes`` are given highest priority first. A request queues behind
+    waiters of its own and higher lanes only, so higher lanes jump the
+    queue; when the queue is full, an arriving request evicts the newest
+    waiter of a lower lane instead of being shed. Slots freed while
+    several lanes wait go to them by ``weight``. A lane's reservation is
+    capped at half the limit, so lower lanes are never locked out.
+
+    A request may cost several slots, e.g. a batch running several images
+    at once. A cost above the limit is admitted once nothing else runs.
+
+    With ``adaptive`` set, the limit follows how long slots are held, i.e.
+    the latency of TorchServe, the database and OpenAI. Every ``window``
+    completions the median is compared with the baseline, the lowest
+    median seen (allowed to drift up 10% per window so it follows a
+    permanently slower dependency). Above ``tolerance`` times the baseline
+    the limit is cut by a quarter; otherwise, if requests had to queue, it
+    grows by one, between ``min_limit`` and ``max_limit``.
+    """
+
+    def __init__(
+        self,
+        limit: int = ADMISSION_LIMIT,
+        min_limit: int = ADMISSION_MIN_LIMIT,
+        max_limit: int = ADMISSION_MAX_LIMIT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        adaptive: bool = ADMISSION_ADAPTIVE,
+        tolerance: float = ADMISSION_LATENCY_TOLERANCE,
+        window: int = 20,
+        lanes: Optional[Sequence[Lane]] = None,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.window = window
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in (lanes or default_lanes())}
+
+        self.in_flight = 0
+        self._latencies: List[float] = []
+        self._saturated = False  # a request had to queue during this window
+        self.baseline: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(len(lane.waiters) for lane in self.lanes.values())
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        totals: Counter = Counter()
+        for lane in self.lanes.values():
+            totals.update(lane.stats)
+        return dict(totals)
+
+    def lane(self, name: str) -> Lane:
+        """Return lane ``name``, or the lowest lane for unknown names."""
+        return self.lanes.get(name) or list(self.lanes.values())[-1]
+
+    def retry_after(self) -> float:
+        """Estimate the seconds until a new request would get a slot."""
+        latency = statistics.median(self._latencies) if self._latencies else self.baseline or 1.0
+        return max(1.0, min(60.0, (self.queued + 1) / self.limit * latency))
+
+    def _can_admit(self, lane: Lane, cost: int = 1) -> bool:
+        held_back = sum(
+            max(0, min(other.reserved, self.limit // 2) - other.in_flight)
+            for other in self.lanes.values() if other is not lane
+        )
+        available = self.limit - held_back
+        return self.in_flight + min(cost, max(1, available)) <= available
+
+    def _admit(self, lane: Lane, cost: int = 1) -> None:
+        self.in_flight += cost
+        lane.in_flight += cost
+        lane.stats["admitted"] += 1
+
+    def _waiting_ahead(self, lane: Lane) -> bool:
+        for other in self.lanes.values():
+            if other.waiters:
+                return True
+            if other is lane:
+                return False
+        return False
+
+    def _evict_lower(self, lane: Lane) -> bool:
+        """Shed the newest waiter of the lowest lane below ``lane``, if any."""
+        names = list(self.lanes)
+        for other in reversed(list(self.lanes.values())[names.index(lane.name) + 1:]):
+            while other.waiters:
+                waiter, _ = other.waiters.pop()
+                if not waiter.done():
+                    other.stats["shed_queue_full"] += 1
+                    waiter.set_exception(Overloaded("queue_full", self.retry_after()))
+                    return True
+        return False
+
+    async def acquire(self, timeout: Optional[float] = None, lane: str = FREE, cost: int = 1) -> float:
+        """Take ``cost`` slots in ``lane``, queueing if they are not free; return
+        the seconds waited.
+
+        ``timeout`` caps the wait below ``queue_timeout``, e.g. to what is
+        left of the request's deadline.
+        """
+        queue = self.lane(lane)
+        cost = max(1, cost)
+        if not self._waiting_ahead(queue) and self._can_admit(queue, cost):
+            self._admit(queue, cost)
+            queue.queue_wait.observe(0.0)
+            return 0.0
+        self._saturated = True
+        if self.queued >= self.queue_size and not self._evict_lower(queue):
+            queue.stats["shed_queue_full"] += 1
+            raise Overloaded("queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.waiters.append((waiter, cost))
+        queue.stats["queued"] += 1
+        start = time.monotonic()
+        wait = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        try:
+            await asyncio.wait_for(waiter, max(0.0, wait))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slots were handed over just as we gave up; pass them on
+                self.release(lane=queue.name, cost=cost)
+            else:
+                try:
+                    queue.waiters.remove((waiter, cost))
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                queue.stats["shed_queue_timeout"] += 1
+                raise Overloaded("queue_timeout", self.retry_after()) from None
+            raise
+        waited = time.monotonic() - start
+        queue.queue_wait.observe(waited * 1000)
+        return waited
+
+    def release(self, latency: Optional[float] = None, lane: str = FREE, cost: int = 1) -> None:
+        """Free ``cost`` slots of ``lane``; ``latency`` is how long they were
+        held, if the work finished."""
+        cost = max(1, cost)
+        self.in_flight -= cost
+        self.lane(lane).in_flight -= cost
+        # Multi-slot work takes longer by its size, which is not a slowdown
+        if latency is not None and self.adaptive and cost == 1:
+            self._observe(latency)
+        self._wake()
+
+    def _next_lane(self) -> Optional[Lane]:
+        waiting = [
+            lane for lane in self.lanes.values() if lane.waiters and self._can_admit(lane, lane.waiters[0][1])
+        ]
+        if not waiting:
+            return None
+        first = waiting[0]
+        if len(waiting) == 1:
+            first.streak = 0
+            return first
+        if first.streak >= first.weight:
+            first.streak = 0
+            return waiting[1]
+        first.streak += 1
+        return first
+
+    def _wake(self) -> None:
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            waiter, cost = lane.waiters.popleft()
+            if not waiter.done():
+                self._admit(lane, cost)
+                waiter.set_result(None)
+
+    def _observe(self, latency: float) -> None:
+        self._latencies.append(latency)
+        if len(self._latencies) < self.window:
+            return
+        sample = statistics.median(self._latencies)
+        self._latencies.clear()
+        saturated, self._saturated = self._saturated, False
+        if self.baseline is None or sample < self.baseline:
+            self.baseline = sample
+        if sample > self.baseline * self.tolerance:
+            self.limit = max(self.min_limit, math.floor(self.limit * 0.75))
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.baseline *= 1.1
+
+    @asynccontextmanager
+    async def slot(
+        self, timeout: Optional[float] = None, timer: Optional[StageTimer] = None, lane: str = FREE,
+        cost: int = 1,
+    ) -> AsyncIterator[None]:
+        """Hold ``cost`` slots of ``lane`` for the enclosed work; the wait is timed as ``queue``."""
+        start = time.perf_counter()
+        try:
+            await self.acquire(timeout, lane, cost)
+        finally:
+            if timer is not None:
+                timer.add("queue", time.perf_counter() - start)
+        held = time.monotonic()
+        latency: Optional[float] = None
+        try:
+            yield
+            latency = time.monotonic() - held
+        except Exception:
+            # Failures take downstream time too, e.g. timeouts under overload
+            latency = time.monotonic() - held
+            raise
+        finally:
+            self.release(latency, lane, cost)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "queue_size": self.queue_size,
+            "baseline_ms": round(self.baseline * 1000, 1) if self.baseline is not None else None,
+            "lanes": {name: lane.snapshot() for name, lane in self.lanes.items()},
+        }
+
+
+async def cancel_on_disconnect(
+    request: Any, work: Awaitable[T], interval: float = ADMISSION_DISCONNECT_POLL
+) -> T:
+    """Await ``work`` unless the client disconnects first.
+
+    While ``work`` runs, ``request.is_disconnected()`` is polled every
+    ``interval`` seconds; once it is true ``work`` is cancelled, wherever
+    it is (queued, waiting on TorchServe or OpenAI), and
+    :class:`ClientDisconnected` is raised.
+    """
+    task = asyncio.ensure_future(work)
+    is_disconnected = getattr(request, "is_disconnected", None)
+    if is_disconnected is None:
+        return await task
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+
+predict_admission = AdmissionController()
@@ -0,0 +1,177 @@
+"""Dynamic micro-batching for model inference calls."""
+
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+
+
+InferBatch = Callable[[List[bytes]], Awaitable[Sequence[Any]]]
+
+
+class EmbeddingBatcher:
+    """Gather concurrent inference requests into batches.
+
+    Requests are queued and collected until either ``max_batch_size`` items
+    are waiting or ``max_delay_ms`` has passed since the first item of the
+    batch arrived; with no delay, a batch is whatever is already queued.
+    The whole batch is handed to ``infer_batch`` in one call and each
+    result is routed back to the coroutine awaiting it.
+
+    ``infer_batch`` must return one entry per input. An entry that is an
+    ``Exception`` instance fails only the matching request.
+    """
+
+    def __init__(
+        self,
+        infer_batch: InferBatch,
+        max_batch_size: int = 8,
+        max_delay_ms: float = 10.0,
+        max_queue: int = 256,
+        max_inflight_batches: int = 2,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.infer_batch = infer_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_queue = max_queue
+        self.max_inflight_batches = max_inflight_batches
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._batch_tasks: set = set()
+
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "total_queue_delay": 0.0,
+            "max_queue_delay": 0.0,
+        }
+        self.batch_sizes: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        """Start the collector task on the running event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._inflight = asyncio.Semaphore(self.max_inflight_batches)
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        """Stop collecting and wait for in-flight batches to finish."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, fut, _ = self._queue.get_nowait()
+                if not fut.done():
+                    fut.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, image: bytes) -> Any:
+        """Queue ``image`` for inference and return its result."""
+        if not self.running:
+            raise RuntimeError("Batcher is not running")
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, fut, time.perf_counter()))
+        self.stats["requests"] += 1
+        return await fut
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_delay
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                await self._inflight.acquire()
+            except asyncio.CancelledError:
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(RuntimeError("Batcher stopped"))
+                raise
+
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[bytes, asyncio.Future, float]]) -> None:
+        try:
+            # Requests whose caller has gone away are not worth inferring
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                return
+
+            now = time.perf_counter()
+            for _, _, queued_at in batch:
+                delay = now - queued_at
+                self.stats["total_queue_delay"] += delay
+                self.stats["max_queue_delay"] = max(self.stats["max_queue_delay"], delay)
+            self.stats["batches"] += 1
+            self.batch_sizes[len(batch)] += 1
+
+            try:
+                results = await self.infer_batch([image for image, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"Inference returned {len(results)} results for {len(batch)} inputs"
+                    )
+            except Exception as exc:
+                self.stats["errors"] += 1
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                return
+
+            for (_, fut, _), result in zip(batch, results):
+                if fut.done():
+                    continue
+                if isinstance(result, Exception):
+                    self.stats["errors"] += 1
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
+        finally:
+            self._inflight.release()
+
+    def snapshot(self) -> dict:
+        """Return counters describing batch sizes and queue delay."""
+        requests = sum(size * count for size, count in self.batch_sizes.items())
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "queue_depth": self.queue_depth,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "mean_queue_delay": self.stats["total_queue_delay"] / requests if requests else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "max_batch_size": self.max_batch_size,
+            "max_delay_ms": self.max_delay * 1000.0,
+        }
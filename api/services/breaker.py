@@ -0,0 +1,185 @@
+"""Circuit breakers for the API's downstream dependencies."""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+from api.services.deadline import DeadlineExceeded
+
+BREAKER_FAILURE_RATE = float(os.getenv('BREAKER_FAILURE_RATE', '0.5'))
+BREAKER_MIN_CALLS = int(os.getenv('BREAKER_MIN_CALLS', '5'))
+BREAKER_WINDOW_SECONDS = float(os.getenv('BREAKER_WINDOW_SECONDS', '60'))
+BREAKER_OPEN_SECONDS = float(os.getenv('BREAKER_OPEN_SECONDS', '30'))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Rolling-window circuit breaker.
+
+    Calls made through :meth:`guard` are recorded with their outcome and
+    latency; calls slower than ``slow_call_seconds`` count as failures. Once
+    at least ``min_calls`` calls in the last ``window_seconds`` have a
+    failure rate of ``failure_rate`` or more, the breaker opens and calls
+    fail immediately with :class:`CircuitOpenError`. After ``open_seconds``
+    it lets ``half_open_probes`` calls through; a successful probe closes it
+    again, a failed one re-opens it.
+
+    Exceptions carrying a ``status_code`` below 500 are client errors and do
+    not count against the dependency.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        min_calls: int = BREAKER_MIN_CALLS,
+        window_seconds: float = BREAKER_WINDOW_SECONDS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        slow_call_seconds: Optional[float] = None,
+        half_open_probes: int = 1,
+        max_samples: int = 200,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._probes = 0
+        # (finished_at, ok, latency) for recent calls
+        self._calls: Deque[Tuple[float, bool, float]] = deque(maxlen=max_samples)
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def allows(self) -> bool:
+        """Return whether a call would currently be let through."""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.open_seconds
+        if self.state == HALF_OPEN:
+            return self._probes < self.half_open_probes
+        return True
+
+    def before_call(self) -> None:
+        """Reserve a call slot, or raise :class:`CircuitOpenError`."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            remaining = self.open_seconds - (now - self.opened_at)
+            if remaining > 0:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = HALF_OPEN
+            self._probes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._probes += 1
+
+    def record(self, ok: bool, latency: float = 0.0) -> None:
+        """Record the outcome of a call made after :meth:`before_call`."""
+        now = time.monotonic()
+        if ok and self.slow_call_seconds is not None and latency > self.slow_call_seconds:
+            ok = False
+        self.stats["successes" if ok else "failures"] += 1
+
+        if self.state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+            if ok:
+                self.state = CLOSED
+                self._calls.clear()
+            else:
+                self._open(now)
+            return
+
+        self._calls.append((now, ok, latency))
+        self._trim(now)
+        if self.state == CLOSED and len(self._calls) >= self.min_calls:
+            failures = sum(1 for _, call_ok, _ in self._calls if not call_ok)
+            if failures / len(self._calls) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self._probes = 0
+        self.stats["opened"] += 1
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """Run the enclosed call under the breaker and record its outcome."""
+        self.before_call()
+        start = time.monotonic()
+        try:
+            yield
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # The caller gave up or ran out of budget; that says nothing
+            # about the dependency
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            raise
+        except Exception as e:
+            status_code = getattr(e, "status_code", None)
+            client_error = isinstance(status_code, int) and status_code < 500
+            self.record(client_error, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return state, rolling error rate and latency for health output."""
+        now = time.monotonic()
+        self._trim(now)
+        calls = len(self._calls)
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        latencies = sorted(latency for _, _, latency in self._calls)
+        data = {
+            "state": self.state,
+            "window_calls": calls,
+            "error_rate": failures / calls if calls else 0.0,
+            "p50_latency": latencies[calls // 2] if calls else None,
+            "max_latency": latencies[-1] if calls else None,
+            **self.stats,
+        }
+        if self.state == OPEN:
+            data["retry_after"] = max(0.0, self.open_seconds - (now - self.opened_at))
+        return data
+
+
+torchserve_breaker = CircuitBreaker(
+    "torchserve", slow_call_seconds=float(os.getenv('BREAKER_TORCHSERVE_SLOW_SECONDS', '10')),
+)
+openai_breaker = CircuitBreaker(
+    "openai", slow_call_seconds=float(os.getenv('BREAKER_OPENAI_SLOW_SECONDS', '12')),
+)
+nominatim_breaker = CircuitBreaker(
+    "nominatim", slow_call_seconds=float(os.getenv('BREAKER_NOMINATIM_SLOW_SECONDS', '5')),
+)
+
+BREAKERS = {b.name: b for b in (torchserve_breaker, openai_breaker, nominatim_breaker)}
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Return a snapshot of every dependency breaker."""
+    return {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
@@ -0,0 +1,80 @@
+"""Per-request time budgets shared by the stages of a prediction."""
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+from api.services.timing import StageTimer
+
+# Budget for a whole prediction unless the client asks for less
+PREDICT_DEADLINE_SECONDS = float(os.getenv('PREDICT_DEADLINE_SECONDS', '25'))
+PREDICT_DEADLINE_MAX_SECONDS = float(os.getenv('PREDICT_DEADLINE_MAX_SECONDS', '60'))
+DEADLINE_HEADER = 'x-request-timeout-ms'
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage is reached with no budget left."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    """Remaining time budget for one request.
+
+    Each stage asks for ``timeout(stage, cap)`` and gets the smaller of its
+    own cap and what is left of the budget. Stage outcomes are recorded so
+    the response can report which stages ran, and ``timer`` measures how
+    long each of them took.
+    """
+
+    def __init__(self, budget: float = PREDICT_DEADLINE_SECONDS, timer: Optional[StageTimer] = None):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.stages: Dict[str, str] = {}
+        self.timer = timer or StageTimer()
+
+    @classmethod
+    def from_request(cls, request: Any = None) -> "Deadline":
+        """Build a deadline from the request header, falling back to config.
+
+        The timer includes the time the upload middleware spent on the body.
+        """
+        budget = PREDICT_DEADLINE_SECONDS
+        value = request.headers.get(DEADLINE_HEADER) if request is not None else None
+        if value:
+            try:
+                budget = float(value) / 1000.0
+            except ValueError:
+                pass
+        return cls(
+            max(0.0, min(budget, PREDICT_DEADLINE_MAX_SECONDS)),
+            StageTimer.from_scope(getattr(request, "scope", None)),
+        )
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def allows(self, needed: float) -> bool:
+        """Return whether at least ``needed`` seconds are left."""
+        return self.remaining() >= needed
+
+    def timeout(self, stage: str, cap: Optional[float] = None) -> float:
+        """Return the timeout for ``stage``, or raise if nothing is left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            self.stages[stage] = "skipped"
+            raise DeadlineExceeded(stage)
+        return min(cap, remaining) if cap is not None else remaining
+
+    def record(self, stage: str, status: str) -> None:
+        """Record ``status`` (``ok``, ``failed`` or ``skipped``) for ``stage``."""
+        self.stages[stage] = status
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": round(self.budget * 1000),
+            "remaining_ms": round(self.remaining() * 1000),
+            "stages": dict(self.stages),
+        }
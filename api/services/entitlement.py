@@ -0,0 +1,71 @@
+"""Verification of the subscription tier a client presents with a request."""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any, Optional
+
+from api.services.admission import FREE, PRO
+
+# Signed by whatever verifies the store receipt; without a secret every
+# request is served in the free lane
+ENTITLEMENT_SECRET = os.getenv('ENTITLEMENT_SECRET', '')
+ENTITLEMENT_HEADER = 'x-entitlement'
+
+entitlement_stats = {"verified": 0, "invalid": 0, "expired": 0}
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def sign_entitlement(tier: str, expires_at: float, secret: Optional[str] = None) -> str:
+    """Return a token granting ``tier`` until the Unix time ``expires_at``.
+
+    The token is ``<payload>.<signature>``: base64url of the JSON
+    ``{"tier": ..., "exp": ...}`` and of its HMAC-SHA256 under ``secret``
+    (default ``ENTITLEMENT_SECRET``).
+    """
+    secret = ENTITLEMENT_SECRET if secret is None else secret
+    payload = _b64encode(json.dumps({"tier": tier, "exp": int(expires_at)}, separators=(",", ":")).encode())
+    signature = hmac.new(secret.encode(), payload.encode("ascii"), hashlib.sha256).digest()
+    return f"{payload}.{_b64encode(signature)}"
+
+
+def verify_entitlement(token: str, secret: Optional[str] = None, now: Optional[float] = None) -> Optional[str]:
+    """Return the tier granted by ``token``, or ``None`` if it is forged or expired."""
+    secret = ENTITLEMENT_SECRET if secret is None else secret
+    if not secret:
+        return None
+    try:
+        payload, signature = token.split(".", 1)
+        expected = hmac.new(secret.encode(), payload.encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            entitlement_stats["invalid"] += 1
+            return None
+        claims = json.loads(_b64decode(payload))
+        tier, expires_at = claims["tier"], float(claims["exp"])
+    except (ValueError, KeyError, TypeError, UnicodeError, binascii.Error):
+        entitlement_stats["invalid"] += 1
+        return None
+    if expires_at < (time.time() if now is None else now):
+        entitlement_stats["expired"] += 1
+        return None
+    entitlement_stats["verified"] += 1
+    return tier
+
+
+def lane_for(request: Any) -> str:
+    """Return the admission lane for ``request``: pro with a valid token, else free."""
+    token = request.headers.get(ENTITLEMENT_HEADER) if request is not None else None
+    if token and verify_entitlement(token) == PRO:
+        return PRO
+    return FREE
@@ -0,0 +1,159 @@
+"""Offline geocoder backed by a local city/country gazetteer."""
+
+import os
+import re
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', str(DATA_DIR / "gazetteer.tsv"))
+GAZETTEER_COUNTRIES_PATH = os.getenv('GAZETTEER_COUNTRIES_PATH', str(DATA_DIR / "countries.tsv"))
+
+# Letters NFKD does not decompose into a base letter plus accent
+_SPECIAL_LETTERS = str.maketrans({
+    "ø": "o", "Ø": "o", "æ": "ae", "Æ": "ae", "œ": "oe", "Œ": "oe",
+    "ł": "l", "Ł": "l", "đ": "d", "Đ": "d", "ð": "d", "þ": "th", "ß": "ss",
+    "ı": "i",
+})
+_DROPPED = re.compile(r"[.'’`]")
+_SEPARATORS = re.compile(r"[^\w]+|_")
+
+# Columns in a GeoNames ``cities*.txt`` dump
+_GEONAMES_COLUMNS = 19
+
+
+def fold(text: str) -> str:
+    """Normalize a place name for lookup.
+
+    Diacritics are stripped, case is folded, dots and apostrophes are dropped
+    (so ``U.S.A.`` matches ``USA``) and other punctuation becomes a space.
+    """
+    text = unicodedata.normalize("NFKD", text.translate(_SPECIAL_LETTERS))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = _DROPPED.sub("", text)
+    return " ".join(_SEPARATORS.sub(" ", text).split())
+
+
+class Place(NamedTuple):
+    name: str
+    country_code: str
+    lat: float
+    lon: float
+    population: int = 0
+
+
+class Gazetteer:
+    """Hash index from folded place names to gazetteer entries.
+
+    Cities are read from a tab-separated file, either the compact format
+    shipped in ``api/data`` (name, country code, lat, lon, population,
+    comma-separated aliases) or a GeoNames ``cities*.txt`` dump. Countries
+    (code, name, lat, lon, aliases) let the country part of a reply narrow
+    the city match, and resolve replies that only name a country.
+    """
+
+    def __init__(self):
+        self.places: List[Place] = []
+        self.cities: Dict[str, List[Place]] = {}
+        self.countries: Dict[str, Place] = {}
+        self._country_codes: Dict[str, str] = {}
+        self.stats = {"hits": 0, "misses": 0, "places": 0, "load_time": 0.0}
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.cities or self.countries)
+
+    def add_city(self, place: Place, aliases: Iterable[str] = ()) -> None:
+        keys = {fold(place.name)} | {fold(alias) for alias in aliases}
+        for key in keys:
+            if key:
+                self.cities.setdefault(key, []).append(place)
+        self.places.append(place)
+        self.stats["places"] += 1
+
+    def add_country(self, place: Place, aliases: Iterable[str] = ()) -> None:
+        code = place.country_code.upper()
+        self.countries[code] = place
+        for key in {fold(place.name), fold(code)} | {fold(alias) for alias in aliases}:
+            if key:
+                self._country_codes[key] = code
+
+    def load(self, cities_path: Optional[str] = GAZETTEER_PATH,
+             countries_path: Optional[str] = GAZETTEER_COUNTRIES_PATH) -> None:
+        """Load the city and country files; empty paths are skipped."""
+        start = time.monotonic()
+        if countries_path:
+            for row in _read_rows(countries_path):
+                code, name, lat, lon = row[:4]
+                aliases = row[4].split(",") if len(row) > 4 else ()
+                self.add_country(Place(name, code.upper(), float(lat), float(lon)), aliases)
+        if cities_path:
+            for row in _read_rows(cities_path):
+                if len(row) >= _GEONAMES_COLUMNS:
+                    place = Place(row[1], row[8].upper(), float(row[4]), float(row[5]),
+                                  int(row[14] or 0))
+                    aliases = [row[2]] + row[3].split(",")
+                else:
+                    name, code, lat, lon = row[:4]
+                    population = int(row[4]) if len(row) > 4 and row[4] else 0
+                    place = Place(name, code.upper(), float(lat), float(lon), population)
+                    aliases = row[5].split(",") if len(row) > 5 else ()
+                self.add_city(place, aliases)
+        for places in self.cities.values():
+            places.sort(key=lambda p: p.population, reverse=True)
+        self.stats["load_time"] = time.monotonic() - start
+
+    def country_code(self, name: str) -> Optional[str]:
+        return self._country_codes.get(fold(name))
+
+    def lookup(self, query: str) -> Optional[Place]:
+        """Resolve a reply such as ``"Paris, France"`` to a place.
+
+        The last comma-separated part is treated as a country when it names
+        one; the remaining parts are tried as city names, most specific
+        first, and the most populous match in that country wins. A reply
+        naming only a country resolves to the country itself. A bare city
+        name resolves to its most populous match, but one qualified by
+        anything other than a known country, such as a state, is a miss.
+        """
+        parts = [part for part in (fold(p) for p in query.split(",")) if part]
+        place = self._resolve(parts) if parts else None
+        self.stats["hits" if place else "misses"] += 1
+        return place
+
+    def _resolve(self, parts: List[str]) -> Optional[Place]:
+        code = self._country_codes.get(parts[-1])
+        if code is None and len(parts) > 1:
+            # "Paris, Texas": the qualifier is no country we know, so the
+            # most populous Paris anywhere would be a guess
+            return None
+        names = parts[:-1] if code and len(parts) > 1 else parts
+        for name in names:
+            for place in self.cities.get(name, ()):
+                if code is None or place.country_code == code:
+                    return place
+        if code and len(parts) == 1 and parts[0] not in self.cities:
+            return self.countries.get(code)
+        return None
+
+    def snapshot(self) -> Dict[str, float]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "names": len(self.cities),
+            "countries": len(self.countries),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+def _read_rows(path: str) -> Iterable[List[str]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            yield line.rstrip("\n").split("\t")
+
+
+gazetteer = Gazetteer()
@@ -0,0 +1,213 @@
+"""Two-tier cache of place name to coordinate lookups."""
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from api.repositories.geocode import (
+    GeocodeRow,
+    add_geocode_hits,
+    get_geocode,
+    most_frequent_geocodes,
+    upsert_geocodes,
+)
+from api.services.gazetteer import fold
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', '10000'))
+GEOCODE_CACHE_TTL = float(os.getenv('GEOCODE_CACHE_TTL', str(30 * 86400)))
+GEOCODE_CACHE_NEGATIVE_TTL = float(os.getenv('GEOCODE_CACHE_NEGATIVE_TTL', '86400'))
+GEOCODE_CACHE_WARM = int(os.getenv('GEOCODE_CACHE_WARM', '1000'))
+GEOCODE_CACHE_FLUSH_SECONDS = float(os.getenv('GEOCODE_CACHE_FLUSH_SECONDS', '5'))
+
+Coords = Tuple[float, float]
+
+
+class CacheEntry(NamedTuple):
+    coords: Optional[Coords]  # None caches a "not found" answer
+    expires_at: float
+
+    @property
+    def found(self) -> bool:
+        return self.coords is not None
+
+
+class GeocodeCache:
+    """In-process LRU in front of the ``geocode_cache`` table.
+
+    Lookups check memory first, then Postgres; hits from Postgres are
+    promoted into memory. Found places live for ``ttl`` seconds and "not
+    found" answers for ``negative_ttl`` seconds. New entries and hit counts
+    are written to Postgres in the background every ``flush_seconds``, and
+    :meth:`start` warms memory with the ``warm`` most frequently hit rows.
+    Without a pool the cache is memory-only.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = GEOCODE_CACHE_SIZE,
+        ttl: float = GEOCODE_CACHE_TTL,
+        negative_ttl: float = GEOCODE_CACHE_NEGATIVE_TTL,
+        warm: int = GEOCODE_CACHE_WARM,
+        flush_seconds: float = GEOCODE_CACHE_FLUSH_SECONDS,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.warm = warm
+        self.flush_seconds = flush_seconds
+
+        self.pool: Any = None
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._pending: Dict[str, Optional[Coords]] = {}
+        self._hits: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "memory_hits": 0,
+            "db_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "warmed": 0,
+            "db_errors": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def start(self, pool: Any) -> None:
+        """Warm memory from ``pool`` and start writing back in the background."""
+        if self.running or pool is None:
+            return
+        self.pool = pool
+        try:
+            rows = await most_frequent_geocodes(pool, self.warm, self.ttl, self.negative_ttl)
+        except Exception as e:
+            self.stats["db_errors"] += 1
+            logger.warning("Geocode cache warm-up failed: %s", e)
+            rows = []
+        for row in reversed(rows):  # most frequent ends up most recently used
+            self._store(row["query"], _coords(row), float(row["age"]))
+        self.stats["warmed"] = len(rows)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write back pending entries."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    async def get(self, place: str) -> Optional[CacheEntry]:
+        """Return the cached answer for ``place``, or ``None`` if not cached."""
+        key = fold(place)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hit(key, entry, "memory_hits")
+                return entry
+            del self._entries[key]
+            self.stats["expired"] += 1
+
+        if self.pool is not None and key not in self._pending:
+            try:
+                row = await get_geocode(self.pool, key, self.ttl, self.negative_ttl)
+            except Exception as e:
+                self.stats["db_errors"] += 1
+                logger.warning("Geocode cache read failed: %s", e)
+                row = None
+            if row is not None:
+                entry = self._store(key, _coords(row), float(row["age"]))
+                self._hit(key, entry, "db_hits")
+                return entry
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, place: str, coords: Optional[Coords]) -> CacheEntry:
+        """Cache ``coords`` for ``place``; ``None`` records that it was not found."""
+        key = fold(place)
+        entry = self._store(key, coords)
+        if self.pool is not None:
+            self._pending[key] = coords
+        return entry
+
+    def _store(self, key: str, coords: Optional[Coords], age: float = 0.0) -> CacheEntry:
+        ttl = self.ttl if coords is not None else self.negative_ttl
+        entry = CacheEntry(coords, time.monotonic() + ttl - age)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return entry
+
+    def _hit(self, key: str, entry: CacheEntry, counter: str) -> None:
+        self.stats[counter] += 1
+        if not entry.found:
+            self.stats["negative_hits"] += 1
+        if self.pool is not None:
+            self._hits[key] += 1
+
+    async def flush(self) -> bool:
+        """Write pending entries and hit counts to Postgres. Returns ``False`` on error."""
+        if self.pool is None or not (self._pending or self._hits):
+            return True
+        pending, self._pending = self._pending, {}
+        hits, self._hits = self._hits, Counter()
+        rows: List[GeocodeRow] = [
+            (key, *(coords or (None, None)), coords is not None) for key, coords in pending.items()
+        ]
+        try:
+            if rows:
+                await upsert_geocodes(self.pool, rows)
+            if hits:
+                await add_geocode_hits(self.pool, list(hits.items()))
+        except Exception as e:
+            self.stats["db_errors"] += 1
+            logger.warning("Geocode cache write-back failed: %s", e)
+            # Keep them for the next flush unless newer values arrived meanwhile
+            for key, coords in pending.items():
+                self._pending.setdefault(key, coords)
+            self._hits.update(hits)
+            return False
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return hit counters and the overall hit rate."""
+        hits = self.stats["memory_hits"] + self.stats["db_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "pending_writes": len(self._pending),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_hit_rate": self.stats["memory_hits"] / lookups if lookups else 0.0,
+        }
+
+
+def _coords(row: Any) -> Optional[Coords]:
+    return (float(row["lat"]), float(row["lon"])) if row["found"] else None
+
+
+geocode_cache = GeocodeCache()
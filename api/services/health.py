@@ -0,0 +1,179 @@
+"""Dependency status probed in the background and served from memory."""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from api.lazy import lazy_import
+from api.services.breaker import CLOSED, OPEN, openai_breaker
+
+httpx = lazy_import("httpx")
+
+logger = logging.getLogger(__name__)
+
+TORCHSERVE_MANAGEMENT_URL = os.getenv('TORCHSERVE_MANAGEMENT_URL', 'http://localhost:8081')
+TORCHSERVE_MODEL = 'where'
+# Probes run this often; /health only reads their last result
+HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', '10'))
+HEALTH_PROBE_TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', '3'))
+# Readiness fails when the last probe is older than this many intervals
+HEALTH_STALE_INTERVALS = 3
+
+
+def _check(status: str, detail: Optional[str] = None, latency: Optional[float] = None) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "detail": detail,
+        "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+        "checked_at": time.time(),
+    }
+
+
+class HealthMonitor:
+    """Probe TorchServe, the database and the OpenAI breaker on an interval.
+
+    Every ``interval`` seconds the probes run concurrently, each bounded by
+    ``timeout``, and their results replace ``checks``. Request handlers
+    only read ``checks``, so a hung dependency never blocks ``/health``.
+    Until the first round finishes every check is ``unknown``.
+    """
+
+    def __init__(
+        self,
+        interval: float = HEALTH_PROBE_INTERVAL,
+        timeout: float = HEALTH_PROBE_TIMEOUT,
+        management_url: str = TORCHSERVE_MANAGEMENT_URL,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.management_url = management_url
+        self.pool: Any = None
+        self.models: Dict[str, Any] = {}
+        self.checks: Dict[str, Dict[str, Any]] = {
+            name: _check("unknown") for name in ("torchserve", "database", "openai")
+        }
+        self.last_probe: Optional[float] = None  # monotonic time of the last finished round
+        self._client: "Optional[httpx.AsyncClient]" = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"probes": 0, "probe_errors": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, pool: Any = None) -> None:
+        """Start probing in the background; ``pool`` is pinged if given."""
+        if self.running:
+            return
+        self.pool = pool
+        self._client = httpx.AsyncClient(timeout=self.timeout)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    async def probe(self) -> Dict[str, Dict[str, Any]]:
+        """Run every probe once and store the results."""
+        results = await asyncio.gather(
+            self._probe_torchserve(), self._probe_database(), return_exceptions=True
+        )
+        for name, result in zip(("torchserve", "database"), results):
+            if isinstance(result, BaseException):
+                self.stats["probe_errors"] += 1
+                logger.warning("Health probe %s failed: %s", name, result)
+                result = _check("unhealthy", str(result))
+            self.checks[name] = result
+        self.checks["openai"] = self._probe_openai()
+        self.stats["probes"] += 1
+        self.last_probe = time.monotonic()
+        return self.checks
+
+    async def _probe_torchserve(self) -> Dict[str, Any]:
+        client = self._client or httpx.AsyncClient(timeout=self.timeout)
+        start = time.monotonic()
+        try:
+            response = await client.get(f"{self.management_url}/models")
+        except httpx.ConnectError as e:
+            return _check("unhealthy", f"connection error - {e}")
+        except httpx.TimeoutException as e:
+            return _check("unhealthy", f"timeout - {e}")
+        finally:
+            if client is not self._client:
+                await client.aclose()
+        latency = time.monotonic() - start
+
+        if response.status_code != 200:
+            return _check("unhealthy", f"status: {response.status_code}, body: {response.text}", latency)
+        self.models = response.json()
+        names = [model.get("modelName") for model in self.models.get("models") or []]
+        if not names:
+            return _check("unhealthy", "no models loaded", latency)
+        if TORCHSERVE_MODEL not in names:
+            return _check("unhealthy", f'"{TORCHSERVE_MODEL}" model not found. Found models: {names}', latency)
+        return _check("healthy", None, latency)
+
+    async def _probe_database(self) -> Dict[str, Any]:
+        if self.pool is None:
+            return _check("unhealthy", "no database pool")
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self.pool.fetchval("SELECT 1"), self.timeout)
+        except asyncio.TimeoutError:
+            return _check("unhealthy", f"ping timed out after {self.timeout}s")
+        return _check("healthy", None, time.monotonic() - start)
+
+    def _probe_openai(self) -> Dict[str, Any]:
+        # OpenAI is only reached per prediction; its breaker tracks those calls
+        state = openai_breaker.state
+        status = "healthy" if state == CLOSED else "unhealthy" if state == OPEN else "degraded"
+        return _check(status, f"circuit {state}")
+
+    def age(self) -> Optional[float]:
+        """Seconds since the last probe round finished, or ``None`` before the first."""
+        return None if self.last_probe is None else time.monotonic() - self.last_probe
+
+    def ready(self) -> bool:
+        """Whether predictions can be served: TorchServe and the database are up."""
+        age = self.age()
+        return (
+            age is not None
+            and age <= self.interval * HEALTH_STALE_INTERVALS
+            and self.checks["torchserve"]["status"] == "healthy"
+            and self.checks["database"]["status"] == "healthy"
+        )
+
+    def torchserve_status(self) -> str:
+        """Describe TorchServe the way ``/health`` always has."""
+        check = self.checks["torchserve"]
+        if check["detail"] is None:
+            return check["status"]
+        return f'{check["status"]} - {check["detail"]}'
+
+    def snapshot(self) -> Dict[str, Any]:
+        age = self.age()
+        return {
+            **self.stats,
+            "checks": self.checks,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "interval": self.interval,
+            "ready": self.ready(),
+        }
+
+
+health_monitor = HealthMonitor()
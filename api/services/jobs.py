@@ -0,0 +1,286 @@
+"""In-process queue of asynchronous prediction jobs, shared through the ``jobs`` table."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from api.repositories.jobs import delete_stale_jobs, get_job, save_job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '100'))
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', '600'))
+JOB_MAX_STORED = int(os.getenv('JOB_MAX_STORED', '1000'))
+# How often a job run by another worker is re-read while streaming its events
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '1'))
+
+Work = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be accepted."""
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"  # queued, running, succeeded or failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Dict[str, Any]] = None
+    work: Optional[Work] = field(default=None, repr=False)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+    @classmethod
+    def from_row(cls, row: Any) -> "Job":
+        def epoch(value: Any) -> Optional[float]:
+            return float(value) if value is not None else None
+
+        job = cls(
+            id=row["id"],
+            status=row["status"],
+            created_at=float(row["created_at"]),
+            started_at=epoch(row["started_at"]),
+            finished_at=epoch(row["finished_at"]),
+            result=json.loads(row["result"]) if row["result"] is not None else None,
+            error=json.loads(row["error"]) if row["error"] is not None else None,
+        )
+        if job.finished:
+            job.done.set()
+        return job
+
+
+class JobManager:
+    """Run submitted work on a fixed pool of asyncio workers.
+
+    Finished jobs are kept for ``result_ttl`` seconds (and at most
+    ``max_stored`` jobs overall) so clients can collect their results.
+    With a pool every change of status is also written to the ``jobs``
+    table, so a job submitted to one worker process can be polled or
+    streamed from any other; jobs run where they were submitted.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE,
+        result_ttl: float = JOB_RESULT_TTL,
+        max_stored: int = JOB_MAX_STORED,
+        poll_seconds: float = JOB_POLL_SECONDS,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self.max_stored = max_stored
+        self.poll_seconds = poll_seconds
+
+        self.pool: Any = None
+        self._last_cleanup = 0.0
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {
+            "submitted": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "rejected": 0,
+            "running": 0,
+            "total_wait_time": 0.0,
+            "total_run_time": 0.0,
+            "db_errors": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self, pool: Any = None) -> None:
+        """Start the worker tasks on the running event loop, sharing jobs through ``pool``."""
+        if self.running:
+            return
+        self.pool = pool
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued jobs are marked as failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            self._finish(job, error={"status_code": 503, "detail": "Server shutting down"})
+            await self.save(job)
+
+    def submit(self, work: Work) -> Job:
+        """Queue ``work`` and return its job without waiting for it."""
+        if not self.running:
+            raise RuntimeError("Job manager is not running")
+        self._evict()
+        if len(self.jobs) >= self.max_stored:
+            self.stats["rejected"] += 1
+            raise JobQueueFull("Too many stored jobs")
+        job = Job(id=uuid.uuid4().hex, work=work)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise JobQueueFull("Job queue is full")
+        self.jobs[job.id] = job
+        self.stats["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def lookup(self, job_id: str) -> Optional[Job]:
+        """Return a job submitted to this process or, with a pool, to any other."""
+        job = self.jobs.get(job_id)
+        if job is not None or self.pool is None:
+            return job
+        try:
+            row = await get_job(self.pool, job_id, self.result_ttl)
+        except Exception as e:
+            self.stats["db_errors"] += 1
+            logger.warning("Job lookup failed: %s", e)
+            return None
+        return Job.from_row(row) if row is not None else None
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        """Wait up to ``timeout`` seconds for ``job`` to finish and return its latest state.
+
+        A job run by another process is re-read every ``poll_seconds``.
+        Raises :class:`asyncio.TimeoutError` if it is still unfinished.
+        """
+        if self.jobs.get(job.id) is job or self.pool is None:
+            await asyncio.wait_for(job.done.wait(), timeout)
+            return job
+        deadline = time.monotonic() + timeout
+        while not job.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            await asyncio.sleep(min(self.poll_seconds, remaining))
+            job = await self.lookup(job.id) or job
+        return job
+
+    async def save(self, job: Job) -> None:
+        """Write ``job``'s state to the ``jobs`` table; a no-op without a pool."""
+        if self.pool is None:
+            return
+        try:
+            await save_job(
+                self.pool, job.id, job.status, job.created_at, job.started_at, job.finished_at,
+                json.dumps(job.result) if job.result is not None else None,
+                json.dumps(job.error) if job.error is not None else None,
+            )
+        except Exception as e:
+            self.stats["db_errors"] += 1
+            logger.warning("Saving job %s failed: %s", job.id, e)
+        await self._cleanup()
+
+    async def _cleanup(self) -> None:
+        now = time.time()
+        if now - self._last_cleanup < self.result_ttl:
+            return
+        self._last_cleanup = now
+        try:
+            # Unfinished rows this old were left by a worker that died
+            await delete_stale_jobs(self.pool, now - 2 * self.result_ttl)
+        except Exception as e:
+            logger.warning("Job cleanup failed: %s", e)
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        for job_id in list(self.jobs):
+            job = self.jobs[job_id]
+            if job.finished and job.finished_at < cutoff:
+                del self.jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self.stats["running"] += 1
+            self.stats["total_wait_time"] += job.started_at - job.created_at
+            await self.save(job)
+            try:
+                result = await job.work()
+            except asyncio.CancelledError:
+                self._finish(job, error={"status_code": 503, "detail": "Server shutting down"})
+                await self.save(job)
+                raise
+            except Exception as e:
+                self._finish(job, error={
+                    "status_code": getattr(e, "status_code", 500),
+                    "detail": getattr(e, "detail", None) or f"Prediction error: {str(e)}",
+                })
+            else:
+                self._finish(job, result=result)
+            finally:
+                self.stats["running"] -= 1
+            await self.save(job)
+
+    def _finish(self, job: Job, result: Optional[Dict[str, Any]] = None,
+                error: Optional[Dict[str, Any]] = None) -> None:
+        job.finished_at = time.time()
+        job.work = None  # release the upload held by the closure
+        if error is None:
+            job.status = "succeeded"
+            job.result = result
+            self.stats["succeeded"] += 1
+        else:
+            job.status = "failed"
+            job.error = error
+            self.stats["failed"] += 1
+        if job.started_at is not None:
+            self.stats["total_run_time"] += job.finished_at - job.started_at
+        job.done.set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return queue depth and job outcome counters."""
+        started = self.stats["succeeded"] + self.stats["failed"] + self.stats["running"]
+        finished = self.stats["succeeded"] + self.stats["failed"]
+        return {
+            **self.stats,
+            "queue_depth": self.queue_depth,
+            "stored_jobs": len(self.jobs),
+            "mean_wait_time": self.stats["total_wait_time"] / started if started else 0.0,
+            "mean_run_time": self.stats["total_run_time"] / finished if finished else 0.0,
+        }
+
+
+job_manager = JobManager()
@@ -0,0 +1,232 @@
+"""Prometheus text exposition of the API's counters, gauges and histograms."""
+
+from collections import Counter
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from api.db import pool_metrics
+from api.services.admission import CLIENT_CLOSED_REQUEST, predict_admission
+from api.services.entitlement import entitlement_stats
+from api.services.gazetteer import gazetteer
+from api.services.geocode_cache import geocode_cache
+from api.services.jobs import job_manager
+from api.services.prediction_log import prediction_log
+from api.services.timing import LatencyHistogram, stage_latency
+
+METRICS_PREFIX = 'whereisthisplace'
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Scope state key where a route names the source of its prediction
+PREDICTION_SOURCE_STATE = 'prediction_source'
+
+
+def outcome_of(status_code: int) -> str:
+    """Name the outcome of a request from its HTTP status."""
+    if status_code < 400:
+        return "success"
+    if status_code == CLIENT_CLOSED_REQUEST:
+        return "cancelled"
+    if status_code == 503:
+        return "unavailable"
+    if status_code == 504:
+        return "timeout"
+    if status_code < 500:
+        return "client_error"
+    return "error"
+
+
+class RequestMetrics:
+    """Request counts by route, outcome and source, and requests in flight.
+
+    Both are plain integers updated from the event loop by
+    ``RequestMetricsMiddleware``; a scrape reads them on the loop as they
+    are, so recording a request never takes a lock.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.counts: Counter = Counter()  # (route, outcome, source) -> requests
+
+    def started(self) -> None:
+        self.in_flight += 1
+
+    def finished(self, route: str, outcome: str, source: str) -> None:
+        self.in_flight -= 1
+        self.counts[(route, outcome, source)] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "requests": sum(self.counts.values())}
+
+
+request_metrics = RequestMetrics()
+
+
+def _value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels: Optional[Mapping[str, Any]]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{key}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsWriter:
+    """Collects metric families in the Prometheus text format."""
+
+    def __init__(self, prefix: str = METRICS_PREFIX):
+        self.prefix = prefix
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> str:
+        name = f"{self.prefix}_{name}"
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def sample(self, name: str, value: float, labels: Optional[Mapping[str, Any]] = None) -> None:
+        self.lines.append(f"{name}{_labels(labels)} {_value(value)}")
+
+    def histogram(self, name: str, histogram: LatencyHistogram, labels: Mapping[str, Any], scale: float) -> None:
+        """Write ``histogram`` with its bucket bounds and sum multiplied by ``scale``."""
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound * scale:g}"
+            self.sample(f"{name}_bucket", cumulative, {**labels, "le": le})
+        self.sample(f"{name}_sum", histogram.sum * scale, labels)
+        self.sample(f"{name}_count", histogram.count, labels)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics(
+    pool_stats: Optional[Mapping[str, float]] = None, rate_limiter: Any = None, batcher: Any = None
+) -> str:
+    """Render every metric the API exposes.
+
+    ``pool_stats`` are the database pool gauges (see ``api.db.pool_stats``),
+    ``rate_limiter`` the limiter used by the rate-limit middleware and
+    ``batcher`` the TorchServe embedding batcher.
+    """
+    out = MetricsWriter()
+
+    name = out.family("stage_duration_seconds", "histogram", "Time spent per prediction stage.")
+    for stage, histogram in list(stage_latency.histograms.items()):
+        out.histogram(name, histogram, {"stage": stage}, scale=0.001)
+
+    name = out.family("requests_total", "counter", "Inference requests by route, outcome and source.")
+    for (route, outcome, source), count in sorted(request_metrics.counts.items()):
+        out.sample(name, count, {"route": route, "outcome": outcome, "source": source})
+    name = out.family("requests_in_flight", "gauge", "Inference requests being handled.")
+    out.sample(name, request_metrics.in_flight)
+
+    lanes = predict_admission.lanes
+    name = out.family("admission_limit", "gauge", "Predictions allowed to run at once.")
+    out.sample(name, predict_admission.limit)
+    name = out.family("admission_in_flight", "gauge", "Predictions holding an admission slot, by lane.")
+    for lane in lanes.values():
+        out.sample(name, lane.in_flight, {"lane": lane.name})
+    name = out.family("admission_queue_depth", "gauge", "Predictions waiting for an admission slot, by lane.")
+    for lane in lanes.values():
+        out.sample(name, len(lane.waiters), {"lane": lane.name})
+    name = out.family("admission_shed_total", "counter", "Predictions rejected with 503 before running.")
+    for lane in lanes.values():
+        out.sample(name, lane.stats["shed_queue_full"], {"lane": lane.name, "reason": "queue_full"})
+        out.sample(name, lane.stats["shed_queue_timeout"], {"lane": lane.name, "reason": "queue_timeout"})
+    name = out.family("admission_cancelled_total", "counter", "Predictions cancelled because the client disconnected.")
+    for lane in lanes.values():
+        out.sample(name, lane.stats["cancelled"], {"lane": lane.name})
+    name = out.family("admission_queue_wait_seconds", "histogram", "Time predictions waited for a slot.")
+    for lane in lanes.values():
+        out.histogram(name, lane.queue_wait, {"lane": lane.name}, scale=0.001)
+    name = out.family("lane_request_duration_seconds", "histogram", "Whole /predict latency by lane.")
+    for lane in lanes.values():
+        out.histogram(name, lane.latency, {"lane": lane.name}, scale=0.001)
+    name = out.family("entitlement_checks_total", "counter", "Entitlement tokens checked, by result.")
+    for result, count in entitlement_stats.items():
+        out.sample(name, count, {"result": result})
+
+    if pool_stats:
+        name = out.family("db_pool_connections", "gauge", "Database pool connections by state.")
+        out.sample(name, pool_stats["in_use"], {"state": "in_use"})
+        out.sample(name, pool_stats["idle"], {"state": "idle"})
+        name = out.family("db_pool_max_connections", "gauge", "Most connections the pool may open.")
+        out.sample(name, pool_stats["max"])
+        name = out.family("db_pool_min_connections", "gauge", "Connections the pool keeps open.")
+        out.sample(name, pool_stats["min"])
+        name = out.family("db_pool_waiting", "gauge", "Tasks waiting to acquire a pool connection.")
+        out.sample(name, pool_stats["waiting"])
+        name = out.family("db_pool_acquire_wait_seconds", "histogram", "Time spent acquiring a pool connection.")
+        out.histogram(name, pool_metrics.acquire_wait, {}, scale=0.001)
+        name = out.family("db_pool_acquire_timeouts_total", "counter", "Pool acquires that timed out.")
+        out.sample(name, pool_metrics.stats["acquire_timeouts"])
+
+    cache = geocode_cache.stats
+    name = out.family("cache_lookups_total", "counter", "Geocoding lookups by cache and result.")
+    lookups: List[Tuple[str, str, int]] = [
+        ("gazetteer", "hit", gazetteer.stats["hits"]),
+        ("gazetteer", "miss", gazetteer.stats["misses"]),
+        ("geocode_cache", "memory_hit", cache["memory_hits"]),
+        ("geocode_cache", "db_hit", cache["db_hits"]),
+        ("geocode_cache", "miss", cache["misses"]),
+    ]
+    for cache_name, result, count in lookups:
+        out.sample(name, count, {"cache": cache_name, "result": result})
+    name = out.family("cache_hit_ratio", "gauge", "Share of lookups answered by each cache.")
+    out.sample(name, gazetteer.snapshot()["hit_rate"], {"cache": "gazetteer"})
+    out.sample(name, geocode_cache.snapshot()["hit_rate"], {"cache": "geocode_cache"})
+
+    log = prediction_log.snapshot()
+    name = out.family("prediction_log_queue_depth", "gauge", "Prediction rows waiting to be written.")
+    out.sample(name, log["queue_depth"])
+    name = out.family("prediction_log_rows_total", "counter", "Prediction rows by what happened to them.")
+    for result in ("enqueued", "flushed", "dropped"):
+        out.sample(name, log[result], {"result": result})
+    name = out.family("prediction_log_flush_errors_total", "counter", "Prediction log flushes that failed.")
+    out.sample(name, log["flush_errors"])
+
+    jobs = job_manager.snapshot()
+    name = out.family("jobs_queue_depth", "gauge", "Jobs waiting for a worker.")
+    out.sample(name, jobs["queue_depth"])
+    name = out.family("jobs_running", "gauge", "Jobs being run.")
+    out.sample(name, jobs["running"])
+    name = out.family("jobs_stored", "gauge", "Jobs kept in memory for polling.")
+    out.sample(name, jobs["stored_jobs"])
+    name = out.family("jobs_total", "counter", "Jobs by outcome.")
+    for result in ("submitted", "succeeded", "failed", "rejected"):
+        out.sample(name, jobs[result], {"result": result})
+    name = out.family("jobs_wait_seconds_total", "counter", "Time jobs waited for a worker.")
+    out.sample(name, jobs["total_wait_time"])
+    name = out.family("jobs_run_seconds_total", "counter", "Time spent running jobs.")
+    out.sample(name, jobs["total_run_time"])
+
+    if batcher is not None:
+        dispatch = batcher.snapshot()
+        name = out.family("torchserve_queue_depth", "gauge", "Images waiting to be sent to TorchServe.")
+        out.sample(name, dispatch["queue_depth"])
+        name = out.family("torchserve_dispatches_total", "counter", "Groups of images sent to TorchServe, by size.")
+        for size, count in dispatch["batch_sizes"].items():
+            out.sample(name, count, {"size": str(size)})
+        name = out.family("torchserve_errors_total", "counter", "Images whose TorchServe inference failed.")
+        out.sample(name, dispatch["errors"])
+        name = out.family(
+            "torchserve_queue_delay_seconds_total", "counter", "Time images waited to be sent to TorchServe."
+        )
+        out.sample(name, dispatch["total_queue_delay"])
+
+    if rate_limiter is not None:
+        stats = rate_limiter.stats
+        reservation = stats.get("reservation_exhausted", 0)
+        name = out.family("rate_limit_rejections_total", "counter", "Requests rejected by the rate limiter.")
+        out.sample(name, stats["rejected"] - reservation, {"reason": "limit"})
+        out.sample(name, reservation, {"reason": "reservation"})
+        name = out.family("rate_limit_allowed_total", "counter", "Requests let through by the rate limiter.")
+        out.sample(name, stats["allowed"])
+
+    return out.text()
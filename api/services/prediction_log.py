@@ -0,0 +1,138 @@
+"""Write-behind logging of predictions to the database."""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from api.repositories.photos import PredictionRow, insert_predictions
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_LOG_FLUSH_ROWS = int(os.getenv('PREDICTION_LOG_FLUSH_ROWS', '100'))
+PREDICTION_LOG_FLUSH_MS = float(os.getenv('PREDICTION_LOG_FLUSH_MS', '500'))
+PREDICTION_LOG_MAX_QUEUE = int(os.getenv('PREDICTION_LOG_MAX_QUEUE', '10000'))
+
+
+class PredictionLogWriter:
+    """Buffer prediction rows in memory and insert them in batches.
+
+    Rows are flushed every ``flush_rows`` rows or ``flush_interval_ms``
+    milliseconds, whichever comes first. When the buffer holds ``max_queue``
+    rows new rows are dropped rather than slowing requests down. Rows from a
+    failed flush are put back and retried with the next one.
+    """
+
+    def __init__(
+        self,
+        flush_rows: int = PREDICTION_LOG_FLUSH_ROWS,
+        flush_interval_ms: float = PREDICTION_LOG_FLUSH_MS,
+        max_queue: int = PREDICTION_LOG_MAX_QUEUE,
+    ):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+
+        self.pool: Any = None
+        self._buffer: Deque[PredictionRow] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "total_flush_time": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._buffer)
+
+    async def start(self, pool: Any) -> None:
+        """Start flushing to ``pool`` in the background."""
+        if self.running or pool is None:
+            return
+        self.pool = pool
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush whatever is buffered."""
+        if self._task is None:
+            return
+        # The task is not cancelled: a flush in progress has already taken
+        # its rows off the buffer and would lose them
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await self._task
+        finally:
+            self._task = None
+            self._stopping = False
+        while self._buffer:
+            if not await self.flush():
+                break
+        if self._buffer:
+            logger.warning("Dropping %d unflushed prediction rows on shutdown", len(self._buffer))
+            self.stats["dropped"] += len(self._buffer)
+            self._buffer.clear()
+
+    def enqueue(self, row: PredictionRow) -> bool:
+        """Buffer ``row`` for the next flush. Returns ``False`` if it was dropped."""
+        if len(self._buffer) >= self.max_queue:
+            self.stats["dropped"] += 1
+            return False
+        self._buffer.append(row)
+        self.stats["enqueued"] += 1
+        if len(self._buffer) >= self.flush_rows and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> bool:
+        """Insert up to ``flush_rows`` buffered rows. Returns ``False`` on error."""
+        if not self._buffer:
+            return True
+        count = min(len(self._buffer), self.flush_rows)
+        rows = [self._buffer.popleft() for _ in range(count)]
+        start = time.perf_counter()
+        try:
+            await insert_predictions(self.pool, rows)
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            logger.warning("Prediction log flush of %d rows failed: %s", len(rows), e)
+            # Put the rows back in front, keeping within the buffer limit
+            room = self.max_queue - len(self._buffer)
+            self.stats["dropped"] += max(0, len(rows) - room)
+            self._buffer.extendleft(reversed(rows[:max(0, room)]))
+            return False
+        self.stats["flushes"] += 1
+        self.stats["flushed"] += len(rows)
+        self.stats["total_flush_time"] += time.perf_counter() - start
+        return True
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer and not self._stopping:
+                if not await self.flush() or len(self._buffer) < self.flush_rows:
+                    break
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return queue depth and flush counters."""
+        return {**self.stats, "queue_depth": self.queue_depth}
+
+
+prediction_log = PredictionLogWriter()
@@ -0,0 +1,210 @@
+"""Rate-limit counts shared by all workers through the ``rate_limits`` table."""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, DefaultDict, Dict, Optional, Tuple
+
+from api.repositories.rate_limits import add_rate_limit_counts, delete_stale_rate_limits
+
+logger = logging.getLogger(__name__)
+
+# Workers sharing the limit; each may spend its share of a client's remaining budget between syncs
+RATE_LIMIT_WORKERS = int(os.getenv('RATE_LIMIT_WORKERS', os.getenv('WEB_CONCURRENCY', '1')))
+RATE_LIMIT_SYNC_SECONDS = float(os.getenv('RATE_LIMIT_SYNC_SECONDS', '1'))
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+# Rows for windows older than this many periods are deleted
+CLEANUP_PERIODS = 2
+
+
+class _ClientState:
+    __slots__ = ("window", "global_used", "spent", "allowance", "shared")
+
+    def __init__(self, window: float, shared: bool):
+        self.window = window
+        self.global_used = 0.0  # count in the table at the last sync, all workers
+        self.spent = 0.0        # cost spent here and not yet written back
+        self.allowance = 0.0    # most this worker may spend before the next sync
+        self.shared = shared    # False for keys that are not IP addresses
+
+
+class SharedRateLimiter:
+    """Fixed-window rate limiter whose counts are shared through Postgres.
+
+    Requests are decided locally. Every ``sync_seconds`` the cost spent by
+    each client since the last sync is added to ``rate_limits`` in one
+    batched upsert, which also returns the global count per client. Until
+    the next sync a worker may only spend its reservation: its share of the
+    client's remaining budget (at least one request), so the workers
+    together cannot overshoot the limit by more than a few requests while
+    none of them waits on the database. A client not yet synced in the
+    window has its whole limit remaining. Without a pool it behaves as a
+    per-worker limiter.
+    """
+
+    def __init__(
+        self,
+        limit: float = 10,
+        period: float = 86400,
+        workers: int = RATE_LIMIT_WORKERS,
+        sync_seconds: float = RATE_LIMIT_SYNC_SECONDS,
+        max_keys: int = RATE_LIMIT_MAX_KEYS,
+    ):
+        self.limit = limit
+        self.period = period
+        self.workers = max(1, workers)
+        self.sync_seconds = sync_seconds
+        self.max_keys = max_keys
+
+        self.pool: Any = None
+        self._states: "OrderedDict[str, _ClientState]" = OrderedDict()
+        # window start -> client -> cost not yet written back
+        self._pending: DefaultDict[float, Dict[str, float]] = defaultdict(dict)
+        self._task: Optional[asyncio.Task] = None
+        self._last_cleanup = 0.0
+        self.stats = {
+            "allowed": 0,
+            "rejected": 0,
+            "reservation_exhausted": 0,
+            "syncs": 0,
+            "sync_errors": 0,
+            "evictions": 0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, pool: Any) -> None:
+        """Start syncing counts with ``pool`` in the background."""
+        if self.running or pool is None:
+            return
+        self.pool = pool
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop syncing and write back what was spent since the last sync."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.sync()
+
+    def _allowance(self, state: _ClientState) -> float:
+        if not state.shared or self.pool is None:
+            return self.limit
+        remaining = max(0.0, self.limit - state.global_used)
+        return max(remaining / self.workers, min(remaining, 1.0))
+
+    def _state(self, key: str, window: float) -> _ClientState:
+        state = self._states.get(key)
+        if state is None:
+            try:
+                ipaddress.ip_address(key)
+                shared = True
+            except ValueError:
+                shared = False
+            state = _ClientState(window, shared)
+            state.allowance = self._allowance(state)
+            self._states[key] = state
+            while len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+                self.stats["evictions"] += 1
+        else:
+            self._states.move_to_end(key)
+            if state.window != window:
+                state.window = window
+                state.global_used = state.spent = 0.0
+                state.allowance = self._allowance(state)
+        return state
+
+    async def acquire(self, key: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """Charge ``cost`` to ``key``; returns ``(allowed, retry_after)``."""
+        now = time.time()
+        window = now // self.period * self.period
+        state = self._state(key, window)
+
+        if state.global_used + state.spent + cost > self.limit:
+            self.stats["rejected"] += 1
+            return False, window + self.period - now
+        if state.spent + cost > state.allowance:
+            # The client may have budget left that another worker holds; the
+            # next sync fetches its global count even if nothing was spent
+            self.stats["rejected"] += 1
+            self.stats["reservation_exhausted"] += 1
+            if state.shared and self.pool is not None:
+                self._pending[window].setdefault(key, 0.0)
+            return False, self.sync_seconds
+
+        state.spent += cost
+        if state.shared and self.pool is not None:
+            pending = self._pending[window]
+            pending[key] = pending.get(key, 0.0) + cost
+        self.stats["allowed"] += 1
+        return True, 0.0
+
+    async def sync(self) -> bool:
+        """Write back spent costs and refresh global counts. Returns ``False`` on error."""
+        if self.pool is None:
+            return True
+        ok = True
+        for window in list(self._pending):
+            pending = self._pending.pop(window)
+            # The table counts whole requests; fractions wait for the next sync
+            counts = {key: int(cost) for key, cost in pending.items() if cost >= 1 or cost == 0}
+            for key, cost in pending.items():
+                if cost - counts.get(key, 0) > 0:
+                    self._pending[window][key] = cost - counts.get(key, 0)
+            if not counts:
+                continue
+            try:
+                rows = await add_rate_limit_counts(self.pool, list(counts), list(counts.values()), window)
+            except Exception as e:
+                ok = False
+                self.stats["sync_errors"] += 1
+                logger.warning("Rate limit sync of %d clients failed: %s", len(counts), e)
+                carried = self._pending[window]
+                for key, count in counts.items():
+                    carried[key] = carried.get(key, 0.0) + count
+                continue
+            self.stats["syncs"] += 1
+            for row in rows:
+                state = self._states.get(row["ip"])
+                if state is None or state.window != window or float(row["window_start"]) != window:
+                    continue
+                state.spent = max(0.0, state.spent - counts.get(row["ip"], 0))
+                state.global_used = float(row["request_count"])
+                state.allowance = self._allowance(state)
+        await self._cleanup()
+        return ok
+
+    async def _cleanup(self) -> None:
+        now = time.time()
+        if now - self._last_cleanup < self.period:
+            return
+        self._last_cleanup = now
+        try:
+            await delete_stale_rate_limits(self.pool, now - CLEANUP_PERIODS * self.period)
+        except Exception as e:
+            logger.warning("Rate limit cleanup failed: %s", e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            await self.sync()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "backend": "postgres",
+            "keys": len(self._states),
+            "max_keys": self.max_keys,
+            "pending_clients": sum(len(p) for p in self._pending.values()),
+        }
@@ -0,0 +1,154 @@
+"""Nearest-place lookups for predicted coordinates."""
+
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from api.lazy import lazy_import
+from api.services.gazetteer import Gazetteer, Place
+
+# Loaded when the tree is built in the lifespan, not when the app is imported
+np = lazy_import("numpy")
+
+EARTH_RADIUS_KM = 6371.0088
+# Predictions further than this from every known place get no place name
+REVERSE_GEOCODE_MAX_KM = float(os.getenv('REVERSE_GEOCODE_MAX_KM', '250'))
+LEAF_SIZE = 16
+
+
+def to_unit_vectors(lat: "np.ndarray", lon: "np.ndarray") -> "np.ndarray":
+    """Return points on the unit sphere for latitudes and longitudes in degrees."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_km(chord: float) -> float:
+    """Convert a straight-line distance on the unit sphere to kilometres."""
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2.0))
+
+
+class ReverseGeocoder:
+    """k-d tree over gazetteer places embedded on the unit sphere.
+
+    Points are stored as 3-d unit vectors, so the Euclidean nearest
+    neighbour is also the nearest place along the Earth's surface and there
+    is no seam at the antimeridian or the poles. The tree lives in flat
+    NumPy arrays: each node splits its range of the permuted point array on
+    its widest axis, and leaves of up to ``leaf_size`` points are scanned
+    with one vectorised distance computation.
+    """
+
+    def __init__(self, max_km: float = REVERSE_GEOCODE_MAX_KM, leaf_size: int = LEAF_SIZE):
+        self.max_km = max_km
+        self.leaf_size = leaf_size
+        self.places: List[Place] = []
+        self.country_names: Dict[str, str] = {}
+        self._points: Optional[np.ndarray] = None
+        self._order: Optional[np.ndarray] = None
+        # Per node: split axis (-1 for leaves), split value, children, point range
+        self._axis: List[int] = []
+        self._split: List[float] = []
+        self._children: List[Tuple[int, int]] = []
+        self._range: List[Tuple[int, int]] = []
+        self.stats = {"queries": 0, "matched": 0, "build_time": 0.0}
+
+    @property
+    def built(self) -> bool:
+        return bool(self.places)
+
+    def build(self, places: Sequence[Place], country_names: Optional[Dict[str, str]] = None) -> None:
+        """(Re)build the tree for ``places``."""
+        start = time.monotonic()
+        self.places = list(places)
+        self.country_names = dict(country_names or {})
+        self._axis, self._split, self._children, self._range = [], [], [], []
+        if not self.places:
+            self._points = self._order = None
+            return
+        points = to_unit_vectors(
+            np.array([p.lat for p in self.places]), np.array([p.lon for p in self.places])
+        )
+        self._order = np.arange(len(self.places))
+        self._build_node(points, 0, len(self.places))
+        self._points = np.ascontiguousarray(points[self._order])
+        self.stats["build_time"] = time.monotonic() - start
+
+    def build_from(self, gazetteer: Gazetteer) -> None:
+        """Build the tree from the cities of a loaded gazetteer."""
+        self.build(gazetteer.places, {code: c.name for code, c in gazetteer.countries.items()})
+
+    def _build_node(self, points: "np.ndarray", lo: int, hi: int) -> int:
+        node = len(self._axis)
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._children.append((-1, -1))
+        self._range.append((lo, hi))
+        if hi - lo <= self.leaf_size:
+            return node
+
+        idx = self._order[lo:hi]
+        coords = points[idx]
+        axis = int(np.argmax(coords.max(axis=0) - coords.min(axis=0)))
+        mid = (hi - lo) // 2
+        part = np.argpartition(coords[:, axis], mid)
+        self._order[lo:hi] = idx[part]
+        self._axis[node] = axis
+        self._split[node] = float(coords[part[mid], axis])
+        left = self._build_node(points, lo, lo + mid)
+        right = self._build_node(points, lo + mid, hi)
+        self._children[node] = (left, right)
+        return node
+
+    def nearest(self, lat: float, lon: float) -> Optional[Tuple[Place, float]]:
+        """Return the nearest place to ``lat``/``lon`` and its distance in km."""
+        if not self.places:
+            return None
+        q = to_unit_vectors(np.array([lat]), np.array([lon]))[0]
+        best_index, best_d2 = -1, math.inf
+        # (node, squared distance from the query to the node's region)
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if bound >= best_d2:
+                continue
+            axis = self._axis[node]
+            if axis < 0:
+                lo, hi = self._range[node]
+                d2 = ((self._points[lo:hi] - q) ** 2).sum(axis=1)
+                i = int(np.argmin(d2))
+                if d2[i] < best_d2:
+                    best_index, best_d2 = lo + i, float(d2[i])
+                continue
+            diff = q[axis] - self._split[node]
+            left, right = self._children[node]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # The far side is only worth visiting if its splitting plane is closer than the best match
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        place = self.places[self._order[best_index]]
+        return place, chord_to_km(math.sqrt(best_d2))
+
+    def describe(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
+        """Return the ``place`` field for a prediction, or ``None`` if nothing is near."""
+        self.stats["queries"] += 1
+        found = self.nearest(lat, lon)
+        if found is None or found[1] > self.max_km:
+            return None
+        place, distance = found
+        self.stats["matched"] += 1
+        return {
+            "name": place.name,
+            "country_code": place.country_code,
+            "country": self.country_names.get(place.country_code),
+            "lat": place.lat,
+            "lon": place.lon,
+            "distance_km": round(distance, 1),
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "places": len(self.places), "nodes": len(self._axis)}
+
+
+reverse_geocoder = ReverseGeocoder()
@@ -0,0 +1,247 @@
+"""Startup sequence that keeps the API unready until its dependencies are warm."""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from api.lazy import lazy_import
+from api.services.health import TORCHSERVE_MANAGEMENT_URL, TORCHSERVE_MODEL
+from api.services.torchserve import (
+    BATCHING_ENABLED,
+    BATCH_MAX_SIZE,
+    RAW_IMAGE_HEADERS,
+    TORCHSERVE_TIMEOUT,
+    TORCHSERVE_URL,
+    parse_embedding,
+)
+
+httpx = lazy_import("httpx")
+
+logger = logging.getLogger(__name__)
+
+# How long to wait for TorchServe to report a READY worker for the model
+STARTUP_TORCHSERVE_TIMEOUT = float(os.getenv('STARTUP_TORCHSERVE_TIMEOUT', '600'))
+STARTUP_POLL_INTERVAL = float(os.getenv('STARTUP_POLL_INTERVAL', '1'))
+# Image sent through TorchServe and pgvector once before the API reports ready
+STARTUP_WARMUP_IMAGE = os.getenv(
+    'STARTUP_WARMUP_IMAGE', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'warmup.jpg')
+)
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1') == '1'
+# A failed step is retried this many times, waiting twice as long each time
+STARTUP_RETRIES = int(os.getenv('STARTUP_RETRIES', '5'))
+STARTUP_RETRY_DELAY = float(os.getenv('STARTUP_RETRY_DELAY', '1'))
+STARTUP_RETRY_MAX_DELAY = float(os.getenv('STARTUP_RETRY_MAX_DELAY', '30'))
+RELEASE = os.getenv('RELEASE', 'dev')
+
+
+class StartupTimeline:
+    """Named startup steps with their durations, measured from process start.
+
+    ``started`` defaults to the time this module was imported, which is
+    before the app and its routes are. :meth:`finish` sets ``finished``,
+    and ``complete`` too once every step has run. ``retrying`` names the
+    step waiting to be retried, if any.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.monotonic() if started is None else started
+        self.steps: List[Dict[str, Any]] = []
+        self.complete = False
+        self.error: Optional[str] = None
+        self.retrying: Optional[str] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        start = time.monotonic()
+        status = "ok"
+        try:
+            yield
+        except Exception:
+            status = "failed"
+            raise
+        finally:
+            duration = time.monotonic() - start
+            self.steps.append({
+                "name": name,
+                "at": round(start - self.started, 3),
+                "seconds": round(duration, 3),
+                "status": status,
+            })
+            logger.info("Startup step %s %s in %.2fs (at +%.2fs)", name, status, duration, start - self.started)
+
+    def mark(self, name: str) -> None:
+        """Record a step that started with the process and ends now."""
+        now = time.monotonic()
+        self.steps.append({"name": name, "at": 0.0, "seconds": round(now - self.started, 3), "status": "ok"})
+
+    def finish(self, error: Optional[str] = None) -> None:
+        self.finished_at = time.monotonic()
+        self.error = error
+        self.complete = error is None
+        total = self.finished_at - self.started
+        timeline = ", ".join(f'{s["name"]}={s["seconds"]:.2f}s' for s in self.steps)
+        if error is None:
+            logger.info("Startup of release %s complete in %.2fs: %s", RELEASE, total, timeline)
+        else:
+            logger.error("Startup of release %s failed after %.2fs (%s): %s", RELEASE, total, error, timeline)
+
+    def snapshot(self) -> Dict[str, Any]:
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return {
+            "release": RELEASE,
+            "complete": self.complete,
+            "error": self.error,
+            "retrying": self.retrying,
+            "seconds": round(end - self.started, 3),
+            "steps": list(self.steps),
+        }
+
+
+async def wait_for_model(
+    client: "httpx.AsyncClient",
+    timeout: float = STARTUP_TORCHSERVE_TIMEOUT,
+    interval: float = STARTUP_POLL_INTERVAL,
+) -> Dict[str, Any]:
+    """Poll the management API until a worker of the model is ``READY``.
+
+    Returns the model's description from the management API.
+    """
+    deadline = time.monotonic() + timeout
+    last = "no response"
+    while True:
+        try:
+            response = await client.get(f"{TORCHSERVE_MANAGEMENT_URL}/models/{TORCHSERVE_MODEL}")
+            if response.status_code == 200:
+                models = response.json()
+                workers = [w for model in models for w in model.get("workers", [])]
+                if any(w.get("status") == "READY" for w in workers):
+                    return models[0]
+                last = f"workers: {[w.get('status') for w in workers]}"
+            else:
+                last = f"status {response.status_code}"
+        except httpx.HTTPError as e:
+            last = str(e) or type(e).__name__
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"TorchServe model {TORCHSERVE_MODEL} not ready after {timeout:.0f}s ({last})")
+        await asyncio.sleep(interval)
+
+
+def check_batching(model: Dict[str, Any], batch_size: int = BATCH_MAX_SIZE) -> bool:
+    """Warn if TorchServe runs the model with batches smaller than the API sends.
+
+    The micro-batcher dispatches up to ``batch_size`` images at once; a
+    model registered without ``batchSize`` (e.g. TorchServe started
+    without its config) would run them one by one. Returns whether the
+    setting is in effect.
+    """
+    if not BATCHING_ENABLED or batch_size <= 1:
+        return True
+    served = int(model.get("batchSize", 1))
+    if served >= batch_size:
+        return True
+    logger.warning(
+        "TorchServe serves %s with batchSize=%d but TORCHSERVE_BATCH_SIZE=%d; check that it was started "
+        "with --ts-config", TORCHSERVE_MODEL, served, batch_size,
+    )
+    return False
+
+
+async def warm_pool(pool: Any) -> None:
+    """Run a query on as many connections as the pool keeps open."""
+    await asyncio.gather(*(pool.fetchval("SELECT 1") for _ in range(pool.get_min_size())))
+
+
+async def warm_up(client: "httpx.AsyncClient", pool: Any, timeline: StartupTimeline) -> None:
+    """Send the warm-up image through TorchServe and one vector search."""
+    with open(STARTUP_WARMUP_IMAGE, "rb") as f:
+        image = f.read()
+    with timeline.step("warmup_inference"):
+        response = await client.post(
+            f"{TORCHSERVE_URL}/predictions/{TORCHSERVE_MODEL}",
+            content=image,
+            headers=RAW_IMAGE_HEADERS,
+            timeout=TORCHSERVE_TIMEOUT,
+        )
+        response.raise_for_status()
+        embedding = parse_embedding(response.json())
+    if pool is not None:
+        import numpy as np
+        from api.repositories.match import nearest_many
+
+        with timeline.step("warmup_search"):
+            await nearest_many([np.asarray(embedding, dtype=np.float32)], pool=pool)
+
+
+async def retry(
+    name: str,
+    attempt: Callable[[], Awaitable[None]],
+    timeline: StartupTimeline,
+    retries: int = STARTUP_RETRIES,
+    delay: float = STARTUP_RETRY_DELAY,
+) -> None:
+    """Await ``attempt()`` until it succeeds, retrying ``retries`` times with backoff."""
+    for tries_left in range(retries, -1, -1):
+        try:
+            await attempt()
+            return
+        except Exception as e:
+            if not tries_left:
+                raise
+            logger.warning(
+                "Startup step %s failed (%s), retrying in %.1fs (%d left)", name, e, delay, tries_left
+            )
+            timeline.retrying = name
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, STARTUP_RETRY_MAX_DELAY)
+        finally:
+            timeline.retrying = None
+
+
+async def run_startup(
+    pool: Any,
+    timeline: StartupTimeline,
+    on_ready: Any = None,
+    transport: "Optional[httpx.AsyncBaseTransport]" = None,
+    retries: int = STARTUP_RETRIES,
+    retry_delay: float = STARTUP_RETRY_DELAY,
+) -> None:
+    """Wait for TorchServe, warm the pool and the model, then finish ``timeline``.
+
+    Each phase is retried ``retries`` times with exponential backoff from
+    ``retry_delay`` seconds. ``on_ready`` is awaited last, e.g. to refresh
+    the health checks, so readiness flips as soon as the sequence completes.
+    A phase that still fails is logged and finishes the timeline with the
+    error.
+    """
+    async def wait_for_torchserve() -> None:
+        with timeline.step("torchserve_model"):
+            check_batching(await wait_for_model(client))
+
+    async def warm_connections() -> None:
+        with timeline.step("db_pool_warm"):
+            await warm_pool(pool)
+
+    try:
+        async with httpx.AsyncClient(timeout=STARTUP_POLL_INTERVAL * 5, transport=transport) as client:
+            await retry("torchserve_model", wait_for_torchserve, timeline, retries, retry_delay)
+            if pool is not None:
+                await retry("db_pool_warm", warm_connections, timeline, retries, retry_delay)
+            if STARTUP_WARMUP:
+                await retry("warmup", lambda: warm_up(client, pool, timeline), timeline, retries, retry_delay)
+        if on_ready is not None:
+            await on_ready()
+    except Exception as e:
+        timeline.finish(str(e) or type(e).__name__)
+        return
+    timeline.finish()
+
+
+startup = StartupTimeline()
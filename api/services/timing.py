@@ -0,0 +1,140 @@
+"""Per-request stage timings, reported as ``Server-Timing`` and aggregated in process."""
+
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# Upper bounds, in milliseconds, of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 60000)
+# Scope state key under which the upload middleware leaves its timings
+REQUEST_TIMING_STATE = "request_timing"
+
+
+class StageTimer:
+    """Wall-clock time spent in each stage of one request.
+
+    Stages are timed with ``with timer.stage(name):`` or added directly;
+    a stage entered more than once accumulates. ``started`` may be set to
+    an earlier ``time.perf_counter()`` reading, e.g. when the body was
+    buffered before the route ran, so the total covers the whole request.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """Return the value of a ``Server-Timing`` header for the stages so far."""
+        metrics = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        metrics.append(f"total;dur={self.total() * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total_ms": round(self.total() * 1000, 1),
+            "stages": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+        }
+
+    @classmethod
+    def from_scope(cls, scope: Optional[Dict[str, Any]]) -> "StageTimer":
+        """Start a timer that includes what the middleware measured for ``scope``.
+
+        The time between the middleware handing the body on and now, spent
+        parsing the form and resolving dependencies, is added as ``parse``.
+        """
+        recorded = ((scope or {}).get("state") or {}).get(REQUEST_TIMING_STATE) or {}
+        timer = cls(recorded.get("started"))
+        for name, seconds in recorded.get("stages", {}).items():
+            timer.add(name, seconds)
+        if "handed_on" in recorded:
+            timer.add("parse", time.perf_counter() - recorded["handed_on"])
+        return timer
+
+
+class LatencyHistogram:
+    """Counts of observations per latency bucket, plus their sum and maximum."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        if ms > self.max:
+            self.max = ms
+
+    def quantile(self, q: float) -> float:
+        """Estimate the ``q`` quantile as the upper bound of its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.sum / self.count, 1) if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": round(self.max, 1),
+        }
+
+
+class StageLatency:
+    """Latency histograms per stage, fed with the timer of every request.
+
+    Observations are plain in-memory updates made from the event loop, so
+    no lock is taken on the request path.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.histograms: Dict[str, LatencyHistogram] = {}
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram(self.buckets)
+        return histogram
+
+    def observe(self, timer: StageTimer) -> None:
+        for name, seconds in timer.stages.items():
+            self.histogram(name).observe(seconds * 1000)
+        self.histogram("total").observe(timer.total() * 1000)
+
+    def reset(self) -> None:
+        self.histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+
+
+stage_latency = StageLatency()
@@ -0,0 +1,116 @@
+"""Async TorchServe client feeding TorchServe's server-side batching."""
+
+import asyncio
+import os
+from typing import Any, List, Optional
+
+from api.lazy import lazy_import
+from api.services.batcher import EmbeddingBatcher
+
+httpx = lazy_import("httpx")
+
+TORCHSERVE_URL = os.getenv('TORCHSERVE_URL', 'http://localhost:8080')
+TORCHSERVE_TIMEOUT = float(os.getenv('TORCHSERVE_TIMEOUT', '30'))
+
+# The handler takes one image per request, so batching happens in TorchServe
+# (batchSize / maxBatchDelay in config/config.properties). The API sends
+# queued images at once, BATCH_MAX_SIZE at a time, without waiting for more;
+# a delay here would only add to TorchServe's own maxBatchDelay.
+BATCHING_ENABLED = os.getenv('TORCHSERVE_BATCHING', '1') == '1'
+BATCH_MAX_SIZE = int(os.getenv('TORCHSERVE_BATCH_SIZE', '8'))
+BATCH_MAX_DELAY_MS = float(os.getenv('TORCHSERVE_BATCH_DELAY_MS', '0'))
+
+# Images go to TorchServe as the raw request body, like the bulk loader sends
+# them; a multipart body would copy every image into a new buffer first.
+RAW_IMAGE_HEADERS = {'Content-Type': 'application/octet-stream'}
+
+
+class TorchServeError(Exception):
+    """Inference failure with the HTTP status the API should report."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def parse_embedding(model_result: Any) -> List[float]:
+    """Extract the embedding from a TorchServe ``/predictions`` response."""
+    embedding = None
+    if isinstance(model_result, dict):
+        embedding = model_result.get("embedding")
+    if embedding is None and isinstance(model_result, list):
+        embedding = model_result
+    if embedding is None:
+        raise TorchServeError(500, "No embedding returned from model")
+    return embedding
+
+
+_client: "Optional[httpx.AsyncClient]" = None
+
+
+async def _infer_one(client: "httpx.AsyncClient", image: bytes) -> List[float]:
+    try:
+        response = await client.post(
+            f"{TORCHSERVE_URL}/predictions/where",
+            content=image,
+            headers=RAW_IMAGE_HEADERS,
+        )
+    except httpx.ConnectError:
+        raise TorchServeError(
+            503, "Cannot connect to TorchServe. Please ensure the inference service is running."
+        )
+    except httpx.TimeoutException:
+        raise TorchServeError(
+            504, "TorchServe request timed out. The model might be processing or unavailable."
+        )
+    if response.status_code != 200:
+        raise TorchServeError(response.status_code, f"TorchServe error: {response.text}")
+    try:
+        return parse_embedding(response.json())
+    except ValueError:
+        raise TorchServeError(500, "Invalid model response")
+
+
+async def infer_batch(images: List[bytes]) -> List[Any]:
+    """Send images to TorchServe and return one result per image.
+
+    Each image is its own request, sent at once over a shared connection
+    pool; TorchServe's batcher groups the requests that arrive within its
+    ``maxBatchDelay`` into one forward pass. Failures are returned in place
+    of the embedding so that one bad image does not fail the rest.
+    """
+    client = _client
+    if client is None:
+        raise RuntimeError("TorchServe client is not started")
+    return await asyncio.gather(
+        *(_infer_one(client, image) for image in images), return_exceptions=True
+    )
+
+
+embedding_batcher = EmbeddingBatcher(
+    infer_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_delay_ms=BATCH_MAX_DELAY_MS,
+)
+
+
+async def start() -> None:
+    """Open the shared HTTP client and start the batch dispatcher."""
+    global _client
+    if not BATCHING_ENABLED:
+        return
+    _client = httpx.AsyncClient(
+        timeout=TORCHSERVE_TIMEOUT,
+        limits=httpx.Limits(max_connections=BATCH_MAX_SIZE * embedding_batcher.max_inflight_batches),
+    )
+    await embedding_batcher.start()
+
+
+async def stop() -> None:
+    """Drain the dispatcher and close the shared HTTP client."""
+    global _client
+    await embedding_batcher.stop()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,33 +1,121 @@
+import asyncio
+import logging
 import os
 import re
 import sys
 from pathlib import Path
 
-from fastapi import FastAPI, Request
-from fastapi.testclient import TestClient
-
 API_ROOT = Path(__file__).resolve().parents[1]
 PROJECT_ROOT = API_ROOT.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 sys.path.insert(1, str(API_ROOT))
 
 from api.middleware import EphemeralUploadMiddleware
+from api.services.timing import REQUEST_TIMING_STATE
+
+
+def make_app(seen):
+    async def app(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        seen["body"] = body
+        seen["scope"] = scope
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(len(body)).encode()})
+    return app
+
+
+def call(middleware, path, chunks, method="POST"):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    received = []
+    sent = []
+
+    async def receive():
+        message = messages.pop(0) if messages else {"type": "http.disconnect"}
+        received.append(message)
+        return message
+
+    async def send(message):
+        sent.append(message)
 
-app = FastAPI()
-app.add_middleware(EphemeralUploadMiddleware)
+    scope = {"type": "http", "method": method, "path": path}
+    asyncio.run(middleware(scope, receive, send))
+    return received, sent
 
-@app.post('/upload')
-async def upload(request: Request):
-    data = await request.body()
-    return {'size': len(data)}
 
-client = TestClient(app)
+def test_upload_removed_and_logged(tmp_path, caplog):
+    seen = {}
+    middleware = EphemeralUploadMiddleware(make_app(seen), max_memory=4, directory=str(tmp_path))
 
-def test_upload_removed_and_logged(capsys):
-    response = client.post('/upload', data=b'dummy')
-    assert response.status_code == 200
-    logs = capsys.readouterr().out
-    match = re.search(r"Saved upload to (.+)", logs)
+    with caplog.at_level(logging.DEBUG, logger="api.middleware.ephemeral"):
+        _, sent = call(middleware, "/predict", [b"dum", b"my", b"-upload"])
+
+    assert seen["body"] == b"dummy-upload"
+    assert sent[-1]["body"] == b"12"
+    match = re.search(r"Saved upload to (.+)", caplog.text)
     assert match is not None
     path = match.group(1).strip()
+    assert path.startswith(str(tmp_path))
     assert not os.path.exists(path)
+
+
+def test_small_upload_stays_in_memory(tmp_path):
+    seen = {}
+    middleware = EphemeralUploadMiddleware(make_app(seen), directory=str(tmp_path))
+
+    call(middleware, "/predict", [b"small"])
+
+    assert seen["body"] == b"small"
+    assert list(tmp_path.iterdir()) == []
+    # Buffering time is left for the route's stage timer
+    assert seen["scope"]["state"][REQUEST_TIMING_STATE]["stages"]["buffer"] >= 0
+
+
+def test_file_removed_when_route_fails(tmp_path):
+    async def failing_app(scope, receive, send):
+        await receive()
+        raise RuntimeError("boom")
+
+    middleware = EphemeralUploadMiddleware(failing_app, max_memory=1, directory=str(tmp_path))
+
+    try:
+        call(middleware, "/jobs", [b"large body"])
+    except RuntimeError:
+        pass
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_other_routes_pass_through(tmp_path):
+    seen = {}
+    middleware = EphemeralUploadMiddleware(make_app(seen), max_memory=1, directory=str(tmp_path))
+
+    received, _ = call(middleware, "/health", [b"body"], method="GET")
+
+    # The app read the original receive channel directly
+    assert received == [{"type": "http.request", "body": b"body", "more_body": False}]
+    assert seen["body"] == b"body"
+
+
+def test_buffer_released_once_the_route_has_the_body(tmp_path):
+    left_behind = []
+
+    async def app(scope, receive, send):
+        while (await receive()).get("more_body"):
+            pass
+        # Still handling the request, but the spooled file is already gone
+        left_behind.extend(tmp_path.iterdir())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = EphemeralUploadMiddleware(app, max_memory=4, directory=str(tmp_path))
+    call(middleware, "/predict", [b"large", b" body"])
+
+    assert left_behind == []
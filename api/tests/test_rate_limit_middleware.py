@@ -1,28 +1,106 @@
+import asyncio
 import sys
 from pathlib import Path
 
-from fastapi import FastAPI
-from fastapi.testclient import TestClient
-
 API_ROOT = Path(__file__).resolve().parents[1]
 PROJECT_ROOT = API_ROOT.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 sys.path.insert(1, str(API_ROOT))
 
 from api.middleware import RateLimitMiddleware
+from api.middleware.ratelimit import SlidingWindowLimiter, charge_items, parse_costs
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b'{"ok": true}'})
+
+
+def get(middleware, path="/limited", host="test", method="GET"):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
 
-app = FastAPI()
-app.add_middleware(RateLimitMiddleware)
+    async def send(message):
+        sent.append(message)
 
-@app.get('/limited')
-async def limited():
-    return {'ok': True}
+    scope = {"type": "http", "method": method, "path": path, "client": (host, 1234)}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]
 
-client = TestClient(app)
 
 def test_rate_limit_exceeded():
+    middleware = RateLimitMiddleware(app)
+    for _ in range(10):
+        resp = get(middleware)
+        assert resp["status"] == 200
+    resp = get(middleware)
+    assert resp["status"] == 429
+    assert dict(resp["headers"])[b"retry-after"]
+
+
+def test_exempt_paths_and_costs():
+    middleware = RateLimitMiddleware(
+        app, limit=2, costs={"/predict": 2}, default_cost=0.5, exempt_paths=["/health"]
+    )
+    for _ in range(20):
+        assert get(middleware, "/health")["status"] == 200
+    assert get(middleware, "/predict")["status"] == 200
+    assert get(middleware, "/")["status"] == 429
+
+
+def test_costs_can_be_limited_to_a_method():
+    middleware = RateLimitMiddleware(
+        app, limit=2, costs=parse_costs("/predict=1,POST /jobs=2"), default_cost=0.25
+    )
+    assert middleware.cost_of("/jobs", "POST") == 2
+    assert middleware.cost_of("/jobs/abc/events", "GET") == 0.25
+    assert middleware.cost_of("/predict/batch", "POST") == 1
+
+    for _ in range(4):
+        assert get(middleware, "/jobs/abc")["status"] == 200
+    assert get(middleware, "/jobs", method="POST")["status"] == 429
+
+
+def test_routes_charge_per_item():
+    seen = []
+
+    async def batch_app(scope, receive, send):
+        seen.append(await charge_items(scope, 3))
+        await app(scope, receive, send)
+
+    middleware = RateLimitMiddleware(batch_app, limit=5, costs={"/predict": 1})
+    get(middleware, "/predict/batch")
+    get(middleware, "/predict/batch")
+
+    assert [allowed for allowed, _ in seen] == [True, False]
+    assert asyncio.run(charge_items({}, 3)) == (True, 0.0)
+
+
+def test_sliding_window_carries_over_previous_window():
+    limiter = SlidingWindowLimiter(limit=10, period=100)
     for _ in range(10):
-        resp = client.get('/limited')
-        assert resp.status_code == 200
-    resp = client.get('/limited')
-    assert resp.status_code == 429
+        assert limiter.hit("a", now=50)[0]
+
+    # A quarter into the next window, 75% of the previous count still applies
+    assert limiter.hit("a", now=125)[0]
+    assert limiter.hit("a", now=125)[0]
+    allowed, retry_after = limiter.hit("a", now=125)
+    assert not allowed
+    assert retry_after == 5
+    assert limiter.hit("a", now=131)[0]
+
+def test_keys_are_bounded_and_idle_keys_swept():
+    limiter = SlidingWindowLimiter(limit=5, period=10, max_keys=3)
+    for i in range(10):
+        limiter.hit(f"client-{i}", now=0)
+    assert len(limiter) == 3
+    assert limiter.stats["pressure_evictions"] == 7
+
+    for _ in range(3):
+        limiter.hit("late", now=100)
+    stats = limiter.snapshot()
+    assert stats["idle_evictions"] >= 2
+    assert stats["keys"] <= 2
+    assert stats["memory_bytes"] > 0
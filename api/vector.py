@@ -0,0 +1,54 @@
+"""pgvector's binary wire format for float32 embeddings.
+
+Embeddings stay float32 numpy arrays from TorchServe's response to the
+database: encoding is one byte swap done by numpy, with no Python float
+per component and no text formatting, and decoding is the reverse.
+"""
+
+import struct
+from typing import Any
+
+from api.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# A binary ``vector`` is an int16 dimension, an unused int16, then the
+# components as big-endian float32
+VECTOR_HEADER = struct.Struct(">HH")
+VECTOR_WIRE_DTYPE = ">f4"
+
+
+def as_embedding(value: Any) -> "np.ndarray":
+    """Return ``value`` as a 1-d float32 array, without copying one that already is."""
+    array = np.asarray(value, dtype=np.float32)
+    if array.ndim != 1:
+        raise ValueError(f"Embedding must be one-dimensional, got shape {array.shape}")
+    return array
+
+
+def encode_vector(value: Any) -> bytes:
+    """Encode ``value`` as a binary pgvector ``vector``.
+
+    ``bytes`` are taken as already encoded, which is how vectors are passed
+    inside a ``vector[]`` parameter: asyncpg would treat arrays there as
+    another array dimension.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    array = np.asarray(value, dtype=VECTOR_WIRE_DTYPE)
+    if array.ndim != 1:
+        raise ValueError(f"Vector must be one-dimensional, got shape {array.shape}")
+    return VECTOR_HEADER.pack(array.shape[0], 0) + array.tobytes()
+
+
+def decode_vector(data: bytes) -> "np.ndarray":
+    """Decode a binary pgvector ``vector`` into a float32 array."""
+    dim, _ = VECTOR_HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=VECTOR_WIRE_DTYPE, count=dim, offset=VECTOR_HEADER.size).astype(np.float32)
+
+
+async def register_vector(conn: Any, schema: str = "public") -> None:
+    """Use the binary codec for ``vector`` values on ``conn``."""
+    await conn.set_type_codec(
+        "vector", schema=schema, encoder=encode_vector, decoder=decode_vector, format="binary"
+    )
@@ -9,6 +9,7 @@ import csv
 import sys
 import time
 import random
+from collections import defaultdict
 from math import radians, sin, cos, sqrt, atan2
 from pathlib import Path
 from typing import Iterable, Tuple, List
@@ -68,6 +69,8 @@ def iter_dataset(dataset_dir: Path, max_images: int = None, random_seed: int = N
 def evaluate(dataset_dir: Path, api_url: str, threshold_km: float, max_images: int = None, random_seed: int = None) -> Tuple[float, float, dict]:
     """Evaluate model performance and return accuracy, mean error, and detailed stats."""
     distances = []
+    # stage -> per-request milliseconds, from the responses' timings blocks
+    stage_ms = defaultdict(list)
     correct = 0
     total = 0
     errors = []
@@ -91,9 +94,16 @@ def evaluate(dataset_dir: Path, api_url: str, threshold_km: float, max_images: i
         try:
             with open(img_path, "rb") as f:
                 files = {"photo": (img_path.name, f, "image/jpeg")}
-                resp = requests.post(f"{api_url.rstrip('/')}/predict", files=files, timeout=60)
+                resp = requests.post(
+                    f"{api_url.rstrip('/')}/predict", files=files, params={"timings": "true"}, timeout=60
+                )
                 resp.raise_for_status()
                 data = resp.json()
+                timings = data.get("timings") or {}
+                for stage, ms in timings.get("stages", {}).items():
+                    stage_ms[stage].append(ms)
+                if "total_ms" in timings:
+                    stage_ms["total"].append(timings["total_ms"])
                 
                 # Handle different response formats
                 prediction = data.get("prediction", data)
@@ -169,12 +179,27 @@ def evaluate(dataset_dir: Path, api_url: str, threshold_km: float, max_images: i
         "median_error_km": median_error,
         "p95_error_km": p95_error,
         "min_error_km": min(distances) if distances else 0,
-        "max_error_km": max(distances) if distances else 0
+        "max_error_km": max(distances) if distances else 0,
+        "stage_latency_ms": summarize_stages(stage_ms),
     }
     
     return accuracy, mean_error, stats
 
 
+def summarize_stages(stage_ms: dict) -> dict:
+    """Return mean, median and p95 milliseconds per pipeline stage."""
+    summary = {}
+    for stage, values in stage_ms.items():
+        values = sorted(values)
+        summary[stage] = {
+            "count": len(values),
+            "mean_ms": sum(values) / len(values),
+            "p50_ms": values[len(values) // 2],
+            "p95_ms": values[int(len(values) * 0.95)],
+        }
+    return summary
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Run benchmark against API")
     parser.add_argument(
@@ -234,6 +259,11 @@ def main() -> None:
     print(f"95th Percentile Error: {stats['p95_error_km']:.2f} km")
     print(f"Min Error: {stats['min_error_km']:.2f} km")
     print(f"Max Error: {stats['max_error_km']:.2f} km")
+    if stats["stage_latency_ms"]:
+        print("-" * 60)
+        print(f"{'Stage':<12} {'count':>6} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+        for stage, row in stats["stage_latency_ms"].items():
+            print(f"{stage:<12} {row['count']:>6} {row['mean_ms']:>9.1f} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f}")
     print("=" * 60)
 
     # Show error details if any
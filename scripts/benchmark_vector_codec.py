@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Microbenchmark of encoding one embedding for a vector search query.
+
+Compares, per query, the paths an embedding from TorchServe's JSON can
+take to the wire:
+
+- ``text``: ``np.array(list)`` (float64), ``.tolist()``, formatted as
+  pgvector's text literal
+- ``list``: ``np.array(list)``, ``.tolist()``, then the binary codec, as
+  the API did before the float32 path
+- ``float32``: ``as_embedding(list)`` once, then the binary codec
+- ``float32 (encode only)``: the codec alone, for an embedding that is
+  already a float32 array
+
+Usage:
+    python scripts/benchmark_vector_codec.py --dim 128 --number 20000
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from api.vector import as_embedding, decode_vector, encode_vector
+
+
+def text_literal(values) -> str:
+    return "[" + ",".join(map(str, values)) + "]"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark embedding encoding for pgvector")
+    parser.add_argument("--dim", type=int, default=128, help="Embedding dimension")
+    parser.add_argument("--number", type=int, default=20000, help="Encodings per measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements; the fastest is reported")
+    args = parser.parse_args()
+
+    # What the API gets from TorchServe: a JSON list of Python floats
+    embedding = json.loads(json.dumps(np.random.default_rng(0).random(args.dim).tolist()))
+    array = as_embedding(embedding)
+
+    cases = [
+        ("text", lambda: text_literal(np.array(embedding).tolist())),
+        ("list", lambda: encode_vector(np.array(embedding).tolist())),
+        ("float32", lambda: encode_vector(as_embedding(embedding))),
+        ("float32 (encode only)", lambda: encode_vector(array)),
+        ("decode", lambda: decode_vector(encode_vector(array))),
+    ]
+    print(f"{args.dim}-d embedding, best of {args.repeat} x {args.number}")
+    print(f"{'path':<24}{'us/query':>10}")
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=args.number, repeat=args.repeat))
+        print(f"{name:<24}{best / args.number * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,8 +30,13 @@ import time
 import logging
 from pathlib import Path
 from typing import Dict, List, Optional
-import numpy as np
-from pgvector.asyncpg import register_vector
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from api.vector import as_embedding, register_vector
 
 logging.basicConfig(
     level=logging.INFO,
@@ -100,8 +105,8 @@ class ProductionBulkLoader:
                     self.error_log.append(f'{filename}: No embedding in response')
                     return False
                 
-                # Convert embedding list to numpy array for pgvector compatibility
-                embedding_vector = np.array(embedding, dtype=np.float32)
+                # float32 array, sent in pgvector's binary format by the codec
+                embedding_vector = as_embedding(embedding)
                     
                 embed_time = time.time() - embed_start
                 self.stats['total_embedding_time'] += embed_time
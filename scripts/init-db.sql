@@ -58,6 +58,34 @@ CREATE TABLE IF NOT EXISTS rate_limits (
 -- Create index for rate limit cleanup
 CREATE INDEX IF NOT EXISTS idx_rate_limits_window_start ON rate_limits (window_start);
 
+-- Create geocode cache (place string -> coordinates, found = FALSE for misses)
+CREATE TABLE IF NOT EXISTS geocode_cache (
+    query TEXT PRIMARY KEY,
+    lat DOUBLE PRECISION,
+    lon DOUBLE PRECISION,
+    found BOOLEAN NOT NULL DEFAULT TRUE,
+    hits INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_hit TIMESTAMP WITH TIME ZONE
+);
+
+-- Create index for warming the cache with the most frequent places
+CREATE INDEX IF NOT EXISTS idx_geocode_cache_hits ON geocode_cache (hits DESC);
+
+-- Create asynchronous job table, so any API worker can answer for a job
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    result JSONB,
+    error JSONB
+);
+
+-- Create index for job cleanup
+CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (COALESCE(finished_at, created_at));
+
 -- Create uploaded images tracking table (for ephemeral storage)
 CREATE TABLE IF NOT EXISTS uploaded_images (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
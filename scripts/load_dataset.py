@@ -3,13 +3,19 @@ import asyncio
 import csv
 import hashlib
 import os
+import sys
 from pathlib import Path
 from typing import Optional, Sequence
 
 import asyncpg
 import numpy as np
 import requests
-from pgvector.asyncpg import register_vector
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from api.vector import as_embedding, register_vector
 
 
 async def _compute_embedding(image_path: Path, model_url: Optional[str] = None) -> Sequence[float]:
@@ -35,8 +41,7 @@ async def _compute_embedding(image_path: Path, model_url: Optional[str] = None)
 
     # Deterministic fallback embedding using SHA256 hash
     digest = hashlib.sha256(data).digest()
-    arr = np.frombuffer(digest * 8, dtype=np.uint8)[:128].astype("float32")
-    return arr.tolist()
+    return np.frombuffer(digest * 8, dtype=np.uint8)[:128].astype("float32")
 
 
 async def init_connection(conn):
@@ -65,18 +70,13 @@ async def load_dataset(dataset_dir: Path, database_url: str, model_url: Optional
                     lat = float(row["lat"])
                     lon = float(row["lon"])
                     embedding = await _compute_embedding(img_path, model_url)
-                    
-                    # Convert embedding to numpy array and then to list for pgvector
-                    if isinstance(embedding, list):
-                        embedding_array = np.array(embedding, dtype=np.float32)
-                    else:
-                        embedding_array = np.array(embedding, dtype=np.float32)
-                    
+
+                    # float32 arrays go to the binary vector codec as they are
                     await pool.execute(
                         "INSERT INTO photos (lat, lon, vlad) VALUES ($1, $2, $3)",
                         lat,
                         lon,
-                        embedding_array.tolist(),
+                        as_embedding(embedding),
                     )
                     inserted += 1
                     
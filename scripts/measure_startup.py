@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Measure how long the API takes to import and to answer its first request.
+
+``import`` runs ``import api.main`` in a fresh interpreter under
+``python -X importtime`` and reports the wall time and the slowest imports.
+It also checks that none of ``DEFERRED_MODULES`` was executed: those are
+loaded at first use or in the lifespan, never when the app is imported.
+
+``first response`` starts uvicorn and times until ``/health/live``
+answers. It needs the API's environment (``DATABASE_URL`` and so on), as
+in the container; the warm-up inference is skipped.
+
+Exits non-zero when a measurement is over its budget.
+``tests/test_startup_budget.py`` enforces the import budget in the suite.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+IMPORT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1500'))
+FIRST_RESPONSE_BUDGET_SECONDS = float(os.getenv('STARTUP_FIRST_RESPONSE_BUDGET_SECONDS', '5'))
+DEFERRED_MODULES = ("numpy", "openai", "requests", "httpx", "pgvector", "asyncpg")
+MARKER = "--- importing ---"
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Return ``(module, self_us, cumulative_us)`` for imports after the marker."""
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    entries = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure_import(module: str = "api.main") -> Dict:
+    """Import ``module`` in a fresh interpreter and report its cost."""
+    code = (
+        "import json, sys, time\n"
+        f"sys.stderr.write({MARKER!r} + '\\n')\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        "from api.lazy import is_loaded\n"
+        f"print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {DEFERRED_MODULES!r} if is_loaded(m)]}}))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(errors[-1] if errors else f"exit status {proc.returncode}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    entries = parse_importtime(proc.stderr)
+    slowest = sorted(entries, key=lambda entry: entry[1], reverse=True)[:10]
+    return {
+        "import_ms": result["ms"],
+        "loaded_deferred": result["loaded"],
+        "modules": len(entries),
+        "slowest": [(name, self_us / 1000) for name, self_us, _ in slowest],
+    }
+
+
+def measure_first_response(port: int, timeout: float = 60.0) -> float:
+    """Start uvicorn and return the seconds until ``/health/live`` answers."""
+    env = {**os.environ, "STARTUP_WARMUP": "0"}
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/live", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        raise RuntimeError(f"No response within {timeout:.0f}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure API import time and time to first response")
+    parser.add_argument("--skip-first-response", action="store_true", help="Only measure the import")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the uvicorn under test")
+    args = parser.parse_args()
+
+    failed = False
+    result = measure_import()
+    print(f"import api.main: {result['import_ms']:.0f} ms for {result['modules']} modules "
+          f"(budget {IMPORT_BUDGET_MS:.0f} ms)")
+    for name, ms in result["slowest"]:
+        print(f"  {ms:8.1f} ms  {name}")
+    if result["loaded_deferred"]:
+        print(f"Imported eagerly, should be deferred: {', '.join(result['loaded_deferred'])}")
+        failed = True
+    if result["import_ms"] > IMPORT_BUDGET_MS:
+        failed = True
+
+    if not args.skip_first_response:
+        seconds = measure_first_response(args.port)
+        print(f"time to first response: {seconds:.2f} s (budget {FIRST_RESPONSE_BUDGET_SECONDS:.1f} s)")
+        if seconds > FIRST_RESPONSE_BUDGET_SECONDS:
+            failed = True
+
+    if failed:
+        print("❌ Startup budget exceeded")
+        sys.exit(1)
+    print("✅ Startup within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Measure peak memory of handing one upload to TorchServe.
+
+Replays what the API does with an uploaded image between receiving it and
+sending it to TorchServe, and reports the peak RSS growth over a baseline
+taken before any of the body exists. Each case runs in a fresh interpreter
+so earlier cases do not hide later peaks.
+
+The body arrives in chunks into the upload middleware's ``SpooledUpload``,
+is replayed to the multipart parser's spooled file, read into bytes by
+``read_upload`` and put into the TorchServe request. Bodies up to 1 MiB
+stay in memory at each buffering step; larger ones go to disk there.
+
+``multipart`` is the old path: the middleware and parser copies stay
+around until the response and the image is re-encoded into a multipart
+body. ``raw`` is the current path: the middleware releases its buffer as
+the parser takes it, the parser's copy is closed right after reading and
+the image bytes are sent as the request body as they are.
+
+Nothing is sent over the network; the request is only built, which is
+where the client libraries copy the body.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Any, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from api.middleware.ephemeral import READ_CHUNK_SIZE, SpooledUpload
+
+URL = "http://localhost:8080/predictions/where"
+# Starlette spools uploads to disk above this size
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def receive_and_read(path: str, size: int) -> Tuple[bytes, List[Any]]:
+    """Return the image bytes and the buffers still held when they are sent on."""
+    upload = SpooledUpload(directory=tempfile.gettempdir())
+    for _ in range(0, size, READ_CHUNK_SIZE):
+        await upload.write(os.urandom(READ_CHUNK_SIZE))
+
+    parsed = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    async for chunk in upload.chunks(release=path == "raw"):
+        parsed.write(chunk)
+    parsed.seek(0)
+    image = parsed.read()
+    if path == "raw":
+        await upload.close()
+        parsed.close()
+        return image, []
+    # Kept until the response is sent
+    return image, [upload, parsed]
+
+
+async def run_case(path: str, client: str, size_mb: float) -> dict:
+    if client == "httpx":
+        import httpx
+    else:
+        import requests
+    # The API's event loop and its thread pool are already running
+    await asyncio.to_thread(lambda: None)
+    baseline = peak_rss_mb()
+
+    image, held = await receive_and_read(path, int(size_mb * 1024 * 1024))
+    if path == "multipart":
+        if client == "httpx":
+            request = httpx.Request("POST", URL, files={"data": ("image", image, "application/octet-stream")})
+            request.read()
+        else:
+            request = requests.Request(
+                "POST", URL, files={"data": ("image", BytesIO(image), "image/jpeg")}
+            ).prepare()
+    else:
+        headers = {"Content-Type": "application/octet-stream"}
+        if client == "httpx":
+            request = httpx.Request("POST", URL, content=image, headers=headers)
+            request.read()
+        else:
+            request = requests.Request("POST", URL, data=image, headers=headers).prepare()
+
+    growth = peak_rss_mb() - baseline
+    return {
+        "path": path,
+        "client": client,
+        "size_mb": size_mb,
+        "peak_rss_growth_mb": growth,
+        "copies": growth / size_mb if size_mb else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure peak memory of the upload path")
+    parser.add_argument("--size-mb", type=float, default=8.0, help="Size of the simulated upload")
+    parser.add_argument("--client", choices=["requests", "httpx"], nargs="+", default=["requests", "httpx"])
+    parser.add_argument("--case", nargs=2, metavar=("PATH", "CLIENT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(asyncio.run(run_case(args.case[0], args.case[1], args.size_mb))))
+        return
+
+    print(f"Upload size: {args.size_mb:.1f} MB")
+    for client in args.client:
+        for path in ("multipart", "raw"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--size-mb", str(args.size_mb), "--case", path, client],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output)
+            print(
+                f"{client:>8} {path:>9}: peak RSS +{result['peak_rss_growth_mb']:.1f} MB"
+                f" ({result['copies']:.1f} copies of the upload)"
+            )
+
+
+if __name__ == "__main__":
+    main()
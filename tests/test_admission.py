@@ -0,0 +1,209 @@
+import sys
+from pathlib import Path
+import asyncio
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.admission import (
+    FREE,
+    PRO,
+    AdmissionController,
+    ClientDisconnected,
+    Lane,
+    Overloaded,
+    cancel_on_disconnect,
+    default_lanes,
+)
+from api.services.timing import StageTimer
+
+
+def test_queued_requests_get_slots_in_order():
+    controller = AdmissionController(limit=1, min_limit=1, queue_size=5, adaptive=False)
+    order = []
+
+    async def work(name, hold):
+        async with controller.slot():
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def run():
+        first = asyncio.create_task(work("a", 0.02))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(work(name, 0)) for name in "bc"]
+        await asyncio.sleep(0)
+        assert controller.in_flight == 1 and controller.queued == 2
+        await asyncio.gather(first, *rest)
+
+    asyncio.run(run())
+    assert order == ["a", "b", "c"]
+    assert controller.in_flight == 0
+    assert controller.stats["queued"] == 2
+
+
+def test_sheds_when_queue_is_full_or_wait_runs_out():
+    controller = AdmissionController(limit=1, min_limit=1, queue_size=1, queue_timeout=0.02, adaptive=False)
+
+    async def run():
+        await controller.acquire()
+        waiting = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as full:
+            await controller.acquire()
+        with pytest.raises(Overloaded) as timed_out:
+            await waiting
+        return full.value, timed_out.value
+
+    full, timed_out = asyncio.run(run())
+    assert full.reason == "queue_full" and full.retry_after >= 1
+    assert timed_out.reason == "queue_timeout"
+    assert controller.queued == 0 and controller.in_flight == 1
+    assert controller.stats["shed_queue_full"] == 1 and controller.stats["shed_queue_timeout"] == 1
+
+
+def test_slot_times_the_queue_stage():
+    controller = AdmissionController(limit=1, adaptive=False)
+    timer = StageTimer()
+
+    async def run():
+        async with controller.slot(timer=timer):
+            pass
+
+    asyncio.run(run())
+    assert "queue" in timer.stages
+
+
+def test_limit_shrinks_when_latency_rises_and_grows_when_saturated():
+    controller = AdmissionController(limit=8, min_limit=2, max_limit=10, window=4, tolerance=2)
+
+    def complete(latency, times):
+        for _ in range(times):
+            asyncio.run(controller.acquire())
+            controller.release(latency)
+
+    complete(0.1, 4)
+    assert controller.limit == 8
+    controller._saturated = True
+    complete(0.1, 4)
+    assert controller.limit == 9
+    complete(0.5, 4)
+    assert controller.limit == 6
+    complete(0.5, 40)
+    assert controller.limit == 2  # never below min_limit
+
+
+def test_work_is_cancelled_when_the_client_disconnects():
+    cancelled = []
+
+    class Request:
+        def __init__(self):
+            self.polls = 0
+
+        async def is_disconnected(self):
+            self.polls += 1
+            return self.polls >= 2
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(cancel_on_disconnect(Request(), slow(), interval=0.01))
+    assert cancelled == [True]
+
+
+def pro_and_free(limit=2, reserved=1, weight=2, queue_size=10):
+    return AdmissionController(
+        limit=limit, min_limit=1, queue_size=queue_size, adaptive=False,
+        lanes=[Lane(PRO, weight=weight, reserved=reserved), Lane(FREE)],
+    )
+
+
+def test_free_requests_leave_reserved_slots_to_pro():
+    controller = pro_and_free(limit=4, reserved=2)
+
+    async def run():
+        await controller.acquire(lane=FREE)
+        await controller.acquire(lane=FREE)
+        queued = asyncio.create_task(controller.acquire(lane=FREE))
+        await asyncio.sleep(0)
+        assert controller.lanes[FREE].waiters
+        await controller.acquire(lane=PRO)
+        await controller.acquire(lane=PRO)
+        queued.cancel()
+
+    asyncio.run(run())
+    assert controller.lanes[PRO].in_flight == 2 and controller.lanes[FREE].in_flight == 2
+
+
+def test_pro_slots_are_reserved_only_when_entitlements_are_verified(monkeypatch):
+    monkeypatch.delenv("ENTITLEMENT_SECRET", raising=False)
+    assert [lane.reserved for lane in default_lanes()] == [0, 0]
+
+    monkeypatch.setenv("ENTITLEMENT_SECRET", "s3cret")
+    assert default_lanes()[0].name == PRO and default_lanes()[0].reserved > 0
+
+
+def test_pro_requests_jump_the_queue_by_weight():
+    controller = pro_and_free(limit=1, reserved=0, weight=2)
+    order = []
+
+    async def work(lane, name):
+        async with controller.slot(lane=lane):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def run():
+        await controller.acquire(lane=FREE)
+        tasks = [asyncio.create_task(work(FREE, f"free{i}")) for i in range(2)]
+        tasks += [asyncio.create_task(work(PRO, f"pro{i}")) for i in range(3)]
+        await asyncio.sleep(0)
+        controller.release(lane=FREE)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["pro0", "pro1", "free0", "pro2", "free1"]
+
+
+def test_full_queue_evicts_free_waiters_for_pro():
+    controller = pro_and_free(limit=1, reserved=0, queue_size=1)
+
+    async def run():
+        await controller.acquire(lane=FREE)
+        free = asyncio.create_task(controller.acquire(lane=FREE))
+        await asyncio.sleep(0)
+        pro = asyncio.create_task(controller.acquire(lane=PRO))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="queue_full"):
+            await free
+        controller.release(lane=FREE)
+        await pro
+
+    asyncio.run(run())
+    assert controller.lanes[FREE].stats["shed_queue_full"] == 1
+    assert controller.lanes[PRO].in_flight == 1
+
+
+def test_multi_slot_requests_wait_for_enough_free_slots():
+    controller = AdmissionController(limit=4, min_limit=1, queue_size=5, adaptive=False)
+
+    async def run():
+        await controller.acquire(cost=3)
+        batch = asyncio.create_task(controller.acquire(cost=2))
+        await asyncio.sleep(0)
+        assert controller.queued == 1
+        controller.release(cost=3)
+        await batch
+        assert controller.in_flight == 2
+        controller.release(cost=2)
+        # More than the limit runs alone rather than never
+        await controller.acquire(cost=10)
+        assert controller.in_flight == 10
+
+    asyncio.run(run())
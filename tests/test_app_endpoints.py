@@ -1,8 +1,10 @@
+import os
 import sys
 from pathlib import Path
 import importlib
 import asyncio
 
+import pytest
 from fastapi.testclient import TestClient
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -66,7 +68,9 @@ def test_predict_returns_expected_data(mock_post, mock_nearest, mock_insert):
 
 
 def test_rate_limit_returns_429_after_limit_exceeded():
-    importlib.reload(api.main)
+    # /health is exempt and cheap by default; count it like a prediction
+    with patch.dict(os.environ, {"RATE_LIMIT_EXEMPT_PATHS": "/", "RATE_LIMIT_DEFAULT_COST": "1"}):
+        importlib.reload(api.main)
     with patch("api.main.init_db", new_callable=AsyncMock), patch(
         "api.main.close_db", new_callable=AsyncMock
     ):
@@ -77,3 +81,21 @@ def test_rate_limit_returns_429_after_limit_exceeded():
         resp = client.get("/health")
         assert resp.status_code == 429
 
+
+def test_startup_fails_when_a_dependency_is_missing():
+    with patch("api.main.REQUIRED_MODULES", ("not_installed_anywhere",)), patch(
+        "api.main.init_db", new_callable=AsyncMock
+    ):
+        with pytest.raises(RuntimeError, match="not_installed_anywhere"):
+            with TestClient(api.main.app):
+                pass
+
+
+def test_rejected_file_type_still_reports_timings():
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(predict(photo=DummyUploadFile(b"dummy", content_type="text/plain"), db_pool=None))
+
+    assert excinfo.value.status_code == 400
+    assert "Server-Timing" in excinfo.value.headers
@@ -0,0 +1,106 @@
+import sys
+from pathlib import Path
+import asyncio
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.batcher import EmbeddingBatcher
+
+
+def test_concurrent_requests_share_one_batch():
+    calls = []
+
+    async def infer_batch(images):
+        calls.append(list(images))
+        return [[float(len(image))] for image in images]
+
+    async def run():
+        batcher = EmbeddingBatcher(infer_batch, max_batch_size=4, max_delay_ms=50)
+        await batcher.start()
+        try:
+            results = await asyncio.gather(
+                *(batcher.submit(b"x" * n) for n in range(1, 5))
+            )
+        finally:
+            await batcher.stop()
+        return results, batcher.snapshot()
+
+    results, stats = asyncio.run(run())
+
+    assert results == [[1.0], [2.0], [3.0], [4.0]]
+    assert len(calls) == 1
+    assert stats["batches"] == 1
+    assert stats["batch_sizes"] == {4: 1}
+    assert stats["mean_batch_size"] == 4.0
+
+
+def test_without_delay_queued_requests_still_share_a_batch():
+    calls = []
+
+    async def infer_batch(images):
+        calls.append(len(images))
+        return [[0.0] for _ in images]
+
+    async def run():
+        batcher = EmbeddingBatcher(infer_batch, max_batch_size=4, max_delay_ms=0)
+        await batcher.start()
+        try:
+            await asyncio.gather(*(batcher.submit(b"img") for _ in range(6)))
+        finally:
+            await batcher.stop()
+
+    asyncio.run(run())
+
+    assert calls == [4, 2]
+
+
+def test_batch_flushes_after_max_delay():
+    async def infer_batch(images):
+        return [[0.0] for _ in images]
+
+    async def run():
+        batcher = EmbeddingBatcher(infer_batch, max_batch_size=8, max_delay_ms=5)
+        await batcher.start()
+        try:
+            result = await asyncio.wait_for(batcher.submit(b"img"), timeout=1)
+        finally:
+            await batcher.stop()
+        return result, batcher.snapshot()
+
+    result, stats = asyncio.run(run())
+
+    assert result == [0.0]
+    assert stats["batch_sizes"] == {1: 1}
+
+
+def test_per_item_error_only_fails_matching_request():
+    async def infer_batch(images):
+        return [ValueError("bad image") if image == b"bad" else [1.0] for image in images]
+
+    async def run():
+        batcher = EmbeddingBatcher(infer_batch, max_batch_size=2, max_delay_ms=50)
+        await batcher.start()
+        try:
+            return await asyncio.gather(
+                batcher.submit(b"good"), batcher.submit(b"bad"), return_exceptions=True
+            )
+        finally:
+            await batcher.stop()
+
+    good, bad = asyncio.run(run())
+
+    assert good == [1.0]
+    assert isinstance(bad, ValueError)
+
+
+def test_submit_requires_running_batcher():
+    async def infer_batch(images):
+        return []
+
+    batcher = EmbeddingBatcher(infer_batch)
+    with pytest.raises(RuntimeError):
+        asyncio.run(batcher.submit(b"img"))
@@ -0,0 +1,78 @@
+import sys
+from pathlib import Path
+import time
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.breaker import CircuitBreaker, CircuitOpenError
+from api.services.deadline import DeadlineExceeded
+
+
+class ClientError(Exception):
+    status_code = 400
+
+
+def fail(breaker, exc=ConnectionError("down")):
+    with pytest.raises(type(exc)):
+        with breaker.guard():
+            raise exc
+
+
+def test_breaker_opens_after_error_rate_and_fails_fast():
+    breaker = CircuitBreaker("dep", failure_rate=0.5, min_calls=4, open_seconds=60)
+    with breaker.guard():
+        pass
+    for _ in range(3):
+        fail(breaker)
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pytest.fail("call should not run while open")
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_half_open_probe_closes_breaker_on_success():
+    breaker = CircuitBreaker("dep", min_calls=1, open_seconds=0.01)
+    fail(breaker)
+    assert breaker.state == "open"
+
+    time.sleep(0.02)
+    assert breaker.allows()
+    with breaker.guard():
+        assert breaker.state == "half_open"
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker("dep", min_calls=1, open_seconds=0.01)
+    fail(breaker)
+    time.sleep(0.02)
+    fail(breaker)
+    assert breaker.state == "open"
+    assert breaker.snapshot()["opened"] == 2
+
+
+def test_client_errors_do_not_trip_breaker():
+    breaker = CircuitBreaker("dep", min_calls=2)
+    fail(breaker, ClientError())
+    fail(breaker, ClientError())
+    assert breaker.state == "closed"
+
+
+def test_exhausted_deadlines_do_not_trip_breaker():
+    breaker = CircuitBreaker("dep", min_calls=1)
+    fail(breaker, DeadlineExceeded("geocode"))
+    assert breaker.state == "closed"
+    assert breaker.snapshot()["window_calls"] == 0
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("dep", min_calls=1, slow_call_seconds=0.0)
+    with breaker.guard():
+        time.sleep(0.001)
+    assert breaker.state == "open"
@@ -37,3 +37,70 @@ async def test_pool_returns_connection(mock_create_pool):
         assert conn == "conn"
         await close_db(app)
         assert app.state.pool.closed
+
+
+def test_pool_options_come_from_settings():
+    from types import SimpleNamespace
+    from api.db import pool_options
+
+    config = SimpleNamespace(
+        DB_POOL_MIN_SIZE=2, DB_POOL_MAX_SIZE=8, DB_STATEMENT_CACHE_SIZE=0, DB_MAX_QUERIES=1000,
+        DB_MAX_INACTIVE_CONNECTION_LIFETIME=60.0, DB_COMMAND_TIMEOUT=5.0, DB_SEARCH_PATH="whereisthisplace, public",
+    )
+
+    assert pool_options(config) == {
+        "min_size": 2,
+        "max_size": 8,
+        "statement_cache_size": 0,
+        "max_queries": 1000,
+        "max_inactive_connection_lifetime": 60.0,
+        "command_timeout": 5.0,
+        "server_settings": {"search_path": "whereisthisplace, public"},
+    }
+
+
+def test_acquire_wait_is_measured_for_every_acquire():
+    import asyncio
+    from api.db import PoolMetrics
+
+    class Connection:
+        async def fetchval(self, query):
+            return 1
+
+    class AcquireContext:
+        def __init__(self, timeout):
+            self.timeout = timeout
+
+        async def __aenter__(self):
+            await asyncio.sleep(0.01)
+            if self.timeout == 0:
+                raise asyncio.TimeoutError()
+            return Connection()
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+    class Pool:
+        def acquire(self, *, timeout=None):
+            return AcquireContext(timeout)
+
+        def get_size(self):
+            return 3
+
+    metrics = PoolMetrics()
+    pool = metrics.instrument(Pool())
+
+    async def run():
+        waiting = asyncio.create_task(pool.fetchval("SELECT 1"))
+        await asyncio.sleep(0)
+        assert metrics.waiting == 1
+        assert await waiting == 1
+        with pytest.raises(asyncio.TimeoutError):
+            async with pool.acquire(timeout=0):
+                pass
+
+    asyncio.run(run())
+    assert metrics.stats == {"acquires": 2, "acquire_timeouts": 1}
+    assert metrics.waiting == 0
+    assert metrics.acquire_wait.count == 2 and metrics.acquire_wait.max >= 10
+    assert pool.get_size() == 3
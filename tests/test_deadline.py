@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.deadline import Deadline, DeadlineExceeded, PREDICT_DEADLINE_SECONDS
+
+
+def make_request(headers):
+    return SimpleNamespace(headers=headers)
+
+
+def test_budget_comes_from_header():
+    deadline = Deadline.from_request(make_request({"x-request-timeout-ms": "2500"}))
+    assert deadline.budget == 2.5
+
+
+def test_missing_or_invalid_header_uses_default():
+    assert Deadline.from_request(None).budget == PREDICT_DEADLINE_SECONDS
+    assert Deadline.from_request(make_request({"x-request-timeout-ms": "soon"})).budget == PREDICT_DEADLINE_SECONDS
+
+
+def test_timeout_is_capped_by_remaining_budget():
+    deadline = Deadline(5)
+    assert deadline.timeout("embedding", 30) <= 5
+    assert deadline.timeout("geocode", 1) == 1
+
+
+def test_exhausted_budget_skips_stage():
+    deadline = Deadline(0)
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout("openai", 15)
+    assert not deadline.allows(1)
+    assert deadline.summary()["stages"] == {"openai": "skipped"}
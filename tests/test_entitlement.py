@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services import entitlement
+from api.services.entitlement import lane_for, sign_entitlement, verify_entitlement
+
+
+class Request:
+    def __init__(self, token=None):
+        self.headers = {"x-entitlement": token} if token else {}
+
+
+def test_verifies_signed_tier_until_expiry():
+    token = sign_entitlement("pro", 2000, secret="s3cret")
+
+    assert verify_entitlement(token, secret="s3cret", now=1000) == "pro"
+    assert verify_entitlement(token, secret="s3cret", now=3000) is None
+    assert verify_entitlement(token, secret="other", now=1000) is None
+
+
+def test_rejects_tampered_and_malformed_tokens():
+    token = sign_entitlement("free", 2000, secret="s3cret")
+    forged = sign_entitlement("pro", 2000, secret="s3cret").split(".")[0] + "." + token.split(".")[1]
+
+    assert verify_entitlement(forged, secret="s3cret", now=1000) is None
+    assert verify_entitlement("not-a-token", secret="s3cret", now=1000) is None
+    assert verify_entitlement("a.b", secret="s3cret", now=1000) is None
+
+
+def test_lane_is_pro_only_with_a_valid_token(monkeypatch):
+    monkeypatch.setattr(entitlement, "ENTITLEMENT_SECRET", "s3cret")
+    token = sign_entitlement("pro", time.time() + 60)
+
+    assert lane_for(Request(token)) == "pro"
+    assert lane_for(Request(token[:-2])) == "free"
+    assert lane_for(Request()) == "free"
+    assert lane_for(None) == "free"
@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.gazetteer import Gazetteer, fold
+
+
+def loaded():
+    gaz = Gazetteer()
+    gaz.load()
+    return gaz
+
+
+def test_fold_strips_diacritics_and_punctuation():
+    assert fold("  São Paulo ") == "sao paulo"
+    assert fold("Łódź") == "lodz"
+    assert fold("U.S.A.") == "usa"
+    assert fold("Saint-Étienne") == "saint etienne"
+
+
+def test_lookup_city_and_country_aliases():
+    gaz = loaded()
+
+    place = gaz.lookup("New York, USA")
+    assert (place.name, place.country_code) == ("New York", "US")
+    assert gaz.lookup("Sao Paulo, Brasil").name == "São Paulo"
+    assert gaz.lookup("Kraków, Polska").name == "Kraków"
+    assert gaz.lookup("NYC").name == "New York"
+
+
+def test_country_narrows_ambiguous_city():
+    gaz = loaded()
+
+    assert gaz.lookup("Paris").country_code == "FR"
+    assert gaz.lookup("Paris, Texas, United States").country_code == "US"
+    assert gaz.lookup("London, Canada").country_code == "CA"
+
+
+def test_unknown_qualifier_is_a_miss_rather_than_another_city():
+    gaz = loaded()
+
+    assert gaz.lookup("Paris, Texas") is None
+    assert gaz.lookup("London, Ontario") is None
+
+
+def test_country_only_and_misses():
+    gaz = loaded()
+
+    assert gaz.lookup("Japan").name == "Japan"
+    assert gaz.lookup("Singapore").name == "Singapore"
+    assert gaz.lookup("Paris, Japan") is None
+    assert gaz.lookup("Nowhereville, France") is None
+    stats = gaz.snapshot()
+    assert stats["hits"] == 2 and stats["misses"] == 2
+
+
+def test_loads_geonames_dump(tmp_path):
+    row = ["2988507", "Paris", "Paris", "Lutetia,Parigi", "48.85341", "2.3488",
+           "P", "PPLC", "FR", "", "11", "75", "", "", "2138551", "", "42",
+           "Europe/Paris", "2024-01-01"]
+    cities = tmp_path / "cities15000.txt"
+    cities.write_text("\t".join(row) + "\n", encoding="utf-8")
+
+    gaz = Gazetteer()
+    gaz.load(str(cities), None)
+
+    place = gaz.lookup("Parigi")
+    assert place.population == 2138551
+    assert place.lat == 48.85341
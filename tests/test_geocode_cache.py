@@ -0,0 +1,112 @@
+import sys
+from pathlib import Path
+import asyncio
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.geocode_cache import GeocodeCache
+
+
+class DummyPool:
+    def __init__(self, rows=None):
+        self.rows = rows or {}
+        self.executed = []
+        self.reads = 0
+
+    async def fetch(self, query, *args):
+        return [
+            {"query": key, **row} for key, row in
+            sorted(self.rows.items(), key=lambda item: -item[1].get("hits", 0))
+        ]
+
+    async def fetchrow(self, query, key, *args):
+        self.reads += 1
+        return self.rows.get(key)
+
+    async def executemany(self, query, rows):
+        self.executed.append((query.split()[0], list(rows)))
+
+
+def row(lat, lon, found=True, hits=0):
+    return {"lat": lat, "lon": lon, "found": found, "age": 0.0, "hits": hits}
+
+
+def test_memory_only_cache_with_negative_entries():
+    async def run():
+        cache = GeocodeCache()
+        assert await cache.get("Springfield, USA") is None
+        cache.put("Springfield, USA", (39.8, -89.6))
+        cache.put("Atlantis", None)
+        return cache, await cache.get("springfield,  usa"), await cache.get("Atlantis")
+
+    cache, found, missing = asyncio.run(run())
+
+    assert found.coords == (39.8, -89.6)
+    assert missing is not None and not missing.found
+    stats = cache.snapshot()
+    assert stats["memory_hits"] == 2 and stats["negative_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    cache = GeocodeCache(maxsize=2)
+    cache.put("a", (1.0, 1.0))
+    cache.put("b", (2.0, 2.0))
+    asyncio.run(cache.get("a"))
+    cache.put("c", (3.0, 3.0))
+
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("a")).coords == (1.0, 1.0)
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_expired_entries_are_dropped():
+    cache = GeocodeCache(ttl=0, negative_ttl=0)
+    cache.put("a", (1.0, 1.0))
+
+    assert asyncio.run(cache.get("a")) is None
+    assert cache.snapshot()["expired"] == 1
+
+
+def test_warms_from_database_and_writes_back():
+    pool = DummyPool({"paris france": row(48.8, 2.3, hits=5), "gotham": row(None, None, found=False)})
+
+    async def run():
+        cache = GeocodeCache(flush_seconds=3600)
+        await cache.start(pool)
+        hit = await cache.get("Paris, France")
+        cache.put("Metropolis", (1.0, 2.0))
+        await cache.stop()
+        return cache, hit
+
+    cache, hit = asyncio.run(run())
+
+    assert cache.snapshot()["warmed"] == 2
+    assert hit.coords == (48.8, 2.3)
+    assert pool.reads == 0  # served from the warmed memory tier
+    assert pool.executed == [
+        ("INSERT", [("metropolis", 1.0, 2.0, True)]),
+        ("UPDATE", [("paris france", 1)]),
+    ]
+
+
+def test_database_tier_is_promoted_into_memory():
+    pool = DummyPool()
+
+    async def run():
+        cache = GeocodeCache(warm=0, flush_seconds=3600)
+        await cache.start(pool)
+        pool.rows["cairo egypt"] = row(30.0, 31.2)
+        first = await cache.get("Cairo, Egypt")
+        second = await cache.get("Cairo, Egypt")
+        await cache.stop()
+        return cache, first, second
+
+    cache, first, second = asyncio.run(run())
+
+    assert first.coords == second.coords == (30.0, 31.2)
+    assert pool.reads == 1
+    stats = cache.snapshot()
+    assert stats["db_hits"] == 1 and stats["memory_hits"] == 1
@@ -0,0 +1,85 @@
+import sys
+from pathlib import Path
+import asyncio
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.health import HealthMonitor
+
+
+class DummyPool:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    async def fetchval(self, query):
+        await asyncio.sleep(self.delay)
+        return 1
+
+
+def models_handler(names, status=200):
+    def handler(request):
+        assert request.url.path == "/models"
+        return httpx.Response(status, json={"models": [{"modelName": n} for n in names]})
+    return handler
+
+
+def probe(monitor, handler, pool):
+    async def run():
+        monitor.pool = pool
+        monitor._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await monitor.probe()
+        finally:
+            await monitor._client.aclose()
+    return asyncio.run(run())
+
+
+def test_not_ready_before_first_probe():
+    monitor = HealthMonitor()
+    assert monitor.checks["torchserve"]["status"] == "unknown"
+    assert not monitor.ready()
+    assert monitor.snapshot()["age_seconds"] is None
+
+
+def test_ready_when_model_loaded_and_database_answers():
+    monitor = HealthMonitor()
+    checks = probe(monitor, models_handler(["where"]), DummyPool())
+
+    assert checks["torchserve"]["status"] == "healthy"
+    assert checks["database"]["status"] == "healthy"
+    assert checks["openai"]["status"] == "healthy"
+    assert monitor.torchserve_status() == "healthy"
+    assert monitor.ready()
+
+
+def test_missing_model_and_slow_database_are_unhealthy():
+    monitor = HealthMonitor(timeout=0.01)
+    checks = probe(monitor, models_handler(["other"]), DummyPool(delay=1))
+
+    assert monitor.torchserve_status().startswith('unhealthy - "where" model not found')
+    assert checks["database"]["status"] == "unhealthy"
+    assert not monitor.ready()
+
+
+def test_unreachable_torchserve_is_reported_not_raised():
+    def handler(request):
+        raise httpx.ConnectError("refused")
+
+    monitor = HealthMonitor()
+    checks = probe(monitor, handler, DummyPool())
+
+    assert checks["torchserve"]["status"] == "unhealthy"
+    assert "connection error" in checks["torchserve"]["detail"]
+    assert not monitor.ready()
+
+
+def test_stale_probe_is_not_ready():
+    monitor = HealthMonitor(interval=1)
+    probe(monitor, models_handler(["where"]), DummyPool())
+    monitor.last_probe -= 10
+
+    assert not monitor.ready()
@@ -0,0 +1,139 @@
+import sys
+from pathlib import Path
+import asyncio
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.jobs import JobManager, JobQueueFull
+
+
+class DummyHTTPError(Exception):
+    def __init__(self, status_code, detail):
+        self.status_code = status_code
+        self.detail = detail
+
+
+def test_job_runs_in_background_and_stores_result():
+    async def run():
+        manager = JobManager(workers=2)
+        await manager.start()
+        try:
+            async def work():
+                await asyncio.sleep(0)
+                return {"status": "success"}
+
+            job = manager.submit(work)
+            assert job.status == "queued"
+            await asyncio.wait_for(job.done.wait(), timeout=1)
+            return manager.get(job.id), manager.snapshot()
+        finally:
+            await manager.stop()
+
+    job, stats = asyncio.run(run())
+
+    assert job.status == "succeeded"
+    assert job.to_dict()["result"] == {"status": "success"}
+    assert stats["succeeded"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_failed_job_keeps_status_code():
+    async def run():
+        manager = JobManager(workers=1)
+        await manager.start()
+        try:
+            async def work():
+                raise DummyHTTPError(504, "TorchServe request timed out")
+
+            job = manager.submit(work)
+            await asyncio.wait_for(job.done.wait(), timeout=1)
+            return job
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(run())
+
+    assert job.status == "failed"
+    assert job.error == {"status_code": 504, "detail": "TorchServe request timed out"}
+
+
+def test_submit_rejects_when_queue_full():
+    async def run():
+        manager = JobManager(workers=1, queue_size=1)
+        await manager.start()
+        blocker = asyncio.Event()
+        try:
+            async def work():
+                await blocker.wait()
+                return {}
+
+            manager.submit(work)
+            await asyncio.sleep(0)  # let the worker pick up the first job
+            manager.submit(work)
+            with pytest.raises(JobQueueFull):
+                manager.submit(work)
+            return manager.snapshot()
+        finally:
+            blocker.set()
+            await manager.stop()
+
+    stats = asyncio.run(run())
+
+    assert stats["rejected"] == 1
+
+
+class DummyJobTable:
+    """Stands in for the ``jobs`` table shared by the worker processes."""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def execute(self, query, *args):
+        if not query.strip().startswith("INSERT INTO jobs"):
+            return
+        job_id, status, created_at, started_at, finished_at, result, error = args
+        current = self.rows.get(job_id)
+        if current is None or current["status"] == "queued" or (current["status"] == "running" and status != "queued"):
+            self.rows[job_id] = {
+                "id": job_id, "status": status, "created_at": created_at, "started_at": started_at,
+                "finished_at": finished_at, "result": result, "error": error,
+            }
+
+    async def fetchrow(self, query, job_id, ttl):
+        return self.rows.get(job_id)
+
+
+def test_jobs_can_be_followed_from_another_worker():
+    table = DummyJobTable()
+
+    async def run():
+        submitter, other = JobManager(workers=1), JobManager(workers=1, poll_seconds=0.01)
+        await submitter.start(table)
+        await other.start(table)
+        release = asyncio.Event()
+        try:
+            async def work():
+                await release.wait()
+                return {"status": "success"}
+
+            job = submitter.submit(work)
+            await submitter.save(job)
+            seen = await other.lookup(job.id)
+            assert seen is not None and not seen.finished
+            with pytest.raises(asyncio.TimeoutError):
+                await other.wait(seen, 0.05)
+            release.set()
+            return await other.wait(seen, 1), await other.lookup("missing")
+        finally:
+            await submitter.stop()
+            await other.stop()
+
+    job, missing = asyncio.run(run())
+
+    assert job.status == "succeeded"
+    assert job.to_dict()["result"] == {"status": "success"}
+    assert missing is None
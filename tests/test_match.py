@@ -11,16 +11,34 @@ ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 sys.path.insert(1, str(ROOT / "api"))
 
-from api.repositories.match import nearest
+from api.repositories.match import nearest, nearest_many
+from api.vector import VECTOR_HEADER, encode_vector
+
+
+def binary_vector(values):
+    """pgvector's binary ``vector``: dimension, unused, big-endian float32."""
+    return VECTOR_HEADER.pack(len(values), 0) + np.asarray(values, dtype=">f4").tobytes()
 
 
 class DummyConn:
+    """Encodes ``vector`` parameters with the registered codec, as asyncpg does."""
+
     def __init__(self, result):
         self.result = result
         self.queries = []
+        self.codecs = {}
+
+    async def set_type_codec(self, typename, schema="public", encoder=None, decoder=None, format="text"):
+        self.codecs[typename] = (encoder, format)
 
     async def fetchrow(self, query, vec):
-        self.queries.append((query, vec))
+        encoder, _ = self.codecs["vector"]
+        self.queries.append((query, encoder(vec)))
+        return self.result
+
+    async def fetch(self, query, vecs):
+        encoder, _ = self.codecs["vector"]
+        self.queries.append((query, [encoder(vec) for vec in vecs]))
         return self.result
 
     async def execute(self, query):
@@ -31,17 +49,48 @@ class DummyConn:
         pass
 
 
-@pytest.mark.asyncio
-async def test_nearest_returns_expected_row():
+def test_nearest_returns_expected_row():
     expected = {"lat": 1.0, "lon": 2.0, "score": 0.9}
 
     dummy = DummyConn(expected)
     with patch("api.repositories.match.asyncpg.connect", return_value=dummy):
-        with patch("api.db.register_vector"):  # Mock the pgvector registration
-            with patch.dict(os.environ, {"DATABASE_URL": "postgresql://"}):
-                result = await nearest(np.array([0.1, 0.2]))
+        with patch.dict(os.environ, {"DATABASE_URL": "postgresql://"}):
+            result = asyncio.run(nearest(np.array([0.1, 0.2])))
 
     assert result == expected
-    assert dummy.queries
-    assert "ORDER BY vlad <#> $1" in dummy.queries[0][0]
+    assert dummy.codecs["vector"][1] == "binary"
+    query, param = dummy.queries[0]
+    assert "ORDER BY vlad <#> $1" in query
+    assert param == binary_vector([0.1, 0.2])
+
+
+
+def test_nearest_uses_the_pool_when_given():
+    class DummyPool(DummyConn):
+        pass
+
+    pool = DummyPool({"lat": 1.0, "lon": 2.0, "score": 0.9})
+    pool.codecs["vector"] = (encode_vector, "binary")
+    with patch("api.repositories.match.asyncpg.connect") as connect:
+        result = asyncio.run(nearest(np.array([0.1, 0.2]), pool=pool))
+
+    connect.assert_not_called()
+    assert result["lat"] == 1.0
+    assert pool.queries[0][1] == binary_vector([0.1, 0.2])
+
+
+def test_nearest_many_returns_rows_in_input_order():
+    rows = [
+        {"idx": 2, "lat": 3.0, "lon": 4.0, "score": 0.8},
+        {"idx": 1, "lat": 1.0, "lon": 2.0, "score": 0.9},
+    ]
+    dummy = DummyConn(rows)
+    with patch("api.repositories.match.asyncpg.connect", return_value=dummy):
+        with patch.dict(os.environ, {"DATABASE_URL": "postgresql://"}):
+            result = asyncio.run(nearest_many([np.array([0.1]), np.array([0.2])]))
 
+    assert [row["lat"] for row in result] == [1.0, 3.0]
+    assert len(dummy.queries) == 1
+    query, params = dummy.queries[0]
+    assert "unnest($1::vector[])" in query
+    assert params == [binary_vector([0.1]), binary_vector([0.2])]
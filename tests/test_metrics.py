@@ -0,0 +1,133 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.middleware.ratelimit import SlidingWindowLimiter
+from api.services.batcher import EmbeddingBatcher
+from api.services.metrics import RequestMetrics, outcome_of, render_metrics, request_metrics
+from api.services.timing import StageTimer, stage_latency
+
+
+def samples(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+
+def test_outcomes_follow_status_codes():
+    assert [outcome_of(s) for s in (200, 400, 429, 499, 500, 503, 504)] == [
+        "success", "client_error", "client_error", "cancelled", "error", "unavailable", "timeout",
+    ]
+
+
+def test_request_counts_and_in_flight():
+    metrics = RequestMetrics()
+    metrics.started()
+    metrics.started()
+    metrics.finished("/predict", "success", "openai")
+
+    assert metrics.in_flight == 1
+    assert metrics.counts[("/predict", "success", "openai")] == 1
+
+
+def test_render_exposes_stages_requests_pool_and_rate_limits():
+    stage_latency.reset()
+    timer = StageTimer()
+    timer.add("embedding", 0.03)
+    stage_latency.observe(timer)
+    request_metrics.started()
+    request_metrics.finished("/predict", "success", "model")
+    limiter = SlidingWindowLimiter(limit=1, period=60)
+    limiter.hit("10.0.0.1")
+    limiter.hit("10.0.0.1")
+    pool = {"size": 4, "idle": 1, "in_use": 3, "min": 2, "max": 10, "waiting": 2}
+
+    batcher = EmbeddingBatcher(None)
+    batcher.batch_sizes[3] += 2
+
+    text = render_metrics(pool, limiter, batcher)
+    values = samples(text)
+
+    assert "# TYPE whereisthisplace_stage_duration_seconds histogram" in text
+    assert values['whereisthisplace_stage_duration_seconds_bucket{stage="embedding",le="0.025"}'] == "0"
+    assert values['whereisthisplace_stage_duration_seconds_bucket{stage="embedding",le="0.05"}'] == "1"
+    assert values['whereisthisplace_stage_duration_seconds_bucket{stage="embedding",le="+Inf"}'] == "1"
+    assert values['whereisthisplace_stage_duration_seconds_count{stage="embedding"}'] == "1"
+    assert int(values['whereisthisplace_requests_total{route="/predict",outcome="success",source="model"}']) >= 1
+    assert values['whereisthisplace_db_pool_connections{state="in_use"}'] == "3"
+    assert values["whereisthisplace_db_pool_waiting"] == "2"
+    assert "whereisthisplace_db_pool_acquire_wait_seconds_count" in values
+    assert values['whereisthisplace_rate_limit_rejections_total{reason="limit"}'] == "1"
+    assert 'whereisthisplace_cache_hit_ratio{cache="geocode_cache"}' in values
+    assert 'whereisthisplace_admission_shed_total{lane="free",reason="queue_full"}' in values
+    assert 'whereisthisplace_admission_queue_depth{lane="pro"}' in values
+    assert 'whereisthisplace_lane_request_duration_seconds_count{lane="pro"}' in values
+    assert values["whereisthisplace_prediction_log_queue_depth"] == "0"
+    assert 'whereisthisplace_prediction_log_rows_total{result="dropped"}' in values
+    assert values["whereisthisplace_torchserve_queue_depth"] == "0"
+    assert values['whereisthisplace_torchserve_dispatches_total{size="3"}'] == "2"
+    assert values["whereisthisplace_jobs_queue_depth"] == "0"
+    assert 'whereisthisplace_jobs_total{result="rejected"}' in values
+    stage_latency.reset()
+
+
+def test_pool_stats_reads_asyncpg_pool():
+    from api.db import PoolMetrics, pool_stats
+
+    metrics = PoolMetrics()
+    metrics.waiting = 1
+
+    class Pool:
+        def get_size(self):
+            return 5
+
+        def get_idle_size(self):
+            return 2
+
+        def get_min_size(self):
+            return 2
+
+        def get_max_size(self):
+            return 10
+
+    assert pool_stats(Pool(), metrics) == {"size": 5, "idle": 2, "in_use": 3, "min": 2, "max": 10, "waiting": 1}
+
+
+def test_middleware_counts_every_inference_route():
+    import asyncio
+    from api.middleware.metrics import RequestMetricsMiddleware
+    from api.services.metrics import PREDICTION_SOURCE_STATE
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/predict/batch":
+            raise RuntimeError("boom")
+        if scope["path"] == "/predict/stream":
+            scope.setdefault("state", {})[PREDICTION_SOURCE_STATE] = "model"
+        status = 429 if scope["path"] == "/search/embedding" else 200
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    metrics = RequestMetrics()
+    middleware = RequestMetricsMiddleware(app, metrics=metrics)
+
+    async def send(message):
+        pass
+
+    async def run():
+        for method, path in [("POST", "/predict/stream"), ("POST", "/search/embedding"), ("POST", "/jobs"),
+                             ("GET", "/jobs"), ("GET", "/health"), ("POST", "/predict/batch")]:
+            try:
+                await middleware({"type": "http", "method": method, "path": path}, None, send)
+            except RuntimeError:
+                pass
+
+    asyncio.run(run())
+
+    assert metrics.in_flight == 0
+    assert dict(metrics.counts) == {
+        ("/predict/stream", "success", "model"): 1,
+        ("/search/embedding", "client_error", "none"): 1,
+        ("/jobs", "success", "none"): 1,
+        ("/predict/batch", "error", "none"): 1,
+    }
@@ -0,0 +1,115 @@
+import sys
+from pathlib import Path
+import asyncio
+import io
+import zipfile
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from routes.predict import predict_batch
+from api.services.admission import AdmissionController
+
+
+class DummyUploadFile:
+    def __init__(self, data: bytes, filename: str = "test.jpg", content_type: str = "image/jpeg"):
+        self.data = data
+        self.filename = filename
+        self.content_type = content_type
+
+    async def read(self) -> bytes:
+        return self.data
+
+
+def make_zip(names):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name in names:
+            archive.writestr(name, b"image-bytes")
+    return buf.getvalue()
+
+
+@patch("routes.predict.insert_prediction", new_callable=AsyncMock)
+@patch("routes.predict.OPENAI_API_KEY", None)
+@patch("routes.predict.nearest_many", new_callable=AsyncMock)
+@patch("routes.predict.requests.post")
+def test_batch_returns_result_per_image(mock_post, mock_nearest_many, mock_insert):
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"embedding": [0.0] * 128}
+    mock_nearest_many.side_effect = lambda vecs, pool=None: [
+        {"lat": 1.0, "lon": 2.0, "score": 0.5} for _ in vecs
+    ]
+
+    files = [
+        DummyUploadFile(b"a", filename="a.jpg"),
+        DummyUploadFile(b"b", filename="b.txt", content_type="text/plain"),
+        DummyUploadFile(make_zip(["c.jpg", "d.png", "notes.txt"]), filename="album.zip",
+                        content_type="application/zip"),
+    ]
+    response = SimpleNamespace(headers={})
+    result = asyncio.run(predict_batch(photos=files, db_pool="mock_pool", response=response, timings=True))
+
+    assert result["count"] == 4
+    assert result["succeeded"] == 3
+    assert result["failed"] == 1
+    assert [r["filename"] for r in result["results"]] == ["a.jpg", "b.txt", "c.jpg", "d.png"]
+    assert result["results"][1]["status"] == "error"
+    prediction = result["results"][0]["prediction"]
+    assert prediction["lat"] == 1.0
+    assert prediction["confidence_level"] == "medium"
+    assert mock_insert.await_count == 3
+    assert "embedding;dur=" in response.headers["Server-Timing"]
+    assert {"upload", "embedding", "search", "db"} <= set(result["timings"]["stages"])
+
+
+@patch("routes.predict.nearest_many", new_callable=AsyncMock)
+@patch("routes.predict.requests.post")
+def test_batch_reports_missing_match(mock_post, mock_nearest_many):
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"embedding": [0.0] * 128}
+    mock_nearest_many.side_effect = lambda vecs, pool=None: [None for _ in vecs]
+
+    result = asyncio.run(
+        predict_batch(photos=[DummyUploadFile(b"a")], mode="model", db_pool=None)
+    )
+
+    assert result["failed"] == 1
+    assert result["results"][0]["detail"] == "No match found"
+
+
+@patch("routes.predict.nearest_many", new_callable=AsyncMock)
+@patch("routes.predict.compute_embedding", new_callable=AsyncMock)
+def test_malformed_embedding_fails_only_its_image(mock_embed, mock_nearest_many):
+    mock_embed.side_effect = lambda data, filename, content_type, deadline: (
+        [[0.0], [1.0]] if filename == "bad.jpg" else [0.0] * 128
+    )
+    mock_nearest_many.side_effect = lambda vecs, pool=None: [
+        {"lat": 1.0, "lon": 2.0, "score": 0.5} for _ in vecs
+    ]
+
+    files = [DummyUploadFile(b"a", filename="bad.jpg"), DummyUploadFile(b"b", filename="good.jpg")]
+    result = asyncio.run(predict_batch(photos=files, mode="model", db_pool=None))
+
+    assert [r["status"] for r in result["results"]] == ["error", "success"]
+    assert result["results"][0]["filename"] == "bad.jpg"
+
+
+@patch("routes.predict.requests.post")
+def test_batch_is_shed_when_admission_is_full(mock_post):
+    controller = AdmissionController(limit=2, min_limit=1, queue_size=0, adaptive=False)
+
+    async def run():
+        await controller.acquire()
+        with patch("routes.predict.predict_admission", controller):
+            return await predict_batch(photos=[DummyUploadFile(b"a"), DummyUploadFile(b"b")], db_pool=None)
+
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        assert e.status_code == 503
+    else:
+        raise AssertionError("expected a 503")
+    mock_post.assert_not_called()
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from routes.predict import predict_stream
+from api.services.admission import predict_admission
+
+
+class DummyUploadFile:
+    def __init__(self, data: bytes, filename: str = "test.jpg", content_type: str = "image/jpeg"):
+        self.data = data
+        self.filename = filename
+        self.content_type = content_type
+
+    async def read(self) -> bytes:
+        return self.data
+
+
+async def collect(response):
+    return [chunk async for chunk in response.body_iterator]
+
+
+@patch("routes.predict.insert_prediction", new_callable=AsyncMock)
+@patch("routes.predict.OPENAI_API_KEY", "test_key")
+@patch("routes.predict.refine_with_openai", new_callable=AsyncMock)
+@patch("routes.predict.nearest", new_callable=AsyncMock)
+@patch("routes.predict.requests.post")
+def test_stream_sends_model_then_refined(mock_post, mock_nearest, mock_refine, mock_insert):
+    from routes.predict import GeoResult
+
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"embedding": [0.0] * 128}
+    mock_nearest.return_value = {"lat": 1.0, "lon": 2.0, "score": 0.5}
+    mock_refine.return_value = GeoResult(lat=48.8, lon=2.3, score=0.95, source="openai")
+
+    request = SimpleNamespace(headers={"accept": "application/x-ndjson"})
+    response = asyncio.run(
+        predict_stream(request=request, photo=DummyUploadFile(b"dummy"), db_pool="mock_pool")
+    )
+    events = [json.loads(line) for line in asyncio.run(collect(response))]
+
+    assert [e["event"] for e in events] == ["model", "refined", "done"]
+    assert events[0]["prediction"]["source"] == "model"
+    assert events[1]["prediction"]["source"] == "openai"
+    assert events[2]["prediction"]["lat"] == 48.8
+    assert "embedding;dur=" in response.headers["server-timing"]
+    assert {"upload", "queue", "embedding", "search", "db"} <= set(events[2]["timings"]["stages"])
+    mock_insert.assert_awaited_once()
+    assert predict_admission.in_flight == 0
+
+
+@patch("routes.predict.insert_prediction", new_callable=AsyncMock)
+@patch("routes.predict.nearest", new_callable=AsyncMock)
+@patch("routes.predict.requests.post")
+def test_stream_uses_sse_framing_when_accepted(mock_post, mock_nearest, mock_insert):
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"embedding": [0.0] * 128}
+    mock_nearest.return_value = {"lat": 1.0, "lon": 2.0, "score": 0.5}
+
+    request = SimpleNamespace(headers={"accept": "text/event-stream"})
+    response = asyncio.run(
+        predict_stream(request=request, photo=DummyUploadFile(b"dummy"), mode="model", db_pool=None)
+    )
+    chunks = asyncio.run(collect(response))
+
+    assert response.media_type == "text/event-stream"
+    assert chunks[0].startswith("event: model\n")
+    assert chunks[-1].startswith("event: done\n")
+
+
+@patch("routes.predict.nearest", new_callable=AsyncMock)
+@patch("routes.predict.requests.post")
+def test_stream_releases_its_slot_when_the_model_fails(mock_post, mock_nearest):
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"embedding": [0.0] * 128}
+    mock_nearest.return_value = None
+
+    request = SimpleNamespace(headers={})
+    try:
+        asyncio.run(predict_stream(request=request, photo=DummyUploadFile(b"dummy"), mode="model", db_pool=None))
+    except Exception as e:
+        assert e.status_code == 404
+        assert "search;dur=" in e.headers["Server-Timing"]
+    else:
+        raise AssertionError("expected a 404")
+    assert predict_admission.in_flight == 0
@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+import asyncio
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.prediction_log import PredictionLogWriter
+
+
+class DummyPool:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def executemany(self, query, rows):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.batches.append(list(rows))
+
+
+ROW = (1.0, 2.0, 0.5, None, "model")
+
+
+def test_rows_are_flushed_in_batches():
+    async def run():
+        pool = DummyPool()
+        writer = PredictionLogWriter(flush_rows=3, flush_interval_ms=10_000)
+        await writer.start(pool)
+        for _ in range(3):
+            writer.enqueue(ROW)
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return pool, writer.snapshot()
+
+    pool, stats = asyncio.run(run())
+
+    assert pool.batches == [[ROW] * 3]
+    assert stats["flushed"] == 3
+    assert stats["queue_depth"] == 0
+
+
+def test_stop_flushes_remaining_rows():
+    async def run():
+        pool = DummyPool()
+        writer = PredictionLogWriter(flush_rows=100, flush_interval_ms=10_000)
+        await writer.start(pool)
+        writer.enqueue(ROW)
+        await writer.stop()
+        return pool
+
+    pool = asyncio.run(run())
+
+    assert pool.batches == [[ROW]]
+
+
+def test_full_queue_drops_rows():
+    writer = PredictionLogWriter(max_queue=2)
+    assert writer.enqueue(ROW)
+    assert writer.enqueue(ROW)
+    assert not writer.enqueue(ROW)
+    assert writer.snapshot()["dropped"] == 1
+
+
+def test_failed_flush_keeps_rows_for_retry():
+    async def run():
+        writer = PredictionLogWriter(flush_rows=10)
+        writer.pool = DummyPool(fail=True)
+        writer.enqueue(ROW)
+        ok = await writer.flush()
+        return ok, writer.snapshot()
+
+    ok, stats = asyncio.run(run())
+
+    assert not ok
+    assert stats["queue_depth"] == 1
+    assert stats["flush_errors"] == 1
+
+
+def test_stop_waits_for_a_flush_in_progress():
+    class SlowPool(DummyPool):
+        async def executemany(self, query, rows):
+            await asyncio.sleep(0.05)
+            await super().executemany(query, rows)
+
+    async def run():
+        pool = SlowPool()
+        writer = PredictionLogWriter(flush_rows=2, flush_interval_ms=10_000)
+        await writer.start(pool)
+        for _ in range(3):
+            writer.enqueue(ROW)
+        await asyncio.sleep(0.01)
+        await writer.stop()
+        return pool, writer.snapshot()
+
+    pool, stats = asyncio.run(run())
+
+    assert pool.batches == [[ROW] * 2, [ROW]]
+    assert stats["flushed"] == 3
+    assert stats["dropped"] == 0
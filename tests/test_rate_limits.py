@@ -0,0 +1,115 @@
+import sys
+from pathlib import Path
+import asyncio
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.rate_limits import SharedRateLimiter
+
+
+class DummyPool:
+    """Stands in for the rate_limits upsert, shared by several limiters."""
+
+    def __init__(self, fail=False):
+        self.counts = {}
+        self.calls = 0
+        self.fail = fail
+
+    async def fetch(self, query, ips, counts, window_start):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        rows = []
+        for ip, count in zip(ips, counts):
+            self.counts[ip] = self.counts.get(ip, 0) + count
+            rows.append({"ip": ip, "request_count": self.counts[ip], "window_start": window_start})
+        return rows
+
+    async def execute(self, query, *args):
+        pass
+
+
+def test_requests_are_decided_locally_and_synced_in_batches():
+    pool = DummyPool()
+
+    async def run():
+        limiter = SharedRateLimiter(limit=100, period=3600, workers=1)
+        limiter.pool = pool
+        results = [await limiter.acquire(ip) for ip in ["10.0.0.1"] * 3 + ["10.0.0.2"]]
+        await limiter.sync()
+        return results
+
+    results = asyncio.run(run())
+
+    assert all(allowed for allowed, _ in results)
+    assert pool.calls == 1
+    assert pool.counts == {"10.0.0.1": 3, "10.0.0.2": 1}
+
+
+def test_workers_share_the_global_limit():
+    pool = DummyPool()
+
+    async def run():
+        workers = [SharedRateLimiter(limit=10, period=3600, workers=2) for _ in range(2)]
+        for worker in workers:
+            worker.pool = pool
+        allowed = 0
+        for _ in range(5):
+            for worker in workers:
+                for _ in range(10):
+                    allowed += (await worker.acquire("10.0.0.1"))[0]
+                await worker.sync()
+        return allowed
+
+    allowed = asyncio.run(run())
+
+    # A worker acting on a stale count may overshoot by its reservation once
+    assert 10 <= allowed <= 12
+    assert pool.counts["10.0.0.1"] == allowed
+
+
+def test_reservation_limits_spending_between_syncs():
+    async def run():
+        limiter = SharedRateLimiter(limit=10, period=3600, workers=4, sync_seconds=1)
+        limiter.pool = DummyPool()
+        await limiter.acquire("10.0.0.1")
+        await limiter.sync()
+        return [await limiter.acquire("10.0.0.1") for _ in range(4)], limiter.stats
+
+    results, stats = asyncio.run(run())
+
+    # 9 left over 4 workers
+    assert [allowed for allowed, _ in results] == [True, True, False, False]
+    assert results[-1][1] == 1
+    assert stats["reservation_exhausted"] == 2
+
+
+def test_unsynced_clients_get_a_share_of_the_limit():
+    async def run():
+        limiter = SharedRateLimiter(limit=10, period=3600, workers=2)
+        limiter.pool = DummyPool()
+        return [(await limiter.acquire("10.0.0.1"))[0] for _ in range(6)]
+
+    # Two workers each spending the whole limit before their first sync would admit 20
+    assert asyncio.run(run()) == [True] * 5 + [False]
+
+
+def test_failed_sync_keeps_counts_for_retry():
+    pool = DummyPool(fail=True)
+
+    async def run():
+        limiter = SharedRateLimiter(limit=10, period=3600, workers=1)
+        limiter.pool = pool
+        await limiter.acquire("10.0.0.1", cost=2.5)
+        assert not await limiter.sync()
+        pool.fail = False
+        assert await limiter.sync()
+        return limiter.snapshot()
+
+    stats = asyncio.run(run())
+
+    assert pool.counts == {"10.0.0.1": 2}
+    assert stats["sync_errors"] == 1
+    assert stats["pending_clients"] == 1  # the half request waits for the next sync
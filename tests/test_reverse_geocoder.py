@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+import numpy as np
+
+from api.services.gazetteer import Gazetteer, Place
+from api.services.reverse_geocoder import ReverseGeocoder, to_unit_vectors
+
+pytestmark = pytest.mark.skipif(not hasattr(np, "argpartition"), reason="needs NumPy")
+
+
+def test_describe_returns_nearest_gazetteer_city():
+    gaz = Gazetteer()
+    gaz.load()
+    geocoder = ReverseGeocoder()
+    geocoder.build_from(gaz)
+
+    place = geocoder.describe(30.05, 31.25)
+    assert place["name"] == "Cairo"
+    assert place["country"] == "Egypt"
+    assert place["distance_km"] < 5
+    assert geocoder.describe(0.0, -150.0) is None  # middle of the Pacific
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(-90, 90, 2000), rng.uniform(-180, 180, 2000)
+    places = [Place(str(i), "XX", float(lat), float(lon)) for i, (lat, lon) in enumerate(zip(lats, lons))]
+    geocoder = ReverseGeocoder(leaf_size=8)
+    geocoder.build(places)
+    points = to_unit_vectors(lats, lons)
+
+    for lat, lon in zip(rng.uniform(-90, 90, 200), rng.uniform(-180, 180, 200)):
+        q = to_unit_vectors(np.array([lat]), np.array([lon]))[0]
+        expected = int(np.argmin(((points - q) ** 2).sum(axis=1)))
+        assert geocoder.nearest(lat, lon)[0].name == str(expected)
+
+
+def test_nearest_across_antimeridian():
+    geocoder = ReverseGeocoder()
+    geocoder.build([Place("East", "XX", 0.0, 179.5), Place("West", "XX", 0.0, -170.0)])
+
+    place, distance = geocoder.nearest(0.0, -179.9)
+    assert place.name == "East"
+    assert distance == pytest.approx(66.7, abs=0.5)
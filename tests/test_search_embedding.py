@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+import asyncio
+from unittest.mock import patch, AsyncMock
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from fastapi import HTTPException
+from routes.search import search_embedding
+
+
+class DummyRequest:
+    def __init__(self, body: bytes, content_type: str = "application/octet-stream", content_length=None):
+        self.headers = {"content-type": content_type}
+        if content_length is not None:
+            self.headers["content-length"] = str(content_length)
+        self._body = body
+        self.read = 0
+
+    async def stream(self):
+        for start in range(0, len(self._body), 4096):
+            self.read += 1
+            yield self._body[start:start + 4096]
+
+
+def vectors(n: int) -> bytes:
+    return np.arange(n * 128, dtype="<f4").tobytes()
+
+
+@patch("routes.search.nearest_many", new_callable=AsyncMock)
+def test_search_decodes_vectors_in_order(mock_nearest_many):
+    mock_nearest_many.return_value = [{"lat": 1.0, "lon": 2.0, "score": 0.9}, None]
+
+    result = asyncio.run(search_embedding(DummyRequest(vectors(2)), db_pool=None))
+
+    vecs = mock_nearest_many.call_args.args[0]
+    assert len(vecs) == 2
+    assert vecs[1][0] == 128.0
+    assert result["count"] == 2
+    assert result["results"][0]["lat"] == 1.0
+    assert result["results"][1]["status_code"] == 404
+
+
+@pytest.mark.parametrize("body, content_type, status", [
+    (b"\x00" * 100, "application/octet-stream", 400),
+    (b"", "application/octet-stream", 400),
+    (vectors(1), "application/json", 415),
+])
+def test_search_rejects_bad_payloads(body, content_type, status):
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(search_embedding(DummyRequest(body, content_type), db_pool=None))
+    assert exc.value.status_code == status
+
+
+def test_oversized_body_is_rejected_before_it_is_read():
+    request = DummyRequest(b"", content_length=257 * 512)
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(search_embedding(request, db_pool=None))
+    assert exc.value.status_code == 413
+    assert request.read == 0
+
+
+def test_oversized_stream_stops_at_the_cap():
+    # No Content-Length, e.g. a chunked upload
+    request = DummyRequest(vectors(300))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(search_embedding(request, db_pool=None))
+    assert exc.value.status_code == 413
+    assert request.read == 256 * 512 // 4096 + 1
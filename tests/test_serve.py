@@ -0,0 +1,106 @@
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+uvicorn = pytest.importorskip("uvicorn")
+
+from api import serve
+from api.serve import Master, bind_socket, export_worker_settings, pool_size_for, worker_count
+
+
+def test_pools_share_the_connection_budget_with_one_spare():
+    assert pool_size_for(40, 4) == 8
+    assert pool_size_for(40, 1) == 20
+    assert pool_size_for(5, 8) == 1
+
+
+def test_worker_settings_keep_what_the_operator_set():
+    environ = {"DB_POOL_MAX_SIZE": "3"}
+
+    settings = export_worker_settings(4, 40, environ)
+
+    assert settings == {"WEB_CONCURRENCY": "4", "RATE_LIMIT_WORKERS": "4", "DB_POOL_MAX_SIZE": "3"}
+    assert export_worker_settings(4, 40, {})["DB_POOL_MAX_SIZE"] == "8"
+
+
+def test_worker_count_defaults_to_cpus():
+    assert worker_count(3, cpus=8) == 3
+    assert worker_count(0, cpus=8) == 8
+    assert worker_count(0, cpus=0) == 1
+
+
+async def pid_app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            else:
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+
+async def failing_app(scope, receive, send):
+    await receive()
+    raise RuntimeError("database unavailable")
+
+
+def run_master(app, signals, workers=2):
+    sock = bind_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    config = uvicorn.Config(app, log_level="critical", lifespan="on")
+    config.load()
+    master = Master(config, sock, workers)
+    seen = []
+
+    def drive():
+        try:
+            for sig, wait in signals:
+                time.sleep(wait)
+                seen.append({urllib.request.urlopen(f"http://127.0.0.1:{port}/").read() for _ in range(20)})
+                os.kill(os.getpid(), sig)
+        except Exception:
+            os.kill(os.getpid(), signal.SIGTERM)
+            raise
+
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)}
+    thread = threading.Thread(target=drive, daemon=True)
+    thread.start()
+    try:
+        status = master.run()
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+        sock.close()
+    thread.join(timeout=1)
+    return master, status, seen
+
+
+def test_reload_replaces_every_worker_and_stop_exits(monkeypatch):
+    monkeypatch.setattr(serve, "SERVE_GRACEFUL_TIMEOUT", 5)
+    master, status, (before, after) = run_master(pid_app, [(signal.SIGHUP, 1.5), (signal.SIGTERM, 5)])
+
+    assert status == 0
+    assert len(before) == 2
+    assert len(after) == 2 and not before & after
+    assert master.stats == {"spawned": 4, "replaced": 0, "reloads": 1}
+    assert not master.workers
+
+
+def test_worker_failing_to_start_stops_the_master():
+    master, status, _ = run_master(failing_app, [])
+
+    assert status == 1
+    assert not master.workers
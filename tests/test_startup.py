@@ -0,0 +1,106 @@
+import sys
+from pathlib import Path
+import asyncio
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.startup import StartupTimeline, check_batching, run_startup, wait_for_model
+
+
+def model_status(*statuses, batch_size=8):
+    return [{"modelName": "where", "batchSize": batch_size, "workers": [{"status": s} for s in statuses]}]
+
+
+def test_waits_until_a_worker_is_ready():
+    responses = [httpx.Response(404), httpx.Response(200, json=model_status("LOADING"))]
+
+    def handler(request):
+        assert request.url.path == "/models/where"
+        return responses.pop(0) if responses else httpx.Response(200, json=model_status("READY"))
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await wait_for_model(client, timeout=5, interval=0)
+
+    model = asyncio.run(run())
+    assert responses == []
+    assert model["modelName"] == "where"
+
+
+def test_warns_when_torchserve_does_not_batch(caplog):
+    assert check_batching(model_status("READY")[0], batch_size=8)
+    # A model registered without the config's batchSize runs one image at a time
+    assert not check_batching(model_status("READY", batch_size=1)[0], batch_size=8)
+    assert "--ts-config" in caplog.text
+
+
+def test_gives_up_after_timeout():
+    def handler(request):
+        raise httpx.ConnectError("refused")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await wait_for_model(client, timeout=0, interval=0)
+
+    with pytest.raises(TimeoutError, match="refused"):
+        asyncio.run(run())
+
+
+def test_startup_warms_up_before_completing():
+    seen = []
+
+    def handler(request):
+        seen.append((request.method, request.url.path))
+        if request.url.path.startswith("/models"):
+            return httpx.Response(200, json=model_status("READY"))
+        assert request.headers["content-type"] == "application/octet-stream"
+        assert request.content[:2] == b"\xff\xd8"
+        return httpx.Response(200, json={"embedding": [0.0] * 128})
+
+    ready = []
+
+    async def on_ready():
+        ready.append(True)
+
+    timeline = StartupTimeline()
+    asyncio.run(run_startup(None, timeline, on_ready, transport=httpx.MockTransport(handler)))
+
+    assert seen == [("GET", "/models/where"), ("POST", "/predictions/where")]
+    assert ready == [True]
+    assert timeline.complete
+    assert [s["name"] for s in timeline.snapshot()["steps"]] == ["torchserve_model", "warmup_inference"]
+
+
+def test_warmup_failing_every_retry_leaves_startup_incomplete():
+    def handler(request):
+        if request.url.path.startswith("/models"):
+            return httpx.Response(200, json=model_status("READY"))
+        return httpx.Response(503, text="busy")
+
+    timeline = StartupTimeline()
+    asyncio.run(run_startup(None, timeline, transport=httpx.MockTransport(handler), retries=1, retry_delay=0))
+
+    assert timeline.finished and not timeline.complete
+    assert "503" in timeline.error
+    assert [s["status"] for s in timeline.steps] == ["ok", "failed", "failed"]
+
+
+def test_failed_step_is_retried_until_it_succeeds():
+    failures = [httpx.Response(503, text="loading")] * 2
+
+    def handler(request):
+        if request.url.path.startswith("/models"):
+            return httpx.Response(200, json=model_status("READY"))
+        return failures.pop() if failures else httpx.Response(200, json={"embedding": [0.0] * 128})
+
+    timeline = StartupTimeline()
+    asyncio.run(run_startup(None, timeline, transport=httpx.MockTransport(handler), retry_delay=0))
+
+    assert timeline.complete and timeline.error is None
+    assert [s["status"] for s in timeline.steps] == ["ok", "failed", "failed", "ok"]
+    assert timeline.snapshot()["retrying"] is None
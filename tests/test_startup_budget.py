@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from scripts.measure_startup import IMPORT_BUDGET_MS, MARKER, measure_import, parse_importtime
+
+
+def test_parse_importtime_skips_interpreter_startup():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 | encodings",
+        MARKER,
+        "import time:       250 |        250 |   fastapi.routing",
+        "import time:      1200 |       1450 | fastapi",
+        "Traceback (most recent call last):",
+    ])
+
+    assert parse_importtime(stderr) == [("fastapi.routing", 250, 250), ("fastapi", 1200, 1450)]
+
+
+def test_api_main_import_is_lazy_and_within_budget():
+    # A failed import is a broken app, not a reason to skip
+    result = measure_import()
+
+    assert result["loaded_deferred"] == []
+    assert result["import_ms"] <= IMPORT_BUDGET_MS
@@ -0,0 +1,78 @@
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.deadline import Deadline
+from api.services.timing import REQUEST_TIMING_STATE, LatencyHistogram, StageLatency, StageTimer
+
+
+def test_stages_accumulate_and_render_as_server_timing():
+    timer = StageTimer()
+    with timer.stage("embedding"):
+        time.sleep(0.01)
+    timer.add("search", 0.002)
+    timer.add("search", 0.003)
+
+    header = timer.header()
+
+    assert re.fullmatch(r"embedding;dur=\d+\.\d, search;dur=5\.0, total;dur=\d+\.\d", header)
+    summary = timer.summary()
+    assert summary["stages"]["embedding"] >= 10
+    assert summary["total_ms"] >= summary["stages"]["embedding"]
+
+
+def test_timer_includes_middleware_buffering():
+    now = time.perf_counter()
+    scope = {"state": {REQUEST_TIMING_STATE: {
+        "started": now - 0.5, "stages": {"buffer": 0.4}, "handed_on": now - 0.1,
+    }}}
+
+    timer = StageTimer.from_scope(scope)
+
+    assert timer.stages["buffer"] == 0.4
+    assert timer.stages["parse"] >= 0.1
+    assert timer.total() >= 0.5
+    assert StageTimer.from_scope(None).stages == {}
+
+
+def test_deadline_carries_the_request_timer():
+    class FakeRequest:
+        headers = {}
+        scope = {"state": {REQUEST_TIMING_STATE: {"started": time.perf_counter(), "stages": {"buffer": 0.01}}}}
+
+    assert Deadline.from_request(FakeRequest()).timer.stages == {"buffer": 0.01}
+    assert Deadline(1).timer.stages == {}
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = LatencyHistogram((10, 100, 1000))
+    for ms in [5] * 90 + [50] * 9 + [5000]:
+        histogram.observe(ms)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot["count"] == 100
+    assert snapshot["p50_ms"] == 10
+    assert snapshot["p95_ms"] == 100
+    assert snapshot["p99_ms"] == 100
+    assert snapshot["max_ms"] == 5000
+    assert histogram.counts == [90, 9, 0, 1]
+
+
+def test_stage_latency_aggregates_timers():
+    latency = StageLatency()
+    for seconds in (0.02, 0.04):
+        timer = StageTimer()
+        timer.add("embedding", seconds)
+        latency.observe(timer)
+
+    snapshot = latency.snapshot()
+
+    assert snapshot["embedding"]["count"] == 2
+    assert snapshot["embedding"]["mean_ms"] == 30.0
+    assert snapshot["total"]["count"] == 2
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+from api.services.torchserve import _infer_one
+
+
+def test_image_is_sent_as_raw_body():
+    seen = {}
+
+    def handler(request):
+        seen["content_type"] = request.headers["content-type"]
+        seen["body"] = request.content
+        return httpx.Response(200, json={"embedding": [0.5] * 128})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await _infer_one(client, b"\xff\xd8jpeg")
+
+    embedding = asyncio.run(run())
+
+    assert embedding == [0.5] * 128
+    assert seen == {"content_type": "application/octet-stream", "body": b"\xff\xd8jpeg"}
+
+
+@patch("routes.predict.embedding_batcher")
+@patch("routes.predict.requests.post")
+def test_direct_call_posts_raw_body(mock_post, mock_batcher):
+    from routes.predict import compute_embedding
+
+    mock_batcher.running = False
+    mock_post.return_value.status_code = 200
+    mock_post.return_value.json.return_value = {"embedding": [0.0] * 128}
+
+    asyncio.run(compute_embedding(b"image-bytes", "a.jpg", "image/jpeg"))
+
+    kwargs = mock_post.call_args.kwargs
+    assert kwargs["data"] == b"image-bytes"
+    assert kwargs["headers"] == {"Content-Type": "application/octet-stream"}
+    assert "files" not in kwargs
+
+
+@patch("routes.predict.embedding_batcher")
+@patch("routes.predict.requests.post")
+def test_direct_call_is_bounded_by_the_deadline(mock_post, mock_batcher):
+    from routes.predict import compute_embedding
+    from api.services.deadline import Deadline, DeadlineExceeded
+
+    mock_batcher.running = False
+    mock_post.side_effect = lambda *args, **kwargs: time.sleep(0.5)
+    deadline = Deadline(0.05)
+
+    async def run():
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await compute_embedding(b"image-bytes", "a.jpg", "image/jpeg", deadline)
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.4
+    assert deadline.stages == {"embedding": "failed"}
+
+
+@patch("routes.predict.embedding_batcher")
+def test_short_client_budgets_never_open_the_breaker(mock_batcher):
+    from routes.predict import compute_embedding
+    from api.services.breaker import CircuitBreaker
+    from api.services.deadline import Deadline, DeadlineExceeded
+
+    async def slow_submit(image_data):
+        await asyncio.sleep(0.5)
+
+    mock_batcher.running = True
+    mock_batcher.submit = slow_submit
+    breaker = CircuitBreaker("torchserve", min_calls=2)
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(DeadlineExceeded):
+                await compute_embedding(b"image-bytes", "a.jpg", "image/jpeg", Deadline(0.02))
+
+    with patch("routes.predict.torchserve_breaker", breaker):
+        asyncio.run(run())
+
+    assert breaker.state == "closed"
@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+import asyncio
+import struct
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(1, str(ROOT / "api"))
+
+import numpy as np
+
+if not hasattr(np, "float32"):
+    pytest.skip("needs numpy itself, not the test stub", allow_module_level=True)
+
+from api.vector import as_embedding, decode_vector, encode_vector, register_vector
+
+
+def test_encodes_pgvector_binary_format():
+    data = encode_vector(np.array([0.5, -1.25, 3.0], dtype=np.float32))
+
+    assert struct.unpack(">HH3f", data) == (3, 0, 0.5, -1.25, 3.0)
+
+
+def test_round_trips_float32_without_copying_input():
+    vec = as_embedding([0.1] * 128)
+    decoded = decode_vector(encode_vector(vec))
+
+    assert as_embedding(vec) is vec
+    assert decoded.dtype == np.float32 and np.array_equal(decoded, vec)
+    assert encode_vector(encode_vector(vec)) == encode_vector(vec)  # already encoded
+    with pytest.raises(ValueError):
+        encode_vector(np.zeros((2, 2)))
+
+
+def test_registers_binary_codec():
+    calls = []
+
+    class Conn:
+        async def set_type_codec(self, name, **kwargs):
+            calls.append((name, kwargs))
+
+    asyncio.run(register_vector(Conn()))
+
+    assert calls == [("vector", {
+        "schema": "public", "encoder": encode_vector, "decoder": decode_vector, "format": "binary",
+    })]